@@ -4,14 +4,14 @@ import re
 import asyncio
 # SDK Migration: Using centralized genai_client
 from backend.utils.genai_client import generate_content_sync
-from dotenv import load_dotenv, find_dotenv
+from backend.utils.env import load_env
 from dataclasses import dataclass, field
 from typing import List
 from backend.utils.async_utils import retry_sync_in_thread
 from backend.agents.research_agent import research_agent
 
 # Load environment variables
-load_dotenv(find_dotenv())
+load_env()
 api_key = os.getenv("VITE_GEMINI_API_KEY")
 
 if not api_key:
@@ -1,19 +1,34 @@
 
 import os
-import json
-import asyncio
+import re
+import random
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 # SDK Migration: Using centralized genai_client
-from backend.utils.genai_client import generate_content_sync
-from dotenv import load_dotenv
+from backend.utils.genai_client import generate_content_coalesced
+from backend.utils.env import load_env
 
-load_dotenv()
+load_env()
 from backend.utils.usage_monitor import monitor
-from backend.utils.async_utils import retry_sync_in_thread
+from backend.utils.serialization import dumps, loads, extract_json_text
+from backend.utils.async_utils import spawn_background
 
 # Model configured via centralized genai_client (gemini-3.0-flash)
 
+# --- Local Pre-Judge Calibration ---
+# Scores at or above PREJUDGE_HIGH (or at or below PREJUDGE_LOW) are decided
+# locally; only the ambiguous band in between reaches the LLM judge.
+PREJUDGE_HIGH = float(os.getenv("CONSENSUS_PREJUDGE_HIGH", "0.75"))
+PREJUDGE_LOW = float(os.getenv("CONSENSUS_PREJUDGE_LOW", "0.25"))
+# Fraction of locally-decided requests that still run the LLM in the background
+# so agreement between the two can be measured.
+SHADOW_RATE = float(os.getenv("CONSENSUS_SHADOW_RATE", "0.05"))
+# match_posts/match_media only return rows above ~0.4-0.5 similarity,
+# so rescale the useful range to 0..1.
+SIMILARITY_FLOOR = 0.5
+SIMILARITY_CEIL = 0.85
+_TOKEN_RE = re.compile(r"[a-z0-9çğıöşü]+")
+
 class ConsensusResult(BaseModel):
     consensus_score: float = Field(description="Match strength between persona and results (0.0 to 1.0)")
     is_validated: bool = Field(description="True if the results meet the minimum threshold for the persona")
@@ -27,6 +42,8 @@ class ConsensusAgent:
     Performs multi-agent validation to ensure the 'Brain' isn't deviating 
     from user constraints or aesthetic intent.
     """
+    def __init__(self):
+        self.stats = {"local": 0, "llm": 0, "compared": 0, "agreed": 0}
 
     async def validate_alignment(
         self, 
@@ -44,6 +61,30 @@ class ConsensusAgent:
         vibe = persona_dict.get("vibe", "Unknown")
         
         print(f"--- Consensus R&D: Judging Alignment for Vibe '{vibe}' ---")
+
+        # --- Local Pre-Judge: skip the LLM when the verdict is obvious ---
+        local_score = self.prejudge_score(persona_dict, retrieved_items, visual_items)
+        if local_score >= PREJUDGE_HIGH or local_score <= PREJUDGE_LOW:
+            self.stats["local"] += 1
+            local_result = self._local_result(local_score, retrieved_items, visual_items)
+            print(f"   [Consensus] Local verdict (score {local_score:.2f}) | Skip ratio: {self.skip_ratio():.0%}")
+            if random.random() < SHADOW_RATE:
+                spawn_background(self._shadow_judge(local_result, persona_dict, retrieved_items, visual_items, scout_report))
+            return local_result
+
+        self.stats["llm"] += 1
+        result = await self._llm_judge(persona_dict, retrieved_items, visual_items, scout_report)
+        self._record_agreement(local_score >= 0.5, result)
+        return result
+
+    async def _llm_judge(
+        self,
+        persona_dict: Dict[str, Any],
+        retrieved_items: List[Dict[str, Any]],
+        visual_items: List[Dict[str, Any]],
+        scout_report: str
+    ) -> ConsensusResult:
+        """Full Gemini 'judge' prompt (used for the ambiguous band)."""
         
         # Prepare context for the LLM Judge
         context = {
@@ -60,13 +101,13 @@ class ConsensusAgent:
         TASK: Audit the retrieved travel content and visual gallery for "Aesthetic Drift" relative to the target persona.
         
         TARGET PERSONA (Psychographic Data):
-        {json.dumps(context['target_persona'], indent=2)}
+        {dumps(context['target_persona'], indent=True)}
         
         RETRIEVED CONTENT (Semantic Matches):
-        {json.dumps(context['retrieved_posts'], indent=2)}
+        {dumps(context['retrieved_posts'], indent=True)}
         
         VISUAL GALLERY (Aesthetic Context):
-        {json.dumps(context['visual_gallery'], indent=2)}
+        {dumps(context['visual_gallery'], indent=True)}
 
         BEST PRACTICE REPORT (Scout Agent):
         {scout_report}
@@ -91,14 +132,12 @@ class ConsensusAgent:
         """
 
         try:
-            response = await retry_sync_in_thread(generate_content_sync, prompt)
+            # Identical concurrent judgments share one (hedged) Gemini call
+            response = await generate_content_coalesced(prompt, hedge=True)
             data = response.text
-            if "```json" in data:
-                data = data.split("```json")[1].split("```")[0].strip()
-            elif "```" in data:
-                data = data.split("```")[1].split("```")[0].strip()
+            data = extract_json_text(data)
             
-            parsed = json.loads(data)
+            parsed = loads(data)
             
             # --- Phase 5: Financial Observability ---
             if hasattr(response, 'usage_metadata'):
@@ -115,5 +154,97 @@ class ConsensusAgent:
                 critique="Judge system error."
             )
 
+    # --- Local Pre-Judge ---
+
+    def prejudge_score(
+        self,
+        persona_dict: Dict[str, Any],
+        retrieved_items: List[Dict[str, Any]],
+        visual_items: List[Dict[str, Any]]
+    ) -> float:
+        """
+        Deterministic 0..1 alignment score.
+        Blends the vector similarity the match RPCs already computed between the
+        persona-derived search intent and each post/image embedding with the
+        overlap between persona keywords and item titles, tags and captions.
+        """
+        items = list(retrieved_items or []) + list(visual_items or [])
+        if not items:
+            return 0.0
+
+        similarities = [i["similarity"] for i in items if isinstance(i.get("similarity"), (int, float))]
+        if similarities:
+            mean_sim = sum(similarities) / len(similarities)
+            vector_score = (mean_sim - SIMILARITY_FLOOR) / (SIMILARITY_CEIL - SIMILARITY_FLOOR)
+            vector_score = max(0.0, min(1.0, vector_score))
+        else:
+            vector_score = None
+
+        persona_terms = set()
+        for keyword in persona_dict.get("keywords") or []:
+            persona_terms.update(_TOKEN_RE.findall(str(keyword).lower()))
+        persona_terms.update(_TOKEN_RE.findall(str(persona_dict.get("vibe") or "").lower()))
+        persona_terms = {t for t in persona_terms if len(t) > 2}
+
+        item_terms = set()
+        for item in items:
+            for field in ("title", "excerpt", "category", "alt_text", "ai_description"):
+                item_terms.update(_TOKEN_RE.findall(str(item.get(field) or "").lower()))
+            for tag in item.get("tags") or item.get("semantic_tags") or []:
+                item_terms.update(_TOKEN_RE.findall(str(tag).lower()))
+        overlap = len(persona_terms & item_terms) / len(persona_terms) if persona_terms else 0.0
+
+        if vector_score is None:
+            return overlap
+        return 0.7 * vector_score + 0.3 * overlap
+
+    def _local_result(
+        self,
+        score: float,
+        retrieved_items: List[Dict[str, Any]],
+        visual_items: List[Dict[str, Any]]
+    ) -> ConsensusResult:
+        validated = score >= PREJUDGE_HIGH
+        titles = [p.get("title") for p in (retrieved_items or [])[:3] if p.get("title")]
+        if validated:
+            instructions = "Results align with the persona. Recommend the retrieved items directly."
+            critique = f"Local pre-judge: strong vector and keyword alignment (score {score:.2f})."
+        elif not retrieved_items and not visual_items:
+            instructions = "No matching content was retrieved. Answer from general knowledge and say so."
+            critique = "Local pre-judge: nothing retrieved to validate."
+        else:
+            instructions = "Retrieved items are weakly aligned. Use them sparingly and lean on the persona."
+            critique = f"Local pre-judge: weak vector and keyword alignment (score {score:.2f})."
+        return ConsensusResult(
+            consensus_score=round(score, 3),
+            is_validated=validated,
+            refining_instructions=instructions,
+            top_matches=titles if validated else [],
+            critique=critique
+        )
+
+    async def _shadow_judge(self, local_result: ConsensusResult, persona_dict, retrieved_items, visual_items, scout_report):
+        """Runs the LLM judge off the request path to measure agreement with a local verdict."""
+        try:
+            llm_result = await self._llm_judge(persona_dict, retrieved_items, visual_items, scout_report)
+            self._record_agreement(local_result.is_validated, llm_result)
+        except Exception as e:
+            print(f"[WARNING] [Consensus] Shadow judge failed: {e}")
+
+    def _record_agreement(self, local_verdict: bool, llm_result: ConsensusResult):
+        if llm_result.critique == "Judge system error.":
+            return
+        self.stats["compared"] += 1
+        if local_verdict == llm_result.is_validated:
+            self.stats["agreed"] += 1
+        print(f"   [Consensus] Pre-judge agreement with LLM: {self.agreement_rate():.0%} over {self.stats['compared']} comparisons")
+
+    def skip_ratio(self) -> float:
+        total = self.stats["local"] + self.stats["llm"]
+        return self.stats["local"] / total if total else 0.0
+
+    def agreement_rate(self) -> float:
+        return self.stats["agreed"] / self.stats["compared"] if self.stats["compared"] else 0.0
+
 # Singleton instance
 consensus_agent = ConsensusAgent()
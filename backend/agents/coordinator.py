@@ -4,6 +4,7 @@ from supabase import create_client, Client
 from backend.utils.genai_client import generate_content_sync
 from typing import List, Dict, Any
 from backend.utils.async_utils import retry_sync_in_thread
+from backend.utils.serialization import parse_llm_json
 
 class TravelReasoningAgent:
     def __init__(self):
@@ -61,15 +62,9 @@ class TravelReasoningAgent:
         try:
             response = await retry_sync_in_thread(generate_content_sync, prompt)
             # In a real app, we'd parse the JSON more robustly
-            import json
             # Extract JSON from response text (Gemini sometimes adds markdown blocks)
             text = response.text
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0].strip()
-            elif "```" in text:
-                 text = text.split("```")[1].split("```")[0].strip()
-            
-            return json.loads(text)
+            return parse_llm_json(text)
         except Exception as e:
             print(f"Error generating reasoning: {e}")
             return {
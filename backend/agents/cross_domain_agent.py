@@ -1,16 +1,16 @@
 
 import os
-import json
 import asyncio
 # SDK Migration: Using centralized genai_client
-from backend.utils.genai_client import generate_content_sync
+from backend.utils.genai_client import generate_content_hedged
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
-from dotenv import load_dotenv, find_dotenv
+from backend.utils.env import load_env
 
-load_dotenv(find_dotenv())
+load_env()
 from backend.utils.usage_monitor import monitor
-from backend.utils.async_utils import retry_sync_in_thread
+from backend.utils.async_utils import retry_async
+from backend.utils.serialization import dumps, loads, extract_json_text
 
 # Model configured via centralized genai_client (gemini-3.0-flash)
 
@@ -35,16 +35,18 @@ class CrossDomainTransferAgent:
     def __init__(self):
         pass  # Uses centralized genai_client
 
-    async def infer_persona(self, query: Any, signals: Any = None) -> TravelPersona:
+    async def infer_persona(self, query: Any, signals: Any = None, signal_features: Optional[Dict[str, Any]] = None) -> TravelPersona:
         """
         Scientist-level Identity Mapping: Bridges Lifestyle to Travel.
         Supports polymorphic inputs for R&D 2.0 synergy.
+        If `signal_features` (pre-aggregated session signals) is given it is used
+        as the signal summary instead of re-processing the raw list.
         """
         # --- Phase 1: Input Normalization ---
         # If query is a dict, it's likely a Psychographic Profile from ProfilerAgent
         profile_context = ""
         if isinstance(query, dict):
-            profile_context = f"PSYCHOGRAPHIC_PROFILE: {json.dumps(query)}"
+            profile_context = f"PSYCHOGRAPHIC_PROFILE: {dumps(query)}"
             actual_query = query.get("xai_explanation", "Unknown Query Context")
         else:
             actual_query = query
@@ -54,6 +56,8 @@ class CrossDomainTransferAgent:
         signal_summary = "None"
         if isinstance(signals, str):
             research_context = f"RESEARCH_CONTEXT: {signals}"
+        elif signal_features:
+            signal_summary = dumps(signal_features)
         elif isinstance(signals, list):
             processed = []
             for s in (signals or [])[:10]:
@@ -63,7 +67,7 @@ class CrossDomainTransferAgent:
                         "vibe": s.get("metadata", {}).get("vibe", "unknown"),
                         "category": s.get("target_type") or s.get("target", "unknown")
                     })
-            signal_summary = json.dumps(processed)
+            signal_summary = dumps(processed)
 
         mode = "COLD_START" if not signals else "WARM_START"
         
@@ -98,16 +102,14 @@ class CrossDomainTransferAgent:
         """
 
         try:
-            response = await retry_sync_in_thread(generate_content_sync, prompt)
+            # On the request path: hedge slow calls at the running p95
+            response = await retry_async(generate_content_hedged, prompt)
             text = response.text
             
             # Extract JSON from markdown
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0].strip()
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0].strip()
+            text = extract_json_text(text)
             
-            data = json.loads(text)
+            data = loads(text)
             
             if hasattr(response, 'usage_metadata'):
                 await monitor.log_usage("CrossDomainAgent", "gemini-3.0-flash", response.usage_metadata, "CDA-Session")
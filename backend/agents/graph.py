@@ -1,7 +1,6 @@
 
 import os
 import sys
-import json
 import asyncio
 import aiohttp
 
@@ -9,31 +8,35 @@ import aiohttp
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 # SDK Migration: Using centralized genai_client instead of deprecated google.generativeai
-from backend.utils.genai_client import get_client, generate_content_sync, embed_content_sync, generate_content_stream_sync
-from typing import List, Dict, Any, Optional
+from backend.utils.genai_client import get_client, generate_content_sync, embed_content_sync, batch_embed_contents_sync, generate_content_chunks_sync
+from typing import List, Dict, Any, FrozenSet, Optional
 
 # Load env vars
-from dotenv import load_dotenv, find_dotenv
-load_dotenv(find_dotenv())
+from backend.utils.env import load_env
+load_env()
 
-from backend.agents.cross_domain_agent import cross_domain_agent
-from backend.agents.visual_intelligence_agent import visual_agent
-from backend.agents.consensus_agent import consensus_agent
 from backend.utils.usage_monitor import monitor
-
-# ARRE R&D Council
-from backend.agents.memory_agent import memory_agent
-from backend.agents.research_agent import research_agent
-from backend.agents.scribe_agent import scribe_agent
-from backend.agents.scientist_agent import scientist_agent
-from backend.agents.profiler_agent import profiler_agent
-from backend.agents.media_guardian import media_guardian
-from backend.agents.seo_scout import seo_scout
-from backend.agents.ux_architect import ux_architect
-
-import time
-last_heal_time = 0
-HEAL_COOLDOWN = 3600 # 1 hour cooldown for background maintenance
+from backend.utils.async_utils import (
+    CircuitBreaker, MicroBatcher, WriteBehindBuffer, budget_timeout, run_sync_in_thread, spawn_background
+)
+from backend.utils.signal_store import signal_store, SessionSignals, SIGNAL_WINDOW
+from backend.utils.preference_model import blend_vectors
+from backend.utils.shared_state import claim_cooldown, cooldown_remaining
+from backend.utils.service_tiers import (
+    DEFAULT_TIER, tier_stages, get_cached_recommendation, cache_recommendation, cache_scope, template_recommendation
+)
+from backend.utils.serialization import dumps, loads, parse_llm_json
+
+# Agents (incl. the ARRE R&D Council) are resolved on first use
+from backend.agents.registry import (
+    cross_domain_agent, visual_agent, consensus_agent,
+    memory_agent, research_agent, scribe_agent, scientist_agent,
+    profiler_agent, media_guardian, seo_scout, ux_architect
+)
+from backend.agents.profiler_agent import profile_key
+
+from datetime import datetime, timezone
+HEAL_COOLDOWN = 3600 # 1 hour cooldown for background maintenance (shared by all workers)
 
 # --- Configuration ---
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
@@ -49,36 +52,62 @@ if not all([SUPABASE_URL, SUPABASE_KEY, GEMINI_KEY]):
 _genai_client = get_client()
 
 # --- Lightweight Supabase Client (No Compilation Needed) ---
-async def supabase_fetch_signals(session_id: str):
+# Request-path Supabase calls fail fast (to empty signals / empty context) while
+# the breaker is open instead of each waiting out its own timeout.
+supabase_breaker = CircuitBreaker("supabase_io")
+
+async def supabase_fetch_signals(session_id: str) -> SessionSignals:
+    """
+    Returns the session's aggregated signal state, fetching only the
+    user_signals rows created since the last request for this session.
+    """
+    entry = signal_store.get(session_id)
     headers = {
         "apikey": SUPABASE_KEY,
         "Authorization": f"Bearer {SUPABASE_KEY}",
         "Accept-Profile": "blog"
     }
     url = f"{SUPABASE_URL}/rest/v1/user_signals"
-    params = {
-        "session_id": f"eq.{session_id}",
-        "order": "created_at.desc",
-        "limit": "20"
-    }
-    
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url, headers=headers, params=params, timeout=15.0) as r:
-                r.raise_for_status()
-                return await r.json()
-        except Exception as e:
-            print(f"Supabase Signals Fetch Error: {e}")
-            return []
 
-async def supabase_save_profile(session_id: str, user_id: Optional[str], analysis: Dict[str, Any]):
-    """
-    R&D Archival: Persists inferred user vibe and intent to Supabase (blog schema).
-    """
-    if not user_id:
-        print("[WARNING] [Phase 5.3]: No user_id provided. Skipping persistent profile update.")
-        return
+    async with entry.lock:
+        if entry.last_created_at:
+            # Incremental: rows at or after the cursor (boundary duplicates are skipped)
+            params = {
+                "session_id": f"eq.{session_id}",
+                "created_at": f"gte.{entry.last_created_at}",
+                "order": "created_at.asc",
+                "limit": "100"
+            }
+        else:
+            params = {
+                "session_id": f"eq.{session_id}",
+                "order": "created_at.desc",
+                "limit": str(SIGNAL_WINDOW)
+            }
 
+        async with aiohttp.ClientSession() as session:
+            try:
+                async with supabase_breaker:
+                    async with session.get(url, headers=headers, params=params, timeout=15.0) as r:
+                        r.raise_for_status()
+                        rows = await r.json(loads=loads)
+                        new_count = entry.apply(rows)
+                        if new_count:
+                            print(f"--- Signals: +{new_count} new (total {entry.total}) for session {session_id} ---")
+            except Exception as e:
+                print(f"Supabase Signals Fetch Error: {e}")
+
+    return entry
+
+# --- Write-behind Profile Persistence ---
+# Nothing on the request path reads user_profiles back, so saves are coalesced
+# per user over a short window and flushed in bulk upserts in the background.
+PROFILE_FLUSH_WINDOW = float(os.getenv("PROFILE_FLUSH_WINDOW_MS", "2000")) / 1000.0
+PROFILE_FLUSH_BATCH = int(os.getenv("PROFILE_FLUSH_BATCH", "100"))
+PROFILE_MAX_PENDING = int(os.getenv("PROFILE_MAX_PENDING", "5000"))
+
+async def _upsert_profiles(payloads: List[Dict[str, Any]]):
+    """Bulk upsert into blog.user_profiles; one POST per distinct column set, bisected on rejection."""
     headers = {
         "apikey": SUPABASE_KEY,
         "Authorization": f"Bearer {SUPABASE_KEY}",
@@ -88,23 +117,65 @@ async def supabase_save_profile(session_id: str, user_id: Optional[str], analysi
         "Content-Profile": "blog"
     }
     url = f"{SUPABASE_URL}/rest/v1/user_profiles"
-    
+
+    # PostgREST takes the columns of a bulk insert from the rows, so rows without
+    # an embedding are sent separately rather than nulling the stored vector.
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for payload in payloads:
+        groups.setdefault(tuple(sorted(payload)), []).append(payload)
+
+    async def post(session, rows: List[Dict[str, Any]]) -> int:
+        # A bulk insert is one statement: a single row failing the user FK, the
+        # session_id unique constraint or RLS rejects the whole chunk. On a 4xx
+        # bisect down to the offending rows and drop only those; 5xx and
+        # network errors still raise so the buffer retries the chunk.
+        async with session.post(url, headers=headers, params={"on_conflict": "user_id"}, json=rows, timeout=10.0) as r:
+            if r.status < 300:
+                return len(rows)
+            text = await r.text()
+            if r.status >= 500 or r.status in (401, 408, 429):
+                raise RuntimeError(f"Supabase Profile Save {r.status}: {text}")
+        if len(rows) == 1:
+            print(f"--- Profiles: dropped rejected upsert for user {rows[0].get('user_id')} ({r.status}: {text}) ---")
+            return 0
+        mid = len(rows) // 2
+        return await post(session, rows[:mid]) + await post(session, rows[mid:])
+
+    saved = 0
+    async with aiohttp.ClientSession() as session:
+        for rows in groups.values():
+            saved += await post(session, rows)
+    print(f"--- Profiles: flushed {saved}/{len(payloads)} upserts ---")
+
+profile_writer = WriteBehindBuffer(
+    _upsert_profiles,
+    window=PROFILE_FLUSH_WINDOW,
+    max_batch=PROFILE_FLUSH_BATCH,
+    max_pending=PROFILE_MAX_PENDING,
+    name="ProfileWriter"
+)
+
+async def supabase_save_profile(session_id: str, user_id: Optional[str], analysis: Dict[str, Any], embedding: Optional[List[float]] = None):
+    """
+    R&D Archival: Persists inferred user vibe and intent to Supabase (blog schema).
+    `embedding` is the running user-preference vector (user_profiles.embedding).
+    Returns immediately; the upsert is written behind by `profile_writer`.
+    """
+    if not user_id:
+        print("[WARNING] [Phase 5.3]: No user_id provided. Skipping persistent profile update.")
+        return
+
     payload = {
         "user_id": user_id,
         "session_id": session_id,
         "lifestyle_vibe": analysis.get("lifestyle_vibe") or analysis.get("vibe") or "Neutral",
         "constraints": analysis.get("constraints") or [],
-        "last_active": "now()"
+        "last_active": datetime.now(timezone.utc).isoformat()
     }
-    
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(url, headers=headers, json=payload, timeout=10.0) as r:
-                if r.status >= 300:
-                    text = await r.text()
-                    print(f"Supabase Profile Save Warning: {r.status} - {text}")
-        except Exception as e:
-            print(f"Supabase Profile Save Error: {e}")
+    if embedding:
+        payload["embedding"] = embedding
+
+    profile_writer.put(user_id, payload)
 
 async def supabase_retrieve_visuals(query_text: str, vibe: Optional[str] = None):
     """
@@ -122,96 +193,210 @@ async def supabase_retrieve_visuals(query_text: str, vibe: Optional[str] = None)
         print(f"Visual Retrieval Wrapper Error: {e}")
         return []
 
-async def supabase_retrieve_context(query_text: str, vibe_filter: str):
+# --- Personalized Retrieval (user_profiles.embedding) ---
+# The user vector is an exponentially decayed mean of the embeddings of posts
+# the user engaged with. Retrieval searches with a blend of query and user
+# vector; the user share grows as hybrid_alpha decays from cold start.
+PERSONALIZATION_MAX_WEIGHT = float(os.getenv("PERSONALIZATION_MAX_WEIGHT", "0.4"))
+
+def _parse_vector(value: Any) -> Optional[List[float]]:
+    """pgvector columns come back from PostgREST as '[0.1,0.2,...]' strings."""
+    if isinstance(value, str):
+        value = loads(value)
+    return [float(x) for x in value] if value else None
+
+def personalization_weight(analysis: Dict[str, Any]) -> float:
+    alpha = analysis.get("hybrid_alpha", 1.0)
+    return max(0.0, min(1.0, 1.0 - alpha)) * PERSONALIZATION_MAX_WEIGHT
+
+def _personal_scope(state: Dict[str, Any], signals: List[dict], user_vector: Optional[List[float]]) -> Optional[str]:
+    """Cache scope for an answer shaped by this caller's signals or profile; None if it was not."""
+    user_id = state.get("user_id")
+    if signals or user_vector is not None or (user_id and user_id != "anonymous"):
+        return cache_scope(state.get("session_id"), user_id)
+    return None
+
+async def supabase_update_user_vector(session_id: str, user_id: Optional[str], signal_state: SessionSignals) -> Optional[List[float]]:
     """
-    Performs retrieval from blog.posts using embedding similarity.
-    1. Embed the query.
-    2. Call RPC match_posts.
+    Folds the embeddings of newly engaged posts into the user's decayed preference
+    vector (kept on the ProfilerAgent profile). The first time a user is seen in
+    this process the vector is seeded from user_profiles.embedding.
+    """
+    key = profile_key(user_id, session_id)
+    profile = profiler_agent.get_profile(key)
+    prefs = profile.preferences
+    post_ids = signal_state.drain_engaged_posts()
+    needs_seed = key == user_id and not profile.vector_loaded
+    if not post_ids and not needs_seed:
+        return prefs.centroid
+
+    headers = {
+        "apikey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "Accept-Profile": "blog"
+    }
+    async with aiohttp.ClientSession() as session:
+        try:
+            if needs_seed:
+                params = {"user_id": f"eq.{user_id}", "select": "embedding", "limit": "1"}
+                async with session.get(f"{SUPABASE_URL}/rest/v1/user_profiles", headers=headers, params=params, timeout=10.0) as r:
+                    r.raise_for_status()
+                    rows = await r.json(loads=loads)
+                    stored = _parse_vector(rows[0].get("embedding")) if rows else None
+                    if stored and prefs.centroid is None:
+                        prefs.observe_embedding(stored)
+                # Only a successful fetch counts; otherwise the next request retries the seed
+                profile.vector_loaded = True
+
+            if post_ids:
+                params = {"id": f"in.({','.join(dict.fromkeys(post_ids))})", "select": "id,embedding"}
+                async with session.get(f"{SUPABASE_URL}/rest/v1/posts", headers=headers, params=params, timeout=10.0) as r:
+                    r.raise_for_status()
+                    vectors = {p["id"]: _parse_vector(p.get("embedding")) for p in await r.json(loads=loads)}
+                # Oldest engagement first so the most recent one carries the most weight
+                for post_id in post_ids:
+                    if vectors.get(post_id):
+                        prefs.observe_embedding(vectors[post_id])
+                print(f"--- User Vector: folded {len(post_ids)} engaged posts ({prefs.embedding_count} total) ---")
+        except Exception as e:
+            print(f"User Vector Update Error: {e}")
+            # Nothing was folded (a failed seed must not be overtaken by newer
+            # posts either): give the engagements back for the next request
+            if post_ids:
+                signal_state.requeue_engaged_posts(post_ids)
+
+    return prefs.centroid
+
+# --- Micro-batched Retrieval (Layer 3) ---
+# Concurrent requests arriving within a few milliseconds share one embedding
+# call and one similarity RPC instead of paying for N of each.
+RETRIEVAL_BATCH_WAIT = float(os.getenv("RETRIEVAL_BATCH_WAIT_MS", "5")) / 1000.0
+RETRIEVAL_BATCH_SIZE = int(os.getenv("RETRIEVAL_BATCH_SIZE", "16"))
+MATCH_THRESHOLD = 0.5
+MATCH_COUNT = 3
+
+async def _match_posts_batch(session: aiohttp.ClientSession, headers: Dict[str, str], vectors: List[List[float]]) -> List[List[dict]]:
+    """
+    Runs one match_posts_batch RPC for all query vectors (migration 017).
+    Falls back to concurrent single-vector match_posts calls if the batch RPC is not deployed.
+    """
+    batch_url = f"{SUPABASE_URL}/rest/v1/rpc/match_posts_batch"
+    payload = {
+        "query_embeddings": vectors,
+        "match_threshold": MATCH_THRESHOLD,
+        "match_count": MATCH_COUNT
+    }
+    async with session.post(batch_url, headers=headers, json=payload, timeout=20.0) as r:
+        if r.status != 404:
+            r.raise_for_status()
+            rows = await r.json(loads=loads)
+            grouped: List[List[dict]] = [[] for _ in vectors]
+            for row in rows:
+                grouped[row["query_index"]].append({"id": row["id"], "similarity": row["similarity"]})
+            return grouped
+
+    print("RPC match_posts_batch not found. Falling back to per-query match_posts.")
+    rpc_url = f"{SUPABASE_URL}/rest/v1/rpc/match_posts"
+
+    async def _single(vector):
+        single_payload = {
+            "query_embedding": vector,
+            "match_threshold": MATCH_THRESHOLD,
+            "match_count": MATCH_COUNT
+        }
+        async with session.post(rpc_url, headers=headers, json=single_payload, timeout=20.0) as r:
+            if r.status == 404:
+                print("RPC match_posts not found. Is it exposed?")
+                return []
+            r.raise_for_status()
+            return await r.json(loads=loads)
+
+    return list(await asyncio.gather(*[_single(v) for v in vectors]))
+
+async def _retrieve_context_batch(requests: List[tuple]) -> List[List[dict]]:
+    """
+    Batched retrieval from blog.posts using embedding similarity.
+    Each request is (query_text, user_vector, user_weight).
+    1. Embed all unique queries in one batchEmbedContents call.
+    2. Blend in the user vector, then search with one match_posts_batch RPC.
+    3. Hydrate the union of matched post IDs with one posts query.
     """
     headers = {
         "apikey": SUPABASE_KEY,
         "Authorization": f"Bearer {SUPABASE_KEY}",
         "Content-Type": "application/json"
     }
-    
-    # 1. Embed query using REST genai_client
+
+    unique_queries = list(dict.fromkeys(text for text, _, _ in requests))
+
+    # 1. Embed queries using REST genai_client
     try:
-        embedding_res = await asyncio.to_thread(
-            embed_content_sync,
-            query_text
-        )
-        # REST client returns {'embedding': [...]} dict format
-        if isinstance(embedding_res, dict) and 'embedding' in embedding_res:
-            query_vector = embedding_res['embedding']
-        elif hasattr(embedding_res, 'embeddings'):
-            # Legacy SDK format fallback
-            query_vector = embedding_res.embeddings[0].values
-        else:
-            print(f"Unexpected embedding format: {type(embedding_res)}")
-            return []
+        embedded = dict(zip(unique_queries, await run_sync_in_thread(batch_embed_contents_sync, unique_queries)))
     except Exception as e:
         print(f"Embedding failed: {e}")
-        return []
+        return [[] for _ in requests]
+
+    # Identical un-personalized queries share one search vector
+    vectors: List[List[float]] = []
+    slots: List[int] = []
+    seen: Dict[tuple, int] = {}
+    for text, user_vector, user_weight in requests:
+        key = (text, id(user_vector), user_weight) if user_vector and user_weight > 0 else (text,)
+        if key not in seen:
+            seen[key] = len(vectors)
+            vectors.append(blend_vectors(embedded[text], user_vector, user_weight))
+        slots.append(seen[key])
 
-    # 2. Call RPC match_posts
-    rpc_url = f"{SUPABASE_URL}/rest/v1/rpc/match_posts"
-    payload = {
-        "query_embedding": query_vector,
-        "match_threshold": 0.5, # Adjust based on testing
-        "match_count": 3
-    }
-    
     async with aiohttp.ClientSession() as session:
         try:
-            # Note: The RPC lives in 'blog' schema? 
-            # Migration says: CREATE OR REPLACE FUNCTION blog.match_posts
-            # But usually RPC functions are exposed via root /rpc/ if they are in exposed schema.
-            # If function is in blog schema, we might need headers if 'blog' is not in search_path of API role.
-            # Usually PostgREST exposes public functions. If it's in blog schema, we usually need to call it fully qualified or set search path.
-            # However, `blog.match_posts` might be hidden unless exposed.
-            # Let's try calling typical RPC. If it fails, we fall back to keyword search (TODO).
-            
-            # Important: Migration 002 defined function in `blog` schema.
-            # So depending on exposure, this might need tweaking.
-            # Assuming it works for now or returns 404.
-            
-            async with session.post(rpc_url, headers=headers, json=payload, timeout=20.0) as r:
-                if r.status == 404:
-                   print("RPC match_posts not found. Is it exposed?")
-                   return []
-                
-                r.raise_for_status()
-                matches = await r.json()
-                
-                # Hydrate matches (fetch full details if RPC only returned ID/Similarity)
-                # RPC in migration 002 returns (id, similarity).
-                # We need title/excerpt.
-                if not matches:
+            async with supabase_breaker:
+                # 2. Similarity search
+                matches_per_query = await _match_posts_batch(session, headers, vectors)
+
+                all_ids = list(dict.fromkeys(m["id"] for matches in matches_per_query for m in matches))
+                if not all_ids:
                     print("Match posts returned empty list")
-                    return []
-                print(f"RPC found matches: {len(matches)}")
-                
-                ids = [m['id'] for m in matches]
-                
-                # Fetch details
+                    return [[] for _ in requests]
+                print(f"RPC found matches: {len(all_ids)} posts for {len(vectors)} queries")
+
+                # 3. Hydrate details (RPC only returns id/similarity)
                 post_url = f"{SUPABASE_URL}/rest/v1/posts"
                 post_params = {
-                    "id": f"in.({','.join(ids)})",
-                    "select": "title,excerpt,slug" 
+                    "id": f"in.({','.join(all_ids)})",
+                    "select": "id,title,excerpt,slug"
                 }
-                
+
                 # We need to set Profile header to read from blog schema
                 read_headers = headers.copy()
-                read_headers["Accept-Profile"] = "blog" 
-                
-                async with session.get(post_url, headers=read_headers, params=post_params, timeout=20.0) as detail_r:
-                    posts = await detail_r.json()
-                    return posts
-
+                read_headers["Accept-Profile"] = "blog"
 
+                async with session.get(post_url, headers=read_headers, params=post_params, timeout=20.0) as detail_r:
+                    detail_r.raise_for_status()
+                    posts_by_id = {p["id"]: p for p in await detail_r.json(loads=loads)}
         except Exception as e:
             print(f"Retrieval Error: {e}")
-            return []
+            return [[] for _ in requests]
+
+    results = [
+        [{**posts_by_id[m["id"]], "similarity": m["similarity"]} for m in matches if m["id"] in posts_by_id]
+        for matches in matches_per_query
+    ]
+    return [results[slot] for slot in slots]
+
+_retrieval_batcher = MicroBatcher(
+    _retrieve_context_batch,
+    max_wait=RETRIEVAL_BATCH_WAIT,
+    max_batch=RETRIEVAL_BATCH_SIZE,
+    name="RetrievalBatcher"
+)
+
+async def supabase_retrieve_context(query_text: str, vibe_filter: str, user_vector: Optional[List[float]] = None, user_weight: float = 0.0):
+    """
+    Performs retrieval from blog.posts using embedding similarity.
+    With a user vector, posts are scored against the query/user blend.
+    Concurrent callers are coalesced by the retrieval micro-batcher.
+    """
+    return await _retrieval_batcher.submit((query_text, user_vector, user_weight))
 
 # --- Custom State Machine (Replacing LangGraph) ---
 class Agent:
@@ -222,56 +407,70 @@ class Agent:
         With User Memory, Proactive Research, Visual Search, and Consensus Judge.
         """
         try:
-            # 0. R&D Scout (Proactive Autonomy: Scout best practices at the start of every request)
-            # STABILITY FIX: Wrapped in timeout to prevent indefinite hangs
-            print(f"--- R&D Scout initiating proactive research for: {state['query']} ---")
-            try:
-                scout_report = await asyncio.wait_for(
-                    research_agent.scout_best_practices(state["query"]),
-                    timeout=30.0
-                )
-            except asyncio.TimeoutError:
-                print("[WARNING] Research Scout timed out after 30s - continuing without scout report")
-                scout_report = "Scout unavailable due to timeout"
-            state["scout_report"] = scout_report
-
-            # 0b. R&D Memory (Check for past solutions proactively)
-            # STABILITY FIX: Wrapped in timeout to prevent indefinite hangs
-            print("--- Consulting Memory for related knowledge ---")
-            try:
-                related_problems = await asyncio.wait_for(
-                    memory_agent.find_related_problems(state["query"]),
-                    timeout=30.0
-                )
-            except asyncio.TimeoutError:
-                print("[WARNING] Memory Agent timed out after 30s - continuing without memory lookup")
-                related_problems = []
-            if related_problems:
-                 print(f"--- Found {len(related_problems)} related solutions in Memory ---")
-                 state["related_knowledge"] = related_problems
-
-            # 1. Fetch Signals
-            signals = await supabase_fetch_signals(state["session_id"])
+            # The service tier decides which stages run (full / standard / lite / cache_only)
+            tier = state.get("tier") or ("standard" if state.get("degraded") else DEFAULT_TIER)
+            state["tier"] = tier
+            stages = tier_stages(tier)
+            if tier == "cache_only":
+                return await self.serve_cache_only(state)
+
+            if "scout" in stages:
+                # 0. R&D Scout (Proactive Autonomy: Scout best practices at the start of every request)
+                # STABILITY FIX: Wrapped in timeout to prevent indefinite hangs
+                print(f"--- R&D Scout initiating proactive research for: {state['query']} ---")
+                try:
+                    scout_report = await asyncio.wait_for(
+                        research_agent.scout_best_practices(state["query"]),
+                        timeout=budget_timeout(30.0)
+                    )
+                except asyncio.TimeoutError:
+                    print("[WARNING] Research Scout timed out after 30s - continuing without scout report")
+                    scout_report = "Scout unavailable due to timeout"
+                state["scout_report"] = scout_report
+            else:
+                print(f"--- [Tier: {tier}] Skipping Scout ---")
+                state["scout_report"] = "Scout skipped (reduced service tier)"
+
+            if "memory" in stages:
+                # 0b. R&D Memory (Check for past solutions proactively)
+                # STABILITY FIX: Wrapped in timeout to prevent indefinite hangs
+                print("--- Consulting Memory for related knowledge ---")
+                try:
+                    related_problems = await asyncio.wait_for(
+                        memory_agent.find_related_problems(state["query"]),
+                        timeout=budget_timeout(30.0)
+                    )
+                except asyncio.TimeoutError:
+                    print("[WARNING] Memory Agent timed out after 30s - continuing without memory lookup")
+                    related_problems = []
+                if related_problems:
+                     print(f"--- Found {len(related_problems)} related solutions in Memory ---")
+                     state["related_knowledge"] = related_problems
+
+            # 1. Fetch Signals (incremental, pre-aggregated per session)
+            signal_state = await supabase_fetch_signals(state["session_id"])
+            signals = signal_state.signals
             state["signals"] = signals
+            user_vector = await supabase_update_user_vector(state["session_id"], state.get("user_id"), signal_state)
             
             # 2. Analyze User
-            analysis = await self.analyze_user(state["query"], signals, state.get("user_id", "anonymous"))
+            analysis = await self.analyze_user(state["query"], signals, state.get("user_id"), signal_state.features(), stages=stages, session_id=state["session_id"])
             state["analysis"] = analysis
             
             # 2b. SAVE Memory (Persist Vibe)
-            await supabase_save_profile(state["session_id"], state.get("user_id"), analysis)
+            await supabase_save_profile(state["session_id"], state.get("user_id"), analysis, user_vector)
             
             # 3. Retrieve Context (Layer 3)
             search_q = analysis.get('intent') or state['query']
             print(f"--- Retrieving Content for: {search_q} ---")
             
             # Parallel Retrieval Strategy
-            tasks = [supabase_retrieve_context(search_q, analysis.get('lifestyleVibe'))]
+            tasks = [supabase_retrieve_context(search_q, analysis.get('lifestyleVibe'), user_vector, personalization_weight(analysis))]
             
             is_visual_intent = analysis.get("ui_directive") in ["immersion", "visual"] or \
                                any(k in search_q.lower() for k in ["look like", "photo", "image", "view", "scene"])
                                
-            if is_visual_intent:
+            if is_visual_intent and "visual" in stages:
                  print("--- Visual Intent Detected: Fetching Images ---")
                  tasks.append(supabase_retrieve_visuals(search_q, analysis.get('lifestyleVibe')))
             
@@ -283,19 +482,25 @@ class Agent:
             state["visual_items"] = visual_items
 
             # --- R&D Phase 3: Consensus Judge ---
-            consensus = await consensus_agent.validate_alignment(
-                analysis, 
-                retrieved_items, 
-                visual_items,
-                state.get("scout_report", "No scout report available")
-            )
-            analysis["consensus"] = consensus.model_dump()
+            if "consensus" in stages:
+                consensus = await consensus_agent.validate_alignment(
+                    analysis, 
+                    retrieved_items, 
+                    visual_items,
+                    state.get("scout_report", "No scout report available")
+                )
+                analysis["consensus"] = consensus.model_dump()
             
             # 4. Generate Recommendation
             rec = await self.generate_recommendation(state["query"], analysis, retrieved_items, visual_items)
             state["recommendation"] = rec
+            await cache_recommendation(state["query"], rec, tier, scope=_personal_scope(state, signals, user_vector))
             state["recommendation"]["constraints"] = analysis.get("constraints")
             state["recommendation"]["lifestyleVibe"] = analysis.get("lifestyleVibe")
+
+            if "background" not in stages:
+                print(f"--- Orchestrator Complete for session {state['session_id']} (tier: {tier}) ---")
+                return state
             
             # 5. R&D Scribe & Scientist (Post-Build Hooks - OFF-LOADED TO BACKGROUND)
             # These are critical for R&D but should NOT block the user-facing response.
@@ -324,17 +529,15 @@ class Agent:
                 except Exception as bge:
                     print(f"[WARNING] [Background Task Failure]: {bge}")
 
-            asyncio.create_task(run_background_agents(state["query"], state))
+            spawn_background(run_background_agents(state["query"], state))
             
             # Media Guardian triggers a self-healing cycle (Background - Throttled)
-            global last_heal_time
-            current_time = time.time()
-            if current_time - last_heal_time > HEAL_COOLDOWN:
+            if claim_cooldown("media_guardian_heal", HEAL_COOLDOWN):
                 print(f"--- [Background] MediaGuardian: Initiating self-healing cycle (Cooldown: {HEAL_COOLDOWN}s) ---")
-                asyncio.create_task(media_guardian.heal_media_library())
-                last_heal_time = current_time
+                spawn_background(media_guardian.heal_media_library())
             else:
-                print(f"--- [Background] MediaGuardian: Self-healing skipped (Last run: {int(current_time - last_heal_time)}s ago) ---")
+                remaining = cooldown_remaining("media_guardian_heal")
+                print(f"--- [Background] MediaGuardian: Self-healing skipped (Next run in {int(remaining)}s) ---")
 
             print(f"--- Orchestrator Complete for session {state['session_id']} ---")
             return state
@@ -348,24 +551,47 @@ class Agent:
             }
             return state
 
-    async def analyze_user(self, query: str, signals: List[dict], user_id: str = "anonymous"):
+    async def serve_cache_only(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        cache_only tier: no LLM calls. Serves a cached recommendation for the
+        same normalized query, else a templated answer from retrieved posts.
+        """
+        cached = await get_cached_recommendation(state["query"], scope=cache_scope(state.get("session_id"), state.get("user_id")))
+        if cached:
+            print(f"--- [Tier: cache_only] Serving cached recommendation for: {state['query']} ---")
+            state["recommendation"] = {k: cached[k] for k in ("content", "reasoning", "confidence")}
+            return state
+
+        print(f"--- [Tier: cache_only] Templated answer for: {state['query']} ---")
+        retrieved_items = await supabase_retrieve_context(state["query"], None)
+        state["retrieved_items"] = retrieved_items
+        state["recommendation"] = template_recommendation(state["query"], retrieved_items)
+        return state
+
+    async def analyze_user(self, query: str, signals: List[dict], user_id: Optional[str] = "anonymous", signal_features: Optional[Dict[str, Any]] = None, stages: Optional[FrozenSet[str]] = None, session_id: Optional[str] = None):
         """
         R&D Entry point for Intent Analysis.
         Now leverages the Cross-Domain Transfer Agent for solving Cold Start problems.
+        `signal_features` is the session's pre-aggregated signal summary (SignalStore),
+        shared by the Cross-Domain, UX and Profiler agents.
+        `stages` (see service_tiers) gates the UX Architect and Profiler stages.
+        Anonymous callers are profiled per `session_id` (see profile_key).
         """
         print("--- Analyzing User & Intent (Cross-Domain R&D) ---")
         
         # Call the specialized Cross-Domain Agent
-        persona = await cross_domain_agent.infer_persona(query, signals)
+        persona = await cross_domain_agent.infer_persona(query, signals, signal_features=signal_features)
         
         # --- R&D Phase 2: Profiler & UX Architect ---
         # Analyze interaction friction before finalizing persona
-        if signals:
-            ux_report = await ux_architect.analyze_interaction_signals(signals)
+        stages = stages if stages is not None else tier_stages("full")
+        if signals and "ux" in stages:
+            ux_report = await ux_architect.analyze_interaction_signals(signals, signal_features=signal_features)
             print(f"--- UX Architect Insights ---\n{ux_report}")
             
         # Update the User Soul (Universal Bridge)
-        await profiler_agent.update_user_soul(user_id, signals)
+        if "profiler" in stages:
+            await profiler_agent.update_user_soul(profile_key(user_id, session_id), signals, signal_features=signal_features)
         
         # Archival/R&D Logging: Map persona back to analysis structure
         analysis = persona.model_dump()
@@ -406,13 +632,13 @@ class Agent:
     async def generate_recommendation(self, query: str, analysis: dict, retrieved_items: List[dict], visual_items: List[dict] = []):
         print("--- Generating Recommendation ---")
         
-        context_str = json.dumps(retrieved_items) if retrieved_items else "No specific database matches found."
-        visuals_str = json.dumps(visual_items) if visual_items else "No visual matches."
+        context_str = dumps(retrieved_items) if retrieved_items else "No specific database matches found."
+        visuals_str = dumps(visual_items) if visual_items else "No visual matches."
         
         prompt = f"""
         Based on the following User Analysis and Retrieved Content, recommend a travel option.
         
-        ANALYSIS: {json.dumps(analysis)}
+        ANALYSIS: {dumps(analysis)}
         RETRIEVED CONTENT (Real DB Items): {context_str}
         VISUAL GALLERY (DB Images): {visuals_str}
         ORIGINAL QUERY: "{query}"
@@ -435,23 +661,20 @@ class Agent:
             from backend.utils.async_utils import retry_sync_in_thread
             response = await retry_sync_in_thread(generate_content_sync, prompt)
             text = response.text
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0].strip()
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0].strip()
-                
-            return json.loads(text)
+            return parse_llm_json(text)
         except Exception as e:
             print(f"rec gen failed: {e}")
             return {
                 "content": f"Here are some results for {query}",
                 "reasoning": "Fallback response due to generation error.",
-                "confidence": 0.5
+                "confidence": 0.5,
+                "fallback": True
             }
 
-    async def astream(self, state: Dict[str, Any]):
+    async def astream_events(self, state: Dict[str, Any]):
         """
-        Streamed version of the pipeline. Yields events as they happen.
+        Streamed version of the pipeline. Yields event dicts as they happen;
+        backend.utils.stream_encoding serializes them for the wire.
         Events:
         - status: Update UI progress
         - analysis: Intermediate thought process
@@ -460,54 +683,76 @@ class Agent:
         - done: Final completion
         """
         try:
-            # 0. R&D Scout (Proactive Autonomy) - STABILITY FIX: Timeout wrapper
-            yield json.dumps({"type": "agent_start", "agent": "scout", "data": "R&D Scout initiating research..."}) + "\n"
-            try:
-                scout_report = await asyncio.wait_for(
-                    research_agent.scout_best_practices(state["query"]),
-                    timeout=30.0
-                )
-            except asyncio.TimeoutError:
-                scout_report = "Scout unavailable due to timeout"
-                yield json.dumps({"type": "agent_timeout", "agent": "scout", "data": "Scout timed out"}) + "\n"
-            state["scout_report"] = scout_report
-            yield json.dumps({"type": "agent_complete", "agent": "scout", "data": "Research Complete"}) + "\n"
-
-            # 0b. R&D Memory (Check for past solutions) - STABILITY FIX: Timeout wrapper
-            yield json.dumps({"type": "agent_start", "agent": "memory", "data": "Consulting Memory..."}) + "\n"
-            try:
-                related_problems = await asyncio.wait_for(
-                    memory_agent.find_related_problems(state["query"]),
-                    timeout=30.0
-                )
-            except asyncio.TimeoutError:
-                related_problems = []
-                yield json.dumps({"type": "agent_timeout", "agent": "memory", "data": "Memory timed out"}) + "\n"
-            if related_problems:
-                 state["related_knowledge"] = related_problems
-            yield json.dumps({"type": "agent_complete", "agent": "memory", "data": f"Found {len(related_problems) if related_problems else 0} insights"}) + "\n"
+            tier = state.get("tier") or ("standard" if state.get("degraded") else DEFAULT_TIER)
+            stages = tier_stages(tier)
+            yield {"type": "tier", "data": tier}
+            if tier == "cache_only":
+                rec = await self.serve_cache_only(state)
+                posts = state.get("retrieved_items") or []
+                if posts:
+                    yield {"type": "posts", "data": posts}
+                yield {"type": "token", "data": rec["recommendation"]["content"]}
+                yield {"type": "done", "data": "complete"}
+                return
+
+            if "scout" in stages:
+                # 0. R&D Scout (Proactive Autonomy) - STABILITY FIX: Timeout wrapper
+                yield {"type": "agent_start", "agent": "scout", "data": "R&D Scout initiating research..."}
+                try:
+                    scout_report = await asyncio.wait_for(
+                        research_agent.scout_best_practices(state["query"]),
+                        timeout=budget_timeout(30.0)
+                    )
+                except asyncio.TimeoutError:
+                    scout_report = "Scout unavailable due to timeout"
+                    yield {"type": "agent_timeout", "agent": "scout", "data": "Scout timed out"}
+                state["scout_report"] = scout_report
+                yield {"type": "agent_complete", "agent": "scout", "data": "Research Complete"}
+            else:
+                state["scout_report"] = "Scout skipped (reduced service tier)"
+                yield {"type": "agent_skipped", "agent": "scout", "data": f"Skipped ({tier} tier)"}
+
+            if "memory" in stages:
+                # 0b. R&D Memory (Check for past solutions) - STABILITY FIX: Timeout wrapper
+                yield {"type": "agent_start", "agent": "memory", "data": "Consulting Memory..."}
+                try:
+                    related_problems = await asyncio.wait_for(
+                        memory_agent.find_related_problems(state["query"]),
+                        timeout=budget_timeout(30.0)
+                    )
+                except asyncio.TimeoutError:
+                    related_problems = []
+                    yield {"type": "agent_timeout", "agent": "memory", "data": "Memory timed out"}
+                if related_problems:
+                     state["related_knowledge"] = related_problems
+                yield {"type": "agent_complete", "agent": "memory", "data": f"Found {len(related_problems) if related_problems else 0} insights"}
+            else:
+                yield {"type": "agent_skipped", "agent": "memory", "data": f"Skipped ({tier} tier)"}
 
             # 1. Start Support
-            yield json.dumps({"type": "status", "data": "Reading Signals..."}) + "\n"
-            signals = await supabase_fetch_signals(state["session_id"])
+            yield {"type": "status", "data": "Reading Signals..."}
+            signal_state = await supabase_fetch_signals(state["session_id"])
+            signals = signal_state.signals
+            user_vector = await supabase_update_user_vector(state["session_id"], state.get("user_id"), signal_state)
             
             # 2. Analyze
-            yield json.dumps({"type": "status", "data": "Analyzing Vibe..."}) + "\n"
-            analysis = await self.analyze_user(state["query"], signals)
-            yield json.dumps({"type": "analysis", "data": analysis}) + "\n"
+            yield {"type": "status", "data": "Analyzing Vibe..."}
+            analysis = await self.analyze_user(state["query"], signals, state.get("user_id"), signal_state.features(), stages=stages, session_id=state["session_id"])
+            # Copy: consensus is added to `analysis` later and events may be encoded after that
+            yield {"type": "analysis", "data": dict(analysis)}
             
             # 2b. Save Memory
-            await supabase_save_profile(state["session_id"], state.get("user_id"), analysis)
+            await supabase_save_profile(state["session_id"], state.get("user_id"), analysis, user_vector)
             
             # 3. Retrieve
             search_q = analysis.get('intent') or state['query']
-            yield json.dumps({"type": "status", "data": f"Searching: {search_q}..."}) + "\n"
+            yield {"type": "status", "data": f"Searching: {search_q}..."}
             
-            tasks = [supabase_retrieve_context(search_q, analysis.get('lifestyleVibe'))]
+            tasks = [supabase_retrieve_context(search_q, analysis.get('lifestyleVibe'), user_vector, personalization_weight(analysis))]
             is_visual_intent = analysis.get("ui_directive") in ["immersion", "visual"] or \
                                any(k in search_q.lower() for k in ["look like", "photo", "image", "view", "scene"])
             
-            if is_visual_intent:
+            if is_visual_intent and "visual" in stages:
                 tasks.append(supabase_retrieve_visuals(search_q, analysis.get('lifestyleVibe')))
             
             results = await asyncio.gather(*tasks)
@@ -515,43 +760,57 @@ class Agent:
             visual_items = results[1] if len(results) > 1 else []
 
             # 3b. Consensus Judge
-            yield json.dumps({"type": "status", "data": "Verifying Consensus..."}) + "\n"
-            consensus = await consensus_agent.validate_alignment(
-                analysis, 
-                retrieved_items, 
-                visual_items,
-                state.get("scout_report", "No scout report available")
-            )
-            analysis["consensus"] = consensus.model_dump()
-            yield json.dumps({"type": "consensus", "data": analysis["consensus"]}) + "\n"
+            if "consensus" in stages:
+                yield {"type": "status", "data": "Verifying Consensus..."}
+                consensus = await consensus_agent.validate_alignment(
+                    analysis, 
+                    retrieved_items, 
+                    visual_items,
+                    state.get("scout_report", "No scout report available")
+                )
+                analysis["consensus"] = consensus.model_dump()
+                yield {"type": "consensus", "data": analysis["consensus"]}
             
             if retrieved_items:
-                 yield json.dumps({"type": "posts", "data": retrieved_items}) + "\n"
+                 yield {"type": "posts", "data": retrieved_items}
 
             if visual_items:
-                yield json.dumps({"type": "visuals", "data": visual_items}) + "\n"
+                yield {"type": "visuals", "data": visual_items}
             
             # 4. Stream Response
-            yield json.dumps({"type": "status", "data": "Generating Response..."}) + "\n"
+            yield {"type": "status", "data": "Generating Response..."}
             
+            tokens = []
             async for token in self.stream_recommendation(state["query"], analysis, retrieved_items, visual_items):
-                yield json.dumps({"type": "token", "data": token}) + "\n"
+                tokens.append(token)
+                yield {"type": "token", "data": token}
             
-            yield json.dumps({"type": "done", "data": "complete"}) + "\n"
+            consensus_score = (analysis.get("consensus") or {}).get("consensus_score")
+            await cache_recommendation(state["query"], {
+                "content": "".join(tokens),
+                "reasoning": f"Streamed recommendation for the {analysis.get('lifestyleVibe')} vibe.",
+                "confidence": consensus_score if isinstance(consensus_score, (int, float)) else 0.7
+            }, tier, scope=_personal_scope(state, signals, user_vector))
+            yield {"type": "done", "data": "complete"}
 
         except Exception as e:
-            yield json.dumps({"type": "error", "data": str(e)}) + "\n"
+            yield {"type": "error", "data": str(e)}
+
+    async def astream(self, state: Dict[str, Any]):
+        """NDJSON lines for astream_events (the original stream format)."""
+        async for event in self.astream_events(state):
+            yield dumps(event) + "\n"
 
     async def stream_recommendation(self, query: str, analysis: dict, retrieved_items: List[dict], visual_items: List[dict]):
         """
         Generates the final text response as a stream of tokens.
         """
-        context_str = json.dumps(retrieved_items) if retrieved_items else "No specific database matches found."
+        context_str = dumps(retrieved_items) if retrieved_items else "No specific database matches found."
         
         # We don't ask for JSON here, just natural text for the stream
         prompt = f"""
         ACT AS: Tripzy Agent.
-        CONTEXT: {json.dumps(analysis)}
+        CONTEXT: {dumps(analysis)}
         DB ITEMS: {context_str}
         VISUALS FOUND: {len(visual_items)} images.
         USER QUERY: "{query}"
@@ -562,9 +821,9 @@ class Agent:
         - Keep it concise.
         """
         
-        # Use streaming via new SDK
-        response = await asyncio.to_thread(generate_content_stream_sync, prompt)
-        # Stream returns a sync generator, iterate in thread
+        # The REST stream is a sync generator; consume it in a worker thread (quota is
+        # awaited on the loop first) and yield the chunks from here
+        response = await run_sync_in_thread(generate_content_chunks_sync, prompt)
         for chunk in response:
             if chunk.text:
                 yield chunk.text
@@ -1,14 +1,14 @@
 import os
-import json
 import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from supabase import create_client, Client
+from backend.utils.clients import get_supabase_client
 # SDK Migration: Using centralized genai_client
 from backend.utils.genai_client import generate_content_sync
-from dotenv import load_dotenv, find_dotenv
-load_dotenv(find_dotenv())
+from backend.utils.env import load_env
+load_env()
 from backend.utils.async_utils import retry_sync_in_thread
+from backend.utils.serialization import parse_llm_json
 
 class MediaGuardian:
     """
@@ -19,10 +19,13 @@ class MediaGuardian:
         self.supabase_url = os.getenv("VITE_SUPABASE_URL")
         self.supabase_key = os.getenv("VITE_SUPABASE_ANON_KEY")
         self.gemini_key = os.getenv("VITE_GEMINI_API_KEY")
-        
-        self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
         # Uses centralized genai_client (gemini-3.0-flash)
 
+    @property
+    def supabase(self):
+        # Built on first use: importing and constructing the client is slow
+        return get_supabase_client(self.supabase_url, self.supabase_key)
+
     async def generate_accessible_alt_text(self, image_url: str) -> str:
         """
         Generates WCAG 2.2 Level AA compliant alternative text for an image.
@@ -68,12 +71,7 @@ class MediaGuardian:
         
         response = await retry_sync_in_thread(generate_content_sync, prompt)
         text = response.text
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
-            
-        return json.loads(text)
+        return parse_llm_json(text)
 
     async def heal_media_library(self):
         """
@@ -1,14 +1,14 @@
 import os
-import json
 import asyncio
 from typing import List, Dict, Any, Optional
-from supabase import create_client, Client
+from backend.utils.clients import get_supabase_client
 # SDK Migration: Using centralized genai_client
 from backend.utils.genai_client import generate_content_sync, embed_content_sync
-from dotenv import load_dotenv, find_dotenv
+from backend.utils.env import load_env
 from backend.utils.async_utils import retry_sync_in_thread
+from backend.utils.serialization import parse_llm_json
 
-load_dotenv(find_dotenv())
+load_env()
 
 class MemoryAgent:
     """
@@ -22,10 +22,13 @@ class MemoryAgent:
         
         if not all([self.supabase_url, self.supabase_key, self.gemini_key]):
             raise ValueError("Missing environment variables for MemoryAgent")
-            
-        self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
         # Uses centralized genai_client (gemini-3.0-flash)
 
+    @property
+    def supabase(self):
+        # Built on first use: importing and constructing the client is slow
+        return get_supabase_client(self.supabase_url, self.supabase_key)
+
     async def get_embedding(self, text: str) -> List[float]:
         """Generates embedding for the given text using Gemini with retries."""
         result = await retry_sync_in_thread(
@@ -68,12 +71,7 @@ class MemoryAgent:
         text = response.text
         
         # Robust parsing
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
-            
-        return json.loads(text)
+        return parse_llm_json(text)
 
     async def index_problem(self, conversation_context: str, metadata: Dict[str, Any] = None):
         """Processes a problem, generates embeddings, and stores it in Supabase."""
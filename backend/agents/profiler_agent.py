@@ -1,13 +1,42 @@
 import os
-import json
+import time
 import asyncio
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
-from supabase import create_client, Client
+from backend.utils.clients import get_supabase_client
 # SDK Migration: Using centralized genai_client
 from backend.utils.genai_client import generate_content_sync
-from dotenv import load_dotenv, find_dotenv
-load_dotenv(find_dotenv())
+from backend.utils.env import load_env
+load_env()
 from backend.utils.async_utils import retry_sync_in_thread
+from backend.utils.preference_model import PreferenceState
+from backend.utils.serialization import dumps, parse_llm_json
+
+# --- Incremental Profile Upkeep ---
+# The LLM archetype synthesis only re-runs when the decayed preference state has
+# drifted far enough from the last synthesis, or on a slow schedule.
+PROFILE_DRIFT_THRESHOLD = float(os.getenv("PROFILE_DRIFT_THRESHOLD", "0.25"))
+PROFILE_RESYNTH_INTERVAL = float(os.getenv("PROFILE_RESYNTH_HOURS", "24")) * 3600
+MAX_TRACKED_PROFILES = 10000
+
+def profile_key(user_id: Optional[str], session_id: Optional[str]) -> str:
+    """Profile key: the user, or `session:<id>` for anonymous callers (never one shared profile)."""
+    if user_id and user_id != "anonymous":
+        return user_id
+    return f"session:{session_id}"
+
+def _is_session_key(key: str) -> bool:
+    return key.startswith("session:")
+
+class _UserProfile:
+    """In-memory profile state for one user."""
+    def __init__(self):
+        self.preferences = PreferenceState()
+        self.archetype: Optional[Dict[str, Any]] = None
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.synthesized_at = 0.0
+        self.signals_at_synthesis = 0
+        self.vector_loaded = False
 
 class ProfilerAgent:
     """
@@ -18,11 +47,46 @@ class ProfilerAgent:
         self.supabase_url = os.getenv("VITE_SUPABASE_URL")
         self.supabase_key = os.getenv("VITE_SUPABASE_ANON_KEY")
         self.gemini_key = os.getenv("VITE_GEMINI_API_KEY")
-        
-        self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
         # Uses centralized genai_client (gemini-3.0-flash)
+        self._profiles: "OrderedDict[str, _UserProfile]" = OrderedDict()
+        self.stats = {"synthesized": 0, "incremental": 0}
+
+    @property
+    def supabase(self):
+        # Built on first use: importing and constructing the client is slow
+        return get_supabase_client(self.supabase_url, self.supabase_key)
 
-    async def infer_psychographic_archetype(self, user_id: str, signals: List[dict]) -> Dict[str, Any]:
+    def get_profile(self, user_id: str) -> _UserProfile:
+        profile = self._profiles.get(user_id)
+        if profile is None:
+            profile = _UserProfile()
+            self._profiles[user_id] = profile
+            while len(self._profiles) > MAX_TRACKED_PROFILES:
+                self._profiles.popitem(last=False)
+        else:
+            self._profiles.move_to_end(user_id)
+        return profile
+
+    def observe_signals(self, user_id: str, signals: List[dict]) -> int:
+        """Folds signals newer than the profile cursor into the decayed state. O(new signals)."""
+        prefs = self.get_profile(user_id).preferences
+        new_rows = [
+            s for s in (signals or [])
+            if isinstance(s, dict) and (prefs.cursor is None or (s.get("created_at") or "") > prefs.cursor)
+        ]
+        for row in sorted(new_rows, key=lambda r: r.get("created_at") or ""):
+            prefs.observe_signal(row)
+        return len(new_rows)
+
+    def needs_synthesis(self, profile: _UserProfile) -> bool:
+        if profile.archetype is None:
+            return True
+        if profile.preferences.drift_from(profile.snapshot) >= PROFILE_DRIFT_THRESHOLD:
+            return True
+        has_new_signals = profile.preferences.signal_count > profile.signals_at_synthesis
+        return has_new_signals and (time.time() - profile.synthesized_at) >= PROFILE_RESYNTH_INTERVAL
+
+    async def infer_psychographic_archetype(self, user_id: str, signals: List[dict], signal_features: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Analyzes signals to map a user to a 2026 psychographic archetype.
         Implements behavioral drift detection and emotional resonance tracking.
@@ -32,18 +96,20 @@ class ProfilerAgent:
         
         historical_context = "No previous data."
         try:
-             history = await retry_sync_in_thread(
-                 self.supabase.table("user_archetypes").select("psychographics").eq("user_id", user_id).limit(5).execute
-             )
-             if history.data:
-                 historical_context = json.dumps(history.data)
+             # Anonymous sessions have no stored archetypes
+             if not _is_session_key(user_id):
+                 history = await retry_sync_in_thread(
+                     self.supabase.table("user_archetypes").select("psychographics").eq("user_id", user_id).limit(5).execute
+                 )
+                 if history.data:
+                     historical_context = dumps(history.data)
         except Exception:
              pass
 
         prompt = f"""
         ROLE: Senior Behavioral Architect (Tripzy ARRE).
         USER_ID: {user_id}
-        CURRENT_SIGNALS: {json.dumps(signals)}
+        CURRENT_SIGNALS: {dumps(signal_features) if signal_features else dumps(signals)}
         HISTORICAL_STATE: {historical_context}
         
         TASK: Synthesize the "User Soul" across three temporal dimensions.
@@ -66,19 +132,35 @@ class ProfilerAgent:
         
         response = await retry_sync_in_thread(generate_content_sync, prompt)
         text = response.text
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
-            
-        return json.loads(text)
-
-    async def update_user_soul(self, user_id: str, signals: List[dict]):
+        return parse_llm_json(text)
+
+    async def update_user_soul(self, user_id: str, signals: List[dict], signal_features: Optional[Dict[str, Any]] = None):
         """
         The R&D bridge: Updates the user's permanent psychographic vector in Supabase.
+        `user_id` is a profile_key(); anonymous sessions are profiled in memory only.
+        New signals are folded into the decayed preference state in O(1) each; the
+        LLM archetype synthesis (and upsert) only runs when drift crosses
+        PROFILE_DRIFT_THRESHOLD or PROFILE_RESYNTH_HOURS have passed.
         """
-        archetype_data = await self.infer_psychographic_archetype(user_id, signals)
+        profile = self.get_profile(user_id)
+        self.observe_signals(user_id, signals)
+
+        if not self.needs_synthesis(profile):
+            self.stats["incremental"] += 1
+            drift = profile.preferences.drift_from(profile.snapshot)
+            print(f"   [Profiler] Incremental update for {user_id} (drift {drift:.2f} < {PROFILE_DRIFT_THRESHOLD}); skipping synthesis")
+            return profile.archetype
+
+        archetype_data = await self.infer_psychographic_archetype(user_id, signals, signal_features)
+        self.stats["synthesized"] += 1
+        profile.archetype = archetype_data
+        profile.snapshot = profile.preferences.snapshot()
+        profile.synthesized_at = time.time()
+        profile.signals_at_synthesis = profile.preferences.signal_count
         
+        if _is_session_key(user_id):
+            return archetype_data
+
         data = {
             "user_id": user_id,
             "psychographics": archetype_data,
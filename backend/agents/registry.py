@@ -0,0 +1,105 @@
+"""
+Lazy Agent Registry
+
+Agent modules and their singletons are imported on first use instead of when
+graph.py (and therefore main.py) is imported. Each proxy forwards attribute
+access to the real singleton, so call sites keep the usual
+`memory_agent.find_related_problems(...)` form.
+
+`warm_up()` resolves everything ahead of time (e.g. in the background after the
+API has started accepting health checks).
+"""
+
+import time
+import importlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+# Singleton name -> module that defines it
+AGENT_MODULES: Dict[str, str] = {
+    "cross_domain_agent": "backend.agents.cross_domain_agent",
+    "visual_agent": "backend.agents.visual_intelligence_agent",
+    "consensus_agent": "backend.agents.consensus_agent",
+    "memory_agent": "backend.agents.memory_agent",
+    "research_agent": "backend.agents.research_agent",
+    "scribe_agent": "backend.agents.scribe_agent",
+    "scientist_agent": "backend.agents.scientist_agent",
+    "profiler_agent": "backend.agents.profiler_agent",
+    "media_guardian": "backend.agents.media_guardian",
+    "seo_scout": "backend.agents.seo_scout",
+    "ux_architect": "backend.agents.ux_architect",
+}
+
+
+class LazyAgent:
+    """Proxy for an agent singleton that is imported and built on first use."""
+    __slots__ = ("_name", "_module", "_instance", "_lock")
+
+    def __init__(self, name: str, module: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", module)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def resolve(self) -> Any:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    module = importlib.import_module(self._module)
+                    object.__setattr__(self, "_instance", getattr(module, self._name))
+        return self._instance
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.resolve(), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self.resolve(), attr, value)
+
+    def __delattr__(self, attr: str):
+        # mock.patch.object restores a patched method by deleting the override
+        delattr(self.resolve(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "lazy"
+        return f"<LazyAgent {self._name} ({state})>"
+
+
+_registry: Dict[str, LazyAgent] = {name: LazyAgent(name, module) for name, module in AGENT_MODULES.items()}
+
+
+def get_agent(name: str) -> Any:
+    return _registry[name].resolve()
+
+
+def loaded_agents() -> List[str]:
+    return [name for name, proxy in _registry.items() if proxy.is_loaded]
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Resolves agents (all by default); returns load time in ms per agent."""
+    timings = {}
+    for name in names or _registry:
+        started = time.perf_counter()
+        agent = _registry[name].resolve()
+        # Touch lazily built clients so the first request does not pay for them
+        if hasattr(type(agent), "supabase"):
+            getattr(agent, "supabase", None)
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+cross_domain_agent = _registry["cross_domain_agent"]
+visual_agent = _registry["visual_agent"]
+consensus_agent = _registry["consensus_agent"]
+memory_agent = _registry["memory_agent"]
+research_agent = _registry["research_agent"]
+scribe_agent = _registry["scribe_agent"]
+scientist_agent = _registry["scientist_agent"]
+profiler_agent = _registry["profiler_agent"]
+media_guardian = _registry["media_guardian"]
+seo_scout = _registry["seo_scout"]
+ux_architect = _registry["ux_architect"]
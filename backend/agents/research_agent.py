@@ -2,12 +2,29 @@ import os
 import asyncio
 from typing import List, Dict, Any, Optional
 # SDK Migration: Using centralized genai_client
-from backend.utils.genai_client import generate_content_sync
-from dotenv import load_dotenv, find_dotenv
-from tavily import AsyncTavilyClient
-from backend.utils.async_utils import retry_sync_in_thread, retry_async
+from backend.utils.genai_client import generate_content_sync, coalescer
+from backend.utils.env import load_env
+from backend.utils.clients import get_tavily_client
+from backend.utils.async_utils import retry_sync_in_thread, retry_async, remaining_budget, AdaptiveLimiter
+from backend.utils.query_classifier import query_classifier
+from backend.utils.scout_cache import scout_cache, DegradedReport
+from backend.utils.serialization import parse_llm_json
 
-load_dotenv(find_dotenv())
+load_env()
+
+# Patent scouting fan-out
+TAVILY_MAX_CONCURRENT = 4
+PATENT_SCOUT_DEADLINE = 45.0
+
+COST_GUARD_INSTRUCTION = """
+        ACT AS: Research Cost Guard & Tech Radar.
+
+        DECISION LOGIC:
+        - Is this a coding question, library choice, or architectural pattern? -> LIVE_SEARCH_REQUIRED (Maintain 2026 compliance)
+        - Does it ask for current events, prices, openings, or post-2025 info? -> LIVE_SEARCH_REQUIRED
+        - Is it about specific local businesses that might close? -> LIVE_SEARCH_REQUIRED
+        - Is it a general travel question, history, or culture? -> INTERNAL_KNOWLEDGE_SUFFICIENT
+        """
 
 class ResearchAgent:
     """
@@ -23,44 +40,64 @@ class ResearchAgent:
         
         # Uses centralized genai_client (gemini-3.0-flash)
         
-        if self.tavily_key:
-            self.tavily = AsyncTavilyClient(api_key=self.tavily_key)
-        else:
-            self.tavily = None
+        self._tavily = None
+        if not self.tavily_key:
             print("Warning: Tavily API Key missing. ResearchAgent will rely on internal logic.")
 
-    async def analyze_query_needs(self, query: str) -> str:
-        """Analyzes if a query requires live web data with retries."""
-        prompt = f"""
-        ACT AS: Research Cost Guard & Tech Radar.
-        QUERY: "{query}"
+    @property
+    def tavily(self):
+        # Built on first use: importing the Tavily SDK is slow
+        if self._tavily is None and self.tavily_key:
+            self._tavily = get_tavily_client(self.tavily_key)
+        return self._tavily
 
-        DECISION LOGIC:
-        - Is this a coding question, library choice, or architectural pattern? -> LIVE_SEARCH_REQUIRED (Maintain 2026 compliance)
-        - Does it ask for current events, prices, openings, or post-2025 info? -> LIVE_SEARCH_REQUIRED
-        - Is it about specific local businesses that might close? -> LIVE_SEARCH_REQUIRED
-        - Is it a general travel question, history, or culture? -> INTERNAL_KNOWLEDGE_SUFFICIENT
+    @tavily.setter
+    def tavily(self, client):
+        self._tavily = client
 
-        OUTPUT ONE STRING ONLY:
-        LIVE_SEARCH_REQUIRED
-        or
-        INTERNAL_KNOWLEDGE_SUFFICIENT
+    async def analyze_query_needs(self, query: str) -> str:
         """
+        Analyzes if a query requires live web data with retries.
+        Common cases are answered by the local classifier; only low-confidence
+        queries fall back to Gemini (coalesced into one multi-item call).
+        """
+        decision, confidence = query_classifier.classify(query)
+        if decision:
+            print(f"[ICON] Cost Guard (local, {confidence:.2f}): {decision} | Local hit rate: {query_classifier.hit_rate():.0%}")
+            return decision
+
         try:
-            response = await retry_sync_in_thread(generate_content_sync, prompt)
-            decision = response.text.strip()
-            if "LIVE" in decision: return "LIVE_SEARCH_REQUIRED"
-            return "INTERNAL_KNOWLEDGE_SUFFICIENT"
+            decision = await coalescer.classify(
+                query,
+                instruction=COST_GUARD_INSTRUCTION,
+                labels=["LIVE_SEARCH_REQUIRED", "INTERNAL_KNOWLEDGE_SUFFICIENT"],
+                default=None
+            )
         except Exception:
             return "INTERNAL_KNOWLEDGE_SUFFICIENT"
+        if decision is None:
+            # Unparseable answer: use the safe default but do not train on it
+            return "INTERNAL_KNOWLEDGE_SUFFICIENT"
+
+        # Every parsed LLM decision becomes a training sample for the local model
+        query_classifier.record(query, decision)
+        return decision
 
     async def scout_best_practices(self, topic: str) -> str:
-        """Scouts web for patterns with jittered retries and timeouts."""
+        """
+        Scouts web for patterns with jittered retries and timeouts.
+        Reports are cached per normalized topic (TTL + stale-while-revalidate).
+        """
+        return await scout_cache.get_or_build(topic, self._build_scout_report)
+
+    async def _build_scout_report(self, topic: str) -> str:
+        """Runs the live search + Gemini synthesis behind scout_best_practices."""
         decision = await self.analyze_query_needs(topic)
         print(f"[ICON] Cost Guard Decision for '{topic}': {decision}")
 
         search_query = f"best practices for {topic} 2026 technical implementation guide architecture"
         search_results = ""
+        degraded = False
 
         if self.tavily and decision == "LIVE_SEARCH_REQUIRED":
             try:
@@ -71,6 +108,7 @@ class ResearchAgent:
             except Exception as e:
                 print(f"Tavily Search Failed: {e}")
                 search_results = "Live search failed. Relying on internal knowledge."
+                degraded = True
         else:
             search_results = "Internal Knowledge Mode (Cost Guard Optimized or No Key)."
 
@@ -92,29 +130,65 @@ class ResearchAgent:
         """
         
         response = await retry_sync_in_thread(generate_content_sync, prompt)
-        return response.text
+        # Without its live sources the report is only cached briefly
+        return DegradedReport(response.text) if degraded else response.text
 
-    async def scout_patents(self, features: List[str]) -> str:
-        """Scouts for patents with batch-level reliability."""
-        patent_report = ""
-        
-        for feature in features:
+    async def scout_patents(self, features: List[str], deadline: float = PATENT_SCOUT_DEADLINE) -> str:
+        """
+        Scouts for patents with a bounded-concurrency fan-out.
+        Tavily calls share the 'tavily_api' AdaptiveLimiter; sections keep the
+        order of `features`, and failed or late features degrade to a note
+        instead of sinking the whole report. `deadline` is capped to the request budget.
+        """
+        tavily_limiter = AdaptiveLimiter("tavily_api", max_concurrent=TAVILY_MAX_CONCURRENT)
+
+        async def _scout_feature(feature: str) -> str:
             decision = await self.analyze_query_needs(f"patents for {feature}")
             print(f"[ICON]️ Patent Scout Decision for '{feature}': {decision}")
-            
+
+            if not (self.tavily and decision == "LIVE_SEARCH_REQUIRED"):
+                return f"\n### {feature}: Internal Knowledge Check (No Live Search)\n"
+
             search_query = f"patents google patents wipo {feature} autonomous agent ai system method 2024 2025"
-            
-            if self.tavily and decision == "LIVE_SEARCH_REQUIRED":
-                try:
-                    response = await retry_async(self.tavily.search, query=search_query, search_depth="advanced")
-                    patent_report += f"\n### Patent Search: {feature}\n"
-                    for result in response['results']:
-                        patent_report += f"- **Source:** {result['url']}\n  - **Snippet:** {result['content']}\n"
-                except Exception as e:
-                    print(f"Tavily Patent Search Failed: {e}")
-                    patent_report += f"\n### {feature}: Search Failed (Internal Logic Only)\n"
+
+            async def _search():
+                # Limiter slot per attempt: it is not held through the retry backoff
+                async with tavily_limiter:
+                    return await self.tavily.search(query=search_query, search_depth="advanced")
+
+            try:
+                response = await retry_async(_search)
+            except Exception as e:
+                print(f"Tavily Patent Search Failed: {e}")
+                return f"\n### {feature}: Search Failed (Internal Logic Only)\n"
+
+            section = f"\n### Patent Search: {feature}\n"
+            for result in response['results']:
+                section += f"- **Source:** {result['url']}\n  - **Snippet:** {result['content']}\n"
+            return section
+
+        tasks = [asyncio.ensure_future(_scout_feature(feature)) for feature in features]
+        if not tasks:
+            return ""
+
+        budget = remaining_budget()
+        if budget is not None:
+            deadline = max(0.0, min(deadline, budget))
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"[WARNING] Patent Scout deadline ({deadline:.2f}s) hit: {len(pending)}/{len(tasks)} features incomplete")
+
+        patent_report = ""
+        for feature, task in zip(features, tasks):
+            if task in pending:
+                patent_report += f"\n### {feature}: Search Timed Out (Internal Logic Only)\n"
+            elif task.exception() is not None:
+                print(f"Patent Scout Failed for '{feature}': {task.exception()}")
+                patent_report += f"\n### {feature}: Search Failed (Internal Logic Only)\n"
             else:
-                patent_report += f"\n### {feature}: Internal Knowledge Check (No Live Search)\n"
+                patent_report += task.result()
 
         return patent_report
     
@@ -136,15 +210,9 @@ class ResearchAgent:
         }}
         """
         
-        import json
         response = await retry_sync_in_thread(generate_content_sync, prompt)
         text = response.text
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
-            
-        return json.loads(text)
+        return parse_llm_json(text)
 
 # Singleton instance
 research_agent = ResearchAgent()
@@ -1,17 +1,17 @@
 import os
-import json
 import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 # SDK Migration: Using centralized genai_client
 from backend.utils.genai_client import generate_content_sync
-from dotenv import load_dotenv, find_dotenv
-load_dotenv(find_dotenv())
+from backend.utils.env import load_env
+load_env()
 
 # Collaborative Agency: Import the Scout and Memory
 from backend.agents.research_agent import research_agent
 from backend.agents.memory_agent import memory_agent
 from backend.utils.async_utils import retry_sync_in_thread
+from backend.utils.serialization import dumps, loads, JSONDecodeError, extract_json_text
 
 class ScientistAgent:
     """
@@ -89,7 +89,7 @@ class ScientistAgent:
     {standards_report}
     
     **INPUT DATA (Milestones & Decisions):** 
-    {json.dumps(milestones, indent=2)}
+    {dumps(milestones, indent=True)}
     
     **INSTRUCTIONS:**
     1. **Branding**: Use high-value proprietary nomenclature (e.g., 'Stochastic Agentic Orchestration', 'Cross-Domain Aesthetic Transfer').
@@ -173,7 +173,7 @@ class ScientistAgent:
         prompt = f"""
         ROLE: Intellectual Property (IP) Analyst & Tech Scout.
         **Timestamp**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} (UTC+3)
-        QUERY_CONTEXT: {json.dumps(patent_data)}
+        QUERY_CONTEXT: {dumps(patent_data)}
         
         TASK: Conduct a "Patent Landscape Analysis" for the proposed ARRE innovations.
         
@@ -201,7 +201,7 @@ class ScientistAgent:
         prompt = f"""
         ROLE: Chief Scientist (R&D Audit).
         ACTION_SUMMARY: {task_summary}
-        AGENT_STATE: {json.dumps(current_state)}
+        AGENT_STATE: {dumps(current_state)}
         
         TASK: Audit this development change for "Architectural Drift" or "Technical Debt."
         
@@ -267,14 +267,11 @@ class ScientistAgent:
         text = response.text
         
         # Clean JSON response
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
+        text = extract_json_text(text)
             
         try:
-            return json.loads(text)
-        except json.JSONDecodeError as e:
+            return loads(text)
+        except JSONDecodeError as e:
             print(f"[WARNING] [Scientist] JSON Parse Error: {e}")
             # Fallback to current data or a minimal set
             return {
@@ -303,7 +300,7 @@ class ScientistAgent:
         prompt = f"""
         ROLE: Chief Scientist (Autonomous R&D Hook).
         CONTEXT (Recent Milestones):
-        {json.dumps(recent_milestones, indent=2)}
+        {dumps(recent_milestones, indent=True)}
         
         TASK: Determine if these milestones represent a "Significant Phase Completion" or "Major Breakthrough" (e.g., R&D 2.0, SDK Migration, Core Reliability Refactor).
         
@@ -318,12 +315,9 @@ class ScientistAgent:
         try:
             response = await retry_sync_in_thread(generate_content_sync, prompt)
             data = response.text
-            if "```json" in data:
-                data = data.split("```json")[1].split("```")[0].strip()
-            elif "```" in data:
-                data = data.split("```")[1].split("```")[0].strip()
+            data = extract_json_text(data)
             
-            decision = json.loads(data if "{" in data else "{}")
+            decision = loads(data if "{" in data else "{}")
             
             if decision.get("is_major_breakthrough"):
                 print(f"   [Scientist] [START] MAJOR BREAKTHROUGH DETECTED: {decision.get('reasoning')}")
@@ -1,13 +1,13 @@
 import os
-import json
 import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 # SDK Migration: Using centralized genai_client
 from backend.utils.genai_client import generate_content_sync
-from dotenv import load_dotenv, find_dotenv
-load_dotenv(find_dotenv())
+from backend.utils.env import load_env
+load_env()
 from backend.utils.async_utils import retry_sync_in_thread
+from backend.utils.serialization import dumps, loads, extract_json_text
 
 class ScribeAgent:
     """
@@ -74,7 +74,7 @@ class ScribeAgent:
         prompt = f"""
         Analyze this task completion:
         Task: {task_summary}
-        State: {json.dumps(current_state, default=str)}
+        State: {dumps(current_state)}
         Mode: {"DEVELOPMENT" if is_dev_mode else "USER_SESSION"}
         
         Does this represent a "Significant Architectural Decision" or a "Major Implementation Phase" that requires a new R&D design log?
@@ -92,13 +92,10 @@ class ScribeAgent:
         
         response = await retry_sync_in_thread(generate_content_sync, prompt)
         text = response.text
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
+        text = extract_json_text(text)
             
         try:
-            decision = json.loads(text)
+            decision = loads(text)
             if decision['should_log']:
                 return await self.draft_design_log(
                     decision['milestone_name'], 
@@ -1,20 +1,18 @@
 import os
-import json
 import asyncio
 import logging
 from typing import List, Dict, Any, Optional
 # SDK Migration: Using centralized genai_client
 from backend.utils.genai_client import generate_content_sync
-from dotenv import load_dotenv, find_dotenv
-from tavily import AsyncTavilyClient
+from backend.utils.env import load_env
+from backend.utils.clients import get_tavily_client
 from backend.utils.async_utils import retry_sync_in_thread, retry_async
+from backend.utils.serialization import loads, JSONDecodeError, extract_json_text
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("SEOScout")
 
 # Load environment variables
-load_dotenv(find_dotenv())
+load_env()
 
 class SEOScout:
     """
@@ -35,15 +33,23 @@ class SEOScout:
             self._gemini_ready = False
             logger.warning("[INIT] VITE_GEMINI_API_KEY missing.")
 
-        # Initialize Tavily
-        if self.tavily_key:
-            self.tavily = AsyncTavilyClient(api_key=self.tavily_key)
-            logger.info("[INIT] Tavily client ready.")
-        else:
-            self.tavily = None
+        # Tavily client is created on first use
+        self._tavily = None
+        if not self.tavily_key:
             logger.warning("[INIT] TAVILY_API_KEY missing. Fallback mode enabled.")
         logger.info("[INIT] SEOScout initialization complete.")
 
+    @property
+    def tavily(self):
+        # Built on first use: importing the Tavily SDK is slow
+        if self._tavily is None and self.tavily_key:
+            self._tavily = get_tavily_client(self.tavily_key)
+        return self._tavily
+
+    @tavily.setter
+    def tavily(self, client):
+        self._tavily = client
+
     async def audit_content_for_aio(self, content_text: str) -> Dict[str, Any]:
         """Audits content for AI Visibility with robust error handling and timeouts."""
         if not self._gemini_ready:
@@ -109,26 +115,23 @@ class SEOScout:
 
     def _extract_json(self, text: str) -> Any:
         """Helper to robustly extract JSON from AI response"""
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
+        text = extract_json_text(text)
         
         try:
-            return json.loads(text)
-        except json.JSONDecodeError:
+            return loads(text)
+        except JSONDecodeError:
             start = text.find('{')
             end = text.rfind('}')
             if start != -1 and end != -1:
                 try:
-                    return json.loads(text[start:end+1])
+                    return loads(text[start:end+1])
                 except:
                     pass
             start_list = text.find('[')
             end_list = text.rfind(']')
             if start_list != -1 and end_list != -1:
                  try:
-                    return json.loads(text[start_list:end_list+1])
+                    return loads(text[start_list:end_list+1])
                  except:
                     pass
             logger.error(f"Failed to parse JSON: {text[:100]}...")
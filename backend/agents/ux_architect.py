@@ -1,12 +1,12 @@
 import os
-import json
 import asyncio
 from typing import List, Dict, Any, Optional
 # SDK Migration: Using centralized genai_client
 from backend.utils.genai_client import generate_content_sync
-from dotenv import load_dotenv, find_dotenv
-load_dotenv(find_dotenv())
+from backend.utils.env import load_env
+load_env()
 from backend.utils.async_utils import retry_sync_in_thread
+from backend.utils.serialization import dumps, parse_llm_json
 
 class UXArchitect:
     """
@@ -17,12 +17,13 @@ class UXArchitect:
         self.gemini_key = os.getenv("VITE_GEMINI_API_KEY")
         # Uses centralized genai_client (gemini-3.0-flash)
 
-    async def analyze_interaction_signals(self, logs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def analyze_interaction_signals(self, logs: List[Dict[str, Any]], signal_features: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Analyzes raw interaction logs (scroll depth, rage clicks, hesitation) 
         to identify design friction.
+        Prefers the pre-aggregated session `signal_features` when available.
         """
-        logs_json = json.dumps(logs)
+        logs_json = dumps(signal_features) if signal_features else dumps(logs)
         
         prompt = f"""
         ROLE: Lead Interface Architect (Tripzy ARRE).
@@ -47,12 +48,7 @@ class UXArchitect:
         
         response = await retry_sync_in_thread(generate_content_sync, prompt)
         text = response.text
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
-            
-        return json.loads(text)
+        return parse_llm_json(text)
 
     async def predict_layout_performance(self, component_structure: str) -> Dict[str, Any]:
         """
@@ -80,12 +76,7 @@ class UXArchitect:
         
         response = await retry_sync_in_thread(generate_content_sync, prompt)
         text = response.text
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
-            
-        return json.loads(text)
+        return parse_llm_json(text)
 
 # Singleton instance
 ux_architect = UXArchitect()
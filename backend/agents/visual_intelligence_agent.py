@@ -1,13 +1,13 @@
 import os
-import json
 from typing import List, Dict, Any
 from pydantic import BaseModel, Field
 from backend.utils.genai_client import generate_content_sync
 from backend.utils.async_utils import retry_sync_in_thread
 from backend.utils.visual_memory import VisualMemory
-from dotenv import load_dotenv, find_dotenv
+from backend.utils.env import load_env
+from backend.utils.serialization import dumps
 
-load_dotenv(find_dotenv())
+load_env()
 
 # --- Configuration ---
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
@@ -36,7 +36,7 @@ class VisualIntelligenceAgent:
         prompt = f"""
         ROLE: Lead Visual Architect (Tripzy ARRE).
         QUERY: {query}
-        CANDIDATE_SCENES: {json.dumps(matches, indent=2)}
+        CANDIDATE_SCENES: {dumps(matches, indent=True)}
         
         TASK: Conduct an "Aesthetic Alignment Audit" for these candidate visuals.
         
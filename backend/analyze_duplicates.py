@@ -3,6 +3,7 @@ import os
 import asyncio
 import aiohttp
 from dotenv import load_dotenv, find_dotenv
+from backend.utils.perceptual_hash import group_near_duplicates
 
 load_dotenv(find_dotenv())
 
@@ -53,7 +54,25 @@ async def analyze():
         for item in items:
             print(f"  - ID: {item['id']} | File: {item['filename']} | Created: {item['created_at']}")
 
+async def analyze_perceptual():
+    # Near-duplicates by image content (phash/dhash set at ingest), whatever their filenames
+    url = f"{SUPABASE_URL}/rest/v1/media?select=id,filename,url,phash,dhash,created_at&phash=not.is.null&order=created_at.asc"
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, headers=HEADERS) as resp:
+            if resp.status != 200:
+                print(f"Error: {await resp.text()}")
+                return
+            rows = await resp.json()
+
+    groups = group_near_duplicates(rows)
+    print(f"\nPerceptual: {len(rows)} hashed files, {len(groups)} near-duplicate groups.")
+    for items in groups:
+        print(f"\nKeep: {items[0]['id']} | File: {items[0]['filename']} | Created: {items[0]['created_at']}")
+        for item in items[1:]:
+            print(f"  - Duplicate: {item['id']} | File: {item['filename']} | Created: {item['created_at']}")
+
 if __name__ == "__main__":
     if os.name == 'nt':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     asyncio.run(analyze())
+    asyncio.run(analyze_perceptual())
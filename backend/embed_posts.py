@@ -18,7 +18,7 @@ from backend.utils.genai_client import embed_content_sync
 from backend.utils.async_utils import (
     retry_async, 
     retry_sync_in_thread, 
-    GlobalRateLimiter,
+    AdaptiveLimiter,
     wait_with_timeout
 )
 
@@ -46,9 +46,9 @@ if not SUPABASE_URL or not GEMINI_KEY:
 
 # Uses centralized genai_client (gemini-3.0-flash)
 
-# Initialize Rate Limiters
-db_limiter = GlobalRateLimiter("supabase_io", max_concurrent=5)
-ai_limiter = GlobalRateLimiter("gemini_api", max_concurrent=2)
+# Initialize Rate Limiters (adaptive: the values below only seed the AIMD limit)
+db_limiter = AdaptiveLimiter("supabase_io", max_concurrent=5)
+ai_limiter = AdaptiveLimiter("gemini_api", max_concurrent=2)
 
 # --- Supabase Client ---
 class SupabaseClient:
@@ -83,15 +83,21 @@ class SupabaseClient:
         payload = {"embedding": vector}
         
         async def _update():
-            async with session.patch(url, headers=self.headers, json=payload) as resp:
-                if resp.status not in (200, 204):
-                    logger.error(f"[ERROR] Failed to save {post_id}: {await resp.text()}")
-                    return False
-                return True
+            # Use DB limiter per attempt so throttling feeds back into the limit
+            async with db_limiter:
+                async with session.patch(url, headers=self.headers, json=payload) as resp:
+                    if resp.status == 429 or resp.status >= 500:
+                        resp.raise_for_status()
+                    if resp.status not in (200, 204):
+                        logger.error(f"[ERROR] Failed to save {post_id}: {await resp.text()}")
+                        return False
+                    return True
         
-        # Use DB limiter to prevent overwhelming Supabase
-        async with db_limiter:
+        try:
             return await retry_async(_update)
+        except Exception as e:
+            logger.error(f"[ERROR] Failed to save {post_id}: {e}")
+            return False
 
 # --- Core Processing Logic ---
 async def process_next_batch(supabase: SupabaseClient) -> int:
@@ -119,17 +125,18 @@ async def process_next_batch(supabase: SupabaseClient) -> int:
 
     # 3. Generate embeddings (batch call via thread utility)
     try:
-        async with ai_limiter:
-            vectors_data = await retry_sync_in_thread(
-                embed_content_sync,
-                batch_texts
-            )
-            
-            # Extract list of vectors - new SDK uses .embeddings[].values
-            if hasattr(vectors_data, 'embeddings'):
-                vectors = [e.values for e in vectors_data.embeddings]
-            else:
-                raise Exception("Unknown Gemini response format")
+        # embed_content_sync is tagged with the 'gemini_api' upstream, so each
+        # attempt runs under ai_limiter's adaptive limit
+        vectors_data = await retry_sync_in_thread(
+            embed_content_sync,
+            batch_texts
+        )
+        
+        # Extract list of vectors - new SDK uses .embeddings[].values
+        if hasattr(vectors_data, 'embeddings'):
+            vectors = [e.values for e in vectors_data.embeddings]
+        else:
+            raise Exception("Unknown Gemini response format")
                 
     except Exception as e:
         logger.error(f"Gemini Error: {e}")
@@ -12,6 +12,7 @@ from backend.utils.genai_client import generate_content_sync
 from datetime import datetime
 from dotenv import load_dotenv, find_dotenv
 from utils.visual_memory import VisualMemory
+from backend.utils.transcode_pool import transcode_pool
 
 # Load Env
 load_dotenv(find_dotenv())
@@ -84,18 +85,19 @@ async def post_process_images_in_content(content, post_title=""):
     matches = re.findall(img_pattern, content, flags=re.IGNORECASE)
     
     new_content = content
-    
+
+    # Parse "Term | Caption" or just "Term"
+    placeholders = []
     for match_str in matches:
         print(f"   [IMAGE]  Processing Placeholder: {match_str}")
-        
-        # Parse "Term | Caption" or just "Term"
         parts = match_str.split('|')
         search_term = parts[0].strip()
-        caption_text = parts[1].strip() if len(parts) > 1 else search_term
+        placeholders.append((match_str, search_term, parts[1].strip() if len(parts) > 1 else search_term))
 
-        # Search & Ingest using the search term
-        internal_url = await fetch_featured_image(search_term)
-        
+    # Search & Ingest all placeholders concurrently (transcoding runs in the worker processes)
+    internal_urls = await asyncio.gather(*[fetch_featured_image(term) for _, term, _ in placeholders])
+
+    for (match_str, search_term, caption_text), internal_url in zip(placeholders, internal_urls):
         if internal_url:
             # Create HTML with fancy caption
             html = f"""
@@ -405,16 +407,21 @@ if __name__ == "__main__":
     print("4. Autonomous Trend Mode (AI Research)")
     
     choice = input("Enter choice (1-4): ").strip()
-    
-    if choice == '1':
-        asyncio.run(main())
-    elif choice == '2':
-        asyncio.run(fix_images_main())
-    elif choice == '3':
-        asyncio.run(interactive_mode())
-    elif choice == '4':
-        asyncio.run(autonomous_mode())
-    else:
-        print("Invalid choice.")
+
+    # Fork the transcode workers before any threads or sessions exist
+    transcode_pool.start()
+    try:
+        if choice == '1':
+            asyncio.run(main())
+        elif choice == '2':
+            asyncio.run(fix_images_main())
+        elif choice == '3':
+            asyncio.run(interactive_mode())
+        elif choice == '4':
+            asyncio.run(autonomous_mode())
+        else:
+            print("Invalid choice.")
+    finally:
+        transcode_pool.shutdown()
 
 
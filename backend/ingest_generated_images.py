@@ -5,6 +5,8 @@ import re
 import aiohttp
 from dotenv import load_dotenv
 from utils.visual_memory import VisualMemory
+from backend.utils.clients import close_http_session
+from backend.utils.transcode_pool import transcode_pool
 
 # Load env variables
 load_dotenv()
@@ -13,6 +15,7 @@ SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 UNSPLASH_KEY = os.getenv("VITE_UNSPLASH_ACCESS_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
 
 if not all([SUPABASE_URL, SUPABASE_KEY, UNSPLASH_KEY]):
     print("[ERROR] Missing Credentials (Supabase or Unsplash)")
@@ -60,55 +63,74 @@ async def main():
 
     print(f"[ICON] Found {len(posts)} posts. Scanning for weak assets...")
 
-    for post in posts:
-        is_updated = False
-        updates = {}
+    # Posts are processed concurrently; transcoding fans out over the worker processes
+    semaphore = asyncio.Semaphore(INGEST_CONCURRENCY)
+
+    async def _bounded(post):
+        async with semaphore:
+            await process_post(post)
+
+    try:
+        await asyncio.gather(*[_bounded(post) for post in posts])
+    finally:
+        await close_http_session()
+
+async def process_post(post):
+    is_updated = False
+    updates = {}
+    
+    # 1. Handle Featured Image
+    f_img = post.get('featured_image')
+    # Only ingest if it's an external URL (Unsplash, Pollinations, etc) and NOT already Supabase
+    if f_img and f_img.startswith("http") and "supabase" not in f_img:
+        print(f"\n[{post['title']}] Ingesting Featured Image...")
         
-        # 1. Handle Featured Image
-        f_img = post.get('featured_image')
-        # Only ingest if it's an external URL (Unsplash, Pollinations, etc) and NOT already Supabase
-        if f_img and f_img.startswith("http") and "supabase" not in f_img:
-            print(f"\n[{post['title']}] Ingesting Featured Image...")
-            
-            # INGEST LOGIC
-            new_url = await visual_memory.ingest_image(f_img, post['title'], post.get('tags', []))
-            
-            if new_url != f_img:
-                updates['featured_image'] = new_url
-                is_updated = True
-
-        # 2. Handle Content Images
-        content = post.get('content') or ""
-        # Find all src="..." that are NOT supabase
-        matches = re.findall(r'src="(https?://[^"]+)"', content)
-        external_matches = [m for m in matches if "supabase" not in m]
+        # INGEST LOGIC
+        new_url = await visual_memory.ingest_image(f_img, post['title'], post.get('tags', []))
         
-        if external_matches:
-            print(f"\n[{post['title']}] Processing {len(external_matches)} Content Images...")
-            new_content = content
-            for img_url in set(external_matches):
-                
-                # INGEST
-                new_img_url = await visual_memory.ingest_image(img_url, post['title'], post.get('tags', []))
-                
-                if new_img_url != img_url:
-                    new_content = new_content.replace(img_url, new_img_url)
-            
-            if new_content != content:
-                updates['content'] = new_content
-                is_updated = True
-
-        if is_updated:
-            print(f"   [SAVE] Updating Post Record...")
-            async with aiohttp.ClientSession() as session:
-                url = f"{SUPABASE_URL}/rest/v1/posts?id=eq.{post['id']}"
-                async with session.patch(url, headers=HEADERS_BLOG, json=updates) as resp:
-                    print(f"      [OK] Saved. (Status: {resp.status})")
+        if new_url != f_img:
+            updates['featured_image'] = new_url
+            is_updated = True
+
+    # 2. Handle Content Images
+    content = post.get('content') or ""
+    # Find all src="..." that are NOT supabase
+    matches = re.findall(r'src="(https?://[^"]+)"', content)
+    external_matches = [m for m in matches if "supabase" not in m]
+    
+    if external_matches:
+        print(f"\n[{post['title']}] Processing {len(external_matches)} Content Images...")
+        new_content = content
+        unique_urls = list(set(external_matches))
+
+        # INGEST (all images of the post at once)
+        new_urls = await asyncio.gather(
+            *[visual_memory.ingest_image(img_url, post['title'], post.get('tags', [])) for img_url in unique_urls]
+        )
+        for img_url, new_img_url in zip(unique_urls, new_urls):
+            if new_img_url != img_url:
+                new_content = new_content.replace(img_url, new_img_url)
         
-        await asyncio.sleep(0.5)
+        if new_content != content:
+            updates['content'] = new_content
+            is_updated = True
+
+    if is_updated:
+        print(f"   [SAVE] Updating Post Record...")
+        async with aiohttp.ClientSession() as session:
+            url = f"{SUPABASE_URL}/rest/v1/posts?id=eq.{post['id']}"
+            async with session.patch(url, headers=HEADERS_BLOG, json=updates) as resp:
+                print(f"      [OK] Saved. (Status: {resp.status})")
+    
+    await asyncio.sleep(0.5)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Fork the transcode workers before any threads or sessions exist
+    transcode_pool.start()
+    try:
+        asyncio.run(main())
+    finally:
+        transcode_pool.shutdown()
 
 
 
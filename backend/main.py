@@ -1,12 +1,12 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 import uvicorn
 import os
 import signal
+import asyncio
 import sys
-from dotenv import load_dotenv
 import datetime
 
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -14,7 +14,8 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
-load_dotenv()
+from backend.utils.env import load_env
+load_env()
 
 # Mandatory UTF-8 for Windows stability
 if sys.platform == 'win32':
@@ -37,10 +38,19 @@ def handle_exit(sig, frame):
 signal.signal(signal.SIGINT, handle_exit)
 signal.signal(signal.SIGTERM, handle_exit)
 
-# Initialize Rate Limiter
-limiter = Limiter(key_func=get_remote_address)
-
-app = FastAPI(title="Tripzy Reasoning Engine API")
+# Initialize Rate Limiter (counters live in the shared state backend so all workers agree).
+# A counter store that is briefly locked or unreachable lets the request through
+# instead of failing it.
+from backend.utils.shared_state import shared_state, is_shared, limiter_storage_uri
+limiter = Limiter(key_func=get_remote_address, storage_uri=limiter_storage_uri(), swallow_errors=True)
+
+# orjson-backed responses when available (serialization.py falls back to the stdlib)
+from fastapi.responses import JSONResponse, ORJSONResponse
+from backend.utils.serialization import HAS_ORJSON
+app = FastAPI(
+    title="Tripzy Reasoning Engine API",
+    default_response_class=ORJSONResponse if HAS_ORJSON else JSONResponse
+)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.add_middleware(SlowAPIMiddleware)
@@ -54,13 +64,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from backend.agents.graph import app_graph
+from backend.agents.graph import app_graph, profile_writer
+from backend.agents.registry import warm_up
+from backend.utils.async_utils import AdaptiveLimiter, CircuitBreaker, REQUEST_DEADLINE_SECONDS, deadline_scope, spawn_background
+from backend.utils.genai_client import hedger
+from backend.utils.admission import admission, Overloaded
+from backend.utils.service_tiers import resolve_tier, tier_for_load
+from backend.utils.clients import close_http_session
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    # Shed load fast instead of queueing work we cannot finish in time
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "true").lower() in ("1", "true", "yes")
+
+@app.on_event("startup")
+async def warm_up_agents():
+    # Agents load lazily; warm them off the event loop so startup stays fast
+    if not AGENT_WARMUP:
+        return
+
+    async def _warm():
+        try:
+            timings = await asyncio.get_running_loop().run_in_executor(None, warm_up)
+            print(f"[STARTUP] Agents warmed in {sum(timings.values()):.0f}ms")
+        except Exception as e:
+            print(f"[WARNING] Agent warm-up failed (agents will load on first use): {e}")
+
+    spawn_background(_warm())
+
+@app.on_event("shutdown")
+async def flush_write_behind():
+    # Profile upserts are written behind; drain them before the worker exits
+    await profile_writer.close()
+    await close_http_session()
 
 class RecommendationRequest(BaseModel):
     user_id: Optional[str] = None
     session_id: str
     query: str
     user_context: Dict[str, Any] = {}
+    # Highest service tier wanted; may be lowered automatically under load
+    tier: Optional[Literal["full", "standard", "lite", "cache_only"]] = None
 
 class ReasonedRecommendation(BaseModel):
     content: str
@@ -68,6 +118,7 @@ class ReasonedRecommendation(BaseModel):
     confidence: float
     constraints: Optional[List[str]] = []
     lifestyleVibe: Optional[str] = None
+    tier: Optional[str] = None
 
 @app.get("/")
 @limiter.limit("100/minute")
@@ -83,7 +134,21 @@ async def health_check(request: Request):
         "version": "1.0.0"
     }
 
+@app.get("/health/upstreams")
+@limiter.limit("60/minute")
+async def upstream_health(request: Request):
+    """Per-upstream adaptive concurrency (limit, in-flight, queue depth, waits) and circuit state."""
+    return {
+        "limiters": AdaptiveLimiter.snapshot_all(),
+        "breakers": CircuitBreaker.snapshot_all(),
+        "hedging": hedger.snapshot(),
+        "admission": admission.snapshot(),
+        "worker": {"pid": os.getpid(), "shared_state": shared_state.scheme}
+    }
+
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from backend.utils.stream_encoding import MEDIA_TYPES, encode_stream, negotiate
 
 @app.post("/recommend", response_model=ReasonedRecommendation)
 @limiter.limit("10/minute")
@@ -100,8 +165,13 @@ async def get_recommendation(request: Request, body: RecommendationRequest):
         "user_id": body.user_id
     }
     
-    # Run the graph
-    result = await app_graph.ainvoke(initial_state)
+    # Run the graph under one request-level deadline; every nested call
+    # (retries, thread hops, Gemini timeouts) only gets what is left of it.
+    # Admission bounds concurrent pipelines (503 + Retry-After when full).
+    with deadline_scope(REQUEST_DEADLINE_SECONDS):
+        async with admission.admit() as ticket:
+            initial_state["tier"] = resolve_tier(body.tier, tier_for_load(ticket.queue_depth, admission.degrade_depth))
+            result = await app_graph.ainvoke(initial_state)
     
     rec = result.get("recommendation", {})
     analysis = result.get("analysis", {})
@@ -111,12 +181,15 @@ async def get_recommendation(request: Request, body: RecommendationRequest):
         "reasoning": rec.get("reasoning", "No reasoning available"),
         "confidence": rec.get("confidence", 0.0),
         "constraints": analysis.get("constraints", []),
-        "lifestyleVibe": analysis.get("lifestyleVibe", "Unknown")
+        "lifestyleVibe": analysis.get("lifestyleVibe", "Unknown"),
+        "tier": result.get("tier")
     }
 
 @app.post("/recommend/stream")
 @limiter.limit("10/minute")
-async def stream_recommendation(request: Request, body: RecommendationRequest):
+async def stream_recommendation(request: Request, body: RecommendationRequest, format: Optional[str] = None):
+    # Wire format: ?format=ndjson|sse|msgpack or the Accept header (default ndjson)
+    fmt = negotiate(request.headers.get("accept"), format)
     initial_state = {
         "session_id": body.session_id,
         "query": body.query,
@@ -127,11 +200,25 @@ async def stream_recommendation(request: Request, body: RecommendationRequest):
         "user_id": body.user_id
     }
     
-    async def event_generator():
-        async for event in app_graph.astream(initial_state):
-            yield event
+    # Admit before the response starts so overload is a plain 503, not a broken stream
+    ticket = await admission.acquire()
+    initial_state["tier"] = resolve_tier(body.tier, tier_for_load(ticket.queue_depth, admission.degrade_depth))
 
-    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
+    async def event_generator():
+        try:
+            with deadline_scope(REQUEST_DEADLINE_SECONDS):
+                async for chunk in encode_stream(app_graph.astream_events(initial_state), fmt):
+                    yield chunk
+        finally:
+            ticket.release()
+
+    # The background task also releases the slot if the client left before streaming began
+    return StreamingResponse(
+        event_generator(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} if fmt == "sse" else None,
+        background=BackgroundTask(ticket.release)
+    )
 
 from backend.utils.seo_fixer import fix_post
 
@@ -146,11 +233,20 @@ async def fix_seo_endpoint(post_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
-    # Exclude docs and rd_archive from reload to prevent loops when agents write files
-    uvicorn.run(
-        "backend.main:app", 
-        host="0.0.0.0", 
-        port=8000, 
-        reload=True,
-        reload_excludes=["*.md", "docs/*", "docs/rd_archive/*"]
-    )
+    port = int(os.getenv("PORT", "8000"))
+    if os.getenv("TRIPZY_ENV", "development").lower() == "production":
+        # Multi-worker mode: one process per core unless WEB_CONCURRENCY says otherwise
+        workers = int(os.getenv("WEB_CONCURRENCY", "0")) or (os.cpu_count() or 1)
+        if workers > 1 and not is_shared(shared_state):
+            print(f"[WARNING] {workers} workers with SHARED_STATE_URI=memory://: rate limits, "
+                  "heal cooldowns and caches are per worker. Use sqlite:///... or redis://...")
+        uvicorn.run("backend.main:app", host="0.0.0.0", port=port, workers=workers, proxy_headers=True)
+    else:
+        # Exclude docs and rd_archive from reload to prevent loops when agents write files
+        uvicorn.run(
+            "backend.main:app", 
+            host="0.0.0.0", 
+            port=port, 
+            reload=True,
+            reload_excludes=["*.md", "docs/*", "docs/rd_archive/*"]
+        )
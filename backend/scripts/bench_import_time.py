@@ -0,0 +1,77 @@
+"""
+Import-time benchmark for the API.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+reports the total import time plus the slowest modules (cumulative), so
+regressions from new eager imports are easy to spot.
+
+Usage:
+    python -m backend.scripts.bench_import_time
+    python -m backend.scripts.bench_import_time --module backend.agents.graph --top 15 --max-ms 1500
+"""
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+from typing import List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str) -> Tuple[List[Tuple[str, int, int]], int]:
+    """Returns ([(module, self_us, cumulative_us)], top_level_cumulative_us)."""
+    env = dict(os.environ, AGENT_WARMUP="false")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        tail = "\n".join(proc.stderr.strip().splitlines()[-5:])
+        raise SystemExit(f"[ERROR] Importing {module} failed:\n{tail}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent)))
+    # Top-level imports have the smallest indentation; their cumulative times sum to the total
+    min_indent = min((r[3] for r in rows), default=0)
+    total = sum(r[2] for r in rows if r[3] == min_indent)
+    return [(name, s, c) for name, s, c, _ in rows], total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the API entry point")
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to run; the best is reported")
+    parser.add_argument("--max-ms", type=float, default=None, help="Exit 1 if the import takes longer")
+    args = parser.parse_args()
+
+    best_rows, best_total = None, None
+    for _ in range(max(1, args.runs)):
+        rows, total = measure(args.module)
+        if best_total is None or total < best_total:
+            best_rows, best_total = rows, total
+
+    total_ms = best_total / 1000
+    print(f"import {args.module}: {total_ms:.0f}ms (best of {args.runs})")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for name, self_us, cumulative_us in sorted(best_rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name}")
+
+    imported = {r[0] for r in best_rows}
+    heavy = [name for name in ("supabase", "tavily", "PIL") if name in imported]
+    print("Heavy clients imported eagerly: " + (", ".join(heavy) or "none"))
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"[FAIL] {total_ms:.0f}ms exceeds budget of {args.max_ms:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+CPU cost of JSON handling per /recommend request: stdlib json vs
+backend.utils.serialization (orjson when installed).
+
+One simulated request does what the pipeline does with JSON: parse the
+PostgREST rows (posts with embeddings), parse the LLM analysis and
+recommendation, embed the analysis and retrieved items in the prompt,
+encode ~200 stream events and the final response body. Times are CPU time
+(time.process_time), so network and model latency are excluded.
+
+Usage:
+    python -m backend.scripts.bench_serialization --requests 500
+"""
+
+import json
+import time
+import random
+import argparse
+from typing import Any, Callable, Dict, List
+
+from backend.utils.serialization import HAS_ORJSON, dumps, dumps_bytes, loads, parse_llm_json
+
+
+def _fixture(seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    rows = [
+        {
+            "id": f"post-{i}",
+            "title": f"Guide {i}: slow travel along the coast",
+            "excerpt": "Quiet coves, family-run tavernas and ferries between islands. " * 3,
+            "category": rng.choice(["beach", "food", "culture", "nightlife"]),
+            "similarity": rng.random(),
+            "embedding": json.dumps([round(rng.uniform(-1, 1), 6) for _ in range(768)]),
+        }
+        for i in range(12)
+    ]
+    analysis = {
+        "intent": "relaxation",
+        "lifestyleVibe": "slow luxury",
+        "constraints": ["budget under 150/night", "no flights over 4h", "pet friendly"],
+        "keywords": ["antalya", "beach", "boutique", "seafood", "quiet"],
+        "personaInsight": "Prefers curated, low-crowd experiences; reads long-form guides.",
+        "search_query": "quiet boutique beach towns antalya",
+        "scores": {f"dim_{i}": rng.random() for i in range(24)},
+    }
+    recommendation = {
+        "content": "Kas and Kalkan fit a slow week: small harbours, cliffside hotels... " * 12,
+        "reasoning": "Matched low-crowd preference with retrieved Lycian coast guides. " * 4,
+        "confidence": 0.82,
+    }
+    return {
+        "rows_raw": json.dumps(rows),
+        "analysis_llm": "```json\n" + json.dumps(analysis, indent=2) + "\n```",
+        "recommendation_llm": "```json\n" + json.dumps(recommendation) + "\n```",
+        "analysis": analysis,
+        "tokens": ["Kas and Kalkan fit a slow week with small harbours and "] * 200,
+    }
+
+
+def _request(fx: Dict[str, Any], encode: Callable[[Any], bytes], decode: Callable[[Any], Any]) -> int:
+    rows = decode(fx["rows_raw"])
+    for row in rows:
+        row["embedding"] = decode(row["embedding"])
+    retrieved = [{k: v for k, v in row.items() if k != "embedding"} for row in rows]
+
+    analysis = decode(fx["analysis_llm"].split("```json")[1].split("```")[0].strip())
+    prompt = len(encode(analysis)) + len(encode(retrieved))
+    recommendation = decode(fx["recommendation_llm"].split("```json")[1].split("```")[0].strip())
+
+    size = 0
+    for token in fx["tokens"]:
+        size += len(encode({"type": "token", "data": token}))
+    size += len(encode({"type": "analysis", "data": analysis}))
+    size += len(encode({"analysis": analysis, "recommendation": recommendation, "tier": "full"}))
+    return prompt + size
+
+
+def _stdlib_encode(value: Any) -> bytes:
+    return json.dumps(value).encode("utf-8")
+
+
+def bench(name: str, fx: Dict[str, Any], encode, decode, requests: int) -> float:
+    _request(fx, encode, decode)
+    started = time.process_time()
+    for _ in range(requests):
+        _request(fx, encode, decode)
+    per_request = (time.process_time() - started) * 1000 / requests
+    print(f"{name:<22} {per_request:>8.3f} ms CPU / request")
+    return per_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON CPU time per simulated request")
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    fx = _fixture()
+    # Both paths must agree before timing them
+    assert loads(dumps(fx["analysis"])) == json.loads(json.dumps(fx["analysis"]))
+    assert parse_llm_json(fx["analysis_llm"]) == fx["analysis"]
+
+    print(f"orjson available: {HAS_ORJSON}")
+    before = bench("stdlib json", fx, _stdlib_encode, json.loads, args.requests)
+    after = bench("serialization", fx, dumps_bytes, loads, args.requests)
+    print(f"speedup: {before / after:.2f}x ({before - after:.3f} ms CPU saved per request)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Latency SLO benchmark per service tier.
+
+Runs the recommendation pipeline for each tier (full / standard / lite /
+cache_only) and compares p50/p95 latency with TIER_SLO_MS. Exits 1 if any
+tier misses its p95 target, so it can gate releases.
+
+By default the pipeline runs in-process (real Gemini/Supabase calls, no HTTP
+rate limit). With --url it calls a running server instead; note that
+/recommend is limited to 10 requests per minute per IP.
+
+Usage:
+    python -m backend.scripts.bench_tier_slo --requests 5
+    python -m backend.scripts.bench_tier_slo --tiers lite cache_only --url http://localhost:8000
+"""
+
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+from typing import Dict, List, Optional
+
+import httpx
+
+from backend.utils.service_tiers import TIERS, TIER_SLO_MS
+
+QUERIES = [
+    "Quiet beach towns near Antalya for a slow week",
+    "Food tour in Tuscany with wine tastings",
+    "Kyoto temples and tea houses in autumn",
+    "Budget friendly nightlife in Istanbul",
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_in_process(tier: str, query: str) -> Optional[str]:
+    from backend.agents.graph import app_graph
+    from backend.utils.async_utils import REQUEST_DEADLINE_SECONDS, deadline_scope
+
+    state = {
+        "session_id": f"bench-{uuid.uuid4().hex[:8]}",
+        "query": query,
+        "signals": [],
+        "analysis": {},
+        "recommendation": {},
+        "error": None,
+        "user_id": None,
+        "tier": tier,
+    }
+    with deadline_scope(REQUEST_DEADLINE_SECONDS):
+        result = await app_graph.ainvoke(state)
+    return result.get("error")
+
+
+async def run_http(client: httpx.AsyncClient, url: str, tier: str, query: str) -> Optional[str]:
+    payload = {"session_id": f"bench-{uuid.uuid4().hex[:8]}", "query": query, "tier": tier}
+    response = await client.post(f"{url}/recommend", json=payload)
+    if response.status_code != 200:
+        return f"HTTP {response.status_code}"
+    served = response.json().get("tier")
+    return None if served == tier else f"served tier {served}"
+
+
+async def bench_tier(tier: str, requests: int, concurrency: int, url: Optional[str]) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        async def _one(i: int):
+            async with semaphore:
+                query = QUERIES[i % len(QUERIES)]
+                started = time.perf_counter()
+                try:
+                    error = await (run_http(client, url, tier, query) if url else run_in_process(tier, query))
+                except Exception as e:
+                    error = str(e)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if error:
+                    errors.append(error)
+
+        await asyncio.gather(*[_one(i) for i in range(requests)])
+
+    return {
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "max": max(latencies),
+        "errors": len(errors),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Check p95 latency per service tier against its SLO")
+    parser.add_argument("--tiers", nargs="+", choices=TIERS, default=list(TIERS))
+    parser.add_argument("--requests", type=int, default=5, help="Requests per tier")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--url", default=None, help="Benchmark a running server instead of in-process")
+    args = parser.parse_args()
+
+    failed = []
+    print(f"{'tier':<11} {'p50':>9} {'p95':>9} {'max':>9} {'SLO p95':>9}  errors")
+    for tier in args.tiers:
+        # cache_only is measured after the other tiers have had a chance to populate the cache
+        stats = await bench_tier(tier, args.requests, args.concurrency, args.url)
+        slo = TIER_SLO_MS[tier]
+        ok = stats["p95"] <= slo
+        if not ok:
+            failed.append(tier)
+        print(f"{tier:<11} {stats['p50']:>7.0f}ms {stats['p95']:>7.0f}ms {stats['max']:>7.0f}ms {slo:>7.0f}ms  "
+              f"{stats['errors']}{'' if ok else '  [SLO MISSED]'}")
+
+    if failed:
+        print(f"[FAIL] p95 above SLO for: {', '.join(failed)}")
+        sys.exit(1)
+    print("[SUCCESS] All tiers within their p95 SLO")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Unit tests for the ConsensusAgent local pre-judge (no network access).
+"""
+import asyncio
+import pytest
+
+from backend.agents import consensus_agent as consensus_module
+from backend.utils import async_utils
+from backend.utils.async_utils import deadline_scope, remaining_budget
+from backend.agents.consensus_agent import ConsensusAgent, ConsensusResult
+
+PERSONA = {"vibe": "Zen Retreat", "keywords": ["spa", "quiet", "thermal"]}
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(consensus_module, "SHADOW_RATE", 0.0)
+    return ConsensusAgent()
+
+
+class TestConsensusPreJudge:
+    """Tests for the local scoring bands"""
+
+    @pytest.mark.asyncio
+    async def test_empty_results_decided_locally(self, agent):
+        result = await agent.validate_alignment(PERSONA, [], [])
+
+        assert result.is_validated is False
+        assert agent.stats == {"local": 1, "llm": 0, "compared": 0, "agreed": 0}
+
+    @pytest.mark.asyncio
+    async def test_strong_match_validated_locally(self, agent):
+        posts = [
+            {"title": "Quiet thermal spa towns", "excerpt": "A zen retreat", "similarity": 0.86},
+            {"title": "Spa weekend in Pamukkale", "excerpt": "Thermal pools", "similarity": 0.84},
+        ]
+
+        result = await agent.validate_alignment(PERSONA, posts, [])
+
+        assert result.is_validated is True
+        assert result.top_matches == ["Quiet thermal spa towns", "Spa weekend in Pamukkale"]
+        assert agent.skip_ratio() == 1.0
+
+    @pytest.mark.asyncio
+    async def test_ambiguous_band_uses_llm_and_tracks_agreement(self, agent, monkeypatch):
+        async def fake_llm_judge(*args, **kwargs):
+            return ConsensusResult(
+                consensus_score=0.7, is_validated=True, refining_instructions="",
+                top_matches=[], critique="ok"
+            )
+
+        monkeypatch.setattr(agent, "_llm_judge", fake_llm_judge)
+        posts = [{"title": "Istanbul nightlife", "excerpt": "Quiet rooftop spa bars", "similarity": 0.68}]
+
+        result = await agent.validate_alignment(PERSONA, posts, [])
+
+        assert result.critique == "ok"
+        assert agent.stats["llm"] == 1
+        assert agent.stats["compared"] == 1
+
+    @pytest.mark.asyncio
+    async def test_shadow_judge_runs_in_background_without_deadline(self, agent, monkeypatch):
+        budgets = []
+
+        async def fake_llm_judge(*args, **kwargs):
+            budgets.append(remaining_budget())
+            return ConsensusResult(
+                consensus_score=0.1, is_validated=False, refining_instructions="",
+                top_matches=[], critique="ok"
+            )
+
+        monkeypatch.setattr(consensus_module, "SHADOW_RATE", 1.0)
+        monkeypatch.setattr(agent, "_llm_judge", fake_llm_judge)
+
+        with deadline_scope(5.0):
+            result = await agent.validate_alignment(PERSONA, [], [])
+        await asyncio.gather(*async_utils._background_tasks)
+
+        assert result.is_validated is False
+        assert budgets == [None]
+        assert agent.stats["compared"] == 1 and agent.stats["agreed"] == 1
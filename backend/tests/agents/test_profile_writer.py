@@ -0,0 +1,56 @@
+"""
+Unit tests for the bulk profile upsert against a local PostgREST stand-in.
+"""
+import os
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+os.environ.setdefault("VITE_SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("VITE_SUPABASE_ANON_KEY", "test-key")
+os.environ.setdefault("VITE_GEMINI_API_KEY", "test-key")
+
+from backend.agents import graph
+
+
+async def _serve(status_for_bad):
+    posts = []
+
+    async def handler(request):
+        rows = await request.json()
+        posts.append([row["user_id"] for row in rows])
+        if any(row["user_id"].startswith("bad") for row in rows):
+            return web.Response(status=status_for_bad, text="violates foreign key constraint")
+        return web.Response(status=201)
+
+    app = web.Application()
+    app.router.add_post("/rest/v1/user_profiles", handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server, posts
+
+
+class TestUpsertProfiles:
+    @pytest.mark.asyncio
+    async def test_rejected_rows_are_bisected_out(self, monkeypatch):
+        server, posts = await _serve(409)
+        monkeypatch.setattr(graph, "SUPABASE_URL", str(server.make_url("")).rstrip("/"))
+        try:
+            rows = [{"user_id": uid, "archetype": "x"} for uid in ["u1", "u2", "bad1", "u3", "u4", "u5", "bad2", "u6"]]
+            await graph._upsert_profiles(rows)
+        finally:
+            await server.close()
+        saved = sorted(uid for batch in posts[1:] if not any(u.startswith("bad") for u in batch) for uid in batch)
+        assert saved == ["u1", "u2", "u3", "u4", "u5", "u6"]
+        assert ["bad1"] in posts and ["bad2"] in posts
+
+    @pytest.mark.asyncio
+    async def test_server_errors_raise_for_retry(self, monkeypatch):
+        server, posts = await _serve(503)
+        monkeypatch.setattr(graph, "SUPABASE_URL", str(server.make_url("")).rstrip("/"))
+        try:
+            with pytest.raises(RuntimeError):
+                await graph._upsert_profiles([{"user_id": "u1"}, {"user_id": "bad1"}])
+        finally:
+            await server.close()
+        assert len(posts) == 1
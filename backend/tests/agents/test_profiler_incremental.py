@@ -0,0 +1,112 @@
+"""
+Unit tests for incremental profile upkeep in ProfilerAgent (no network access).
+"""
+import os
+import pytest
+
+os.environ.setdefault("VITE_SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("VITE_SUPABASE_ANON_KEY", "test-key")
+os.environ.setdefault("VITE_GEMINI_API_KEY", "test-key")
+
+from backend.agents.profiler_agent import ProfilerAgent, profile_key
+from backend.utils.preference_model import PreferenceState, blend_vectors
+
+
+def _signal(i, vibe):
+    return {
+        "id": f"sig-{i}",
+        "signal_type": "view",
+        "target_type": "post",
+        "metadata": {"vibe": vibe},
+        "created_at": f"2026-01-01T10:{i:02d}:00+00:00",
+    }
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = ProfilerAgent()
+    calls = []
+
+    async def fake_infer(user_id, signals, signal_features=None):
+        calls.append(len(signals))
+        return {"archetype": f"Archetype #{len(calls)}"}
+
+    persisted = []
+
+    async def fake_persist(*args, **kwargs):
+        persisted.append(args)
+        return None
+
+    monkeypatch.setattr(agent, "infer_psychographic_archetype", fake_infer)
+    monkeypatch.setattr("backend.agents.profiler_agent.retry_sync_in_thread", fake_persist)
+    agent.llm_calls = calls
+    agent.persisted = persisted
+    return agent
+
+
+class TestIncrementalProfile:
+    """Tests for drift-gated archetype synthesis"""
+
+    @pytest.mark.asyncio
+    async def test_stable_preferences_skip_llm(self, agent):
+        zen = [_signal(i, "Zen") for i in range(5)]
+
+        first = await agent.update_user_soul("u1", zen)
+        second = await agent.update_user_soul("u1", zen + [_signal(5, "Zen")])
+
+        assert first == second == {"archetype": "Archetype #1"}
+        assert len(agent.llm_calls) == 1
+        assert agent.stats == {"synthesized": 1, "incremental": 1}
+
+    @pytest.mark.asyncio
+    async def test_drift_triggers_resynthesis(self, agent):
+        await agent.update_user_soul("u1", [_signal(i, "Zen") for i in range(3)])
+        shifted = [_signal(i, "Nightlife") for i in range(3, 12)]
+
+        result = await agent.update_user_soul("u1", shifted)
+
+        assert result == {"archetype": "Archetype #2"}
+        assert len(agent.llm_calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_anonymous_sessions_keep_separate_profiles(self, agent):
+        first, second = profile_key(None, "s1"), profile_key("anonymous", "s2")
+
+        # Interleaved signals: one shared profile would mix both sessions and their cursor
+        for i in range(0, 6, 2):
+            await agent.update_user_soul(first, [_signal(i, "Zen")])
+            await agent.update_user_soul(second, [_signal(i + 1, "Nightlife")])
+
+        assert first != second
+        assert agent.get_profile(first).preferences.signal_count == 3
+        assert agent.get_profile(second).preferences.signal_count == 3
+        assert agent.get_profile(first).preferences.top("vibe") == ["Zen"]
+        assert agent.get_profile(second).preferences.top("vibe") == ["Nightlife"]
+        assert not agent.persisted
+
+
+class TestPreferenceState:
+    def test_centroid_is_decayed_mean(self):
+        state = PreferenceState(centroid_rate=0.5)
+        state.observe_embedding([1.0, 0.0])
+        state.observe_embedding([0.0, 1.0])
+
+        assert state.centroid == [0.5, 0.5]
+
+    def test_newer_signals_outweigh_older(self):
+        state = PreferenceState(decay=0.5)
+        state.observe_signal(_signal(0, "Zen"))
+        state.observe_signal(_signal(1, "Luxury"))
+
+        assert state.top("vibe") == ["Luxury", "Zen"]
+
+
+class TestBlendVectors:
+    def test_zero_weight_returns_query(self):
+        assert blend_vectors([3.0, 4.0], [1.0, 0.0], 0.0) == [3.0, 4.0]
+
+    def test_blend_is_unit_normalized_mix(self):
+        blended = blend_vectors([2.0, 0.0], [0.0, 5.0], 0.5)
+
+        assert blended[0] == pytest.approx(blended[1])
+        assert sum(x * x for x in blended) == pytest.approx(1.0)
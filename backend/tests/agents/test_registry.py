@@ -0,0 +1,53 @@
+"""
+Unit tests for the lazy agent registry.
+"""
+import sys
+import types
+from unittest import mock
+
+from backend.agents.registry import LazyAgent
+
+
+class _Agent:
+    def __init__(self):
+        self.name = "fake"
+
+    def ping(self):
+        return "pong"
+
+
+def _install_module(monkeypatch, name="backend_tests_fake_agent"):
+    module = types.ModuleType(name)
+    module.fake_agent = _Agent()
+    monkeypatch.setitem(sys.modules, name, module)
+    return module
+
+
+class TestLazyAgent:
+    def test_resolves_on_first_attribute_access(self, monkeypatch):
+        proxy = LazyAgent("fake_agent", "backend_tests_fake_agent")
+        assert not proxy.is_loaded
+
+        module = _install_module(monkeypatch)
+
+        assert proxy.ping() == "pong"
+        assert proxy.is_loaded
+        assert proxy.resolve() is module.fake_agent
+
+    def test_attribute_writes_reach_singleton(self, monkeypatch):
+        module = _install_module(monkeypatch)
+        proxy = LazyAgent("fake_agent", "backend_tests_fake_agent")
+
+        proxy.name = "patched"
+
+        assert module.fake_agent.name == "patched"
+
+    def test_mock_patch_object_restores_method(self, monkeypatch):
+        module = _install_module(monkeypatch)
+        proxy = LazyAgent("fake_agent", "backend_tests_fake_agent")
+
+        with mock.patch.object(proxy, "ping", return_value="patched"):
+            assert module.fake_agent.ping() == "patched"
+
+        assert proxy.ping() == "pong"
+        assert "ping" not in vars(module.fake_agent)
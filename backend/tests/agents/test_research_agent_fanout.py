@@ -0,0 +1,115 @@
+"""
+Unit tests for ResearchAgent.scout_patents fan-out (no network access).
+"""
+import os
+import asyncio
+import pytest
+
+os.environ.setdefault("VITE_GEMINI_API_KEY", "test-key")
+
+from backend.agents.research_agent import ResearchAgent
+from backend.utils.async_utils import AdaptiveLimiter, deadline_scope
+
+
+class FakeTavily:
+    def __init__(self, delays):
+        self.delays = delays
+        self.max_in_flight = 0
+        self._in_flight = 0
+
+    async def search(self, query, search_depth="basic"):
+        feature = next(f for f in self.delays if f in query)
+        self._in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            delay = self.delays[feature]
+            if delay is None:
+                raise ValueError("400 invalid_request")
+            if delay == "flaky":
+                self.delays[feature] = 0.01
+                raise ConnectionError("503 service unavailable")
+            await asyncio.sleep(delay)
+            return {"results": [{"url": f"https://example.com/{feature}", "content": feature}]}
+        finally:
+            self._in_flight -= 1
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = ResearchAgent()
+
+    async def always_live(query):
+        return "LIVE_SEARCH_REQUIRED"
+
+    monkeypatch.setattr(agent, "analyze_query_needs", always_live)
+    return agent
+
+
+class TestScoutPatents:
+    """Tests for ordering, partial failure and deadline handling"""
+
+    @pytest.mark.asyncio
+    async def test_runs_concurrently_and_keeps_order(self, agent):
+        agent.tavily = FakeTavily({"alpha": 0.05, "beta": 0.01, "gamma": 0.03})
+
+        report = await agent.scout_patents(["alpha", "beta", "gamma"])
+
+        assert report.index("alpha") < report.index("beta") < report.index("gamma")
+        assert agent.tavily.max_in_flight > 1
+
+    @pytest.mark.asyncio
+    async def test_partial_failures_and_deadline(self, agent):
+        agent.tavily = FakeTavily({"alpha": 0.01, "broken": None, "slow": 5.0})
+
+        report = await agent.scout_patents(["alpha", "broken", "slow"], deadline=0.2)
+
+        assert "### Patent Search: alpha" in report
+        assert "### broken: Search Failed" in report
+        assert "### slow: Search Timed Out" in report
+
+    @pytest.mark.asyncio
+    async def test_deadline_is_capped_by_request_budget(self, agent):
+        agent.tavily = FakeTavily({"slow": 5.0})
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        with deadline_scope(0.1):
+            report = await agent.scout_patents(["slow"], deadline=30.0)
+
+        assert "### slow: Search Timed Out" in report
+        assert loop.time() - start < 1.0
+
+    @pytest.mark.asyncio
+    async def test_limiter_slot_released_during_retry_backoff(self, agent):
+        agent.tavily = FakeTavily({"flaky": "flaky"})
+        limiter = AdaptiveLimiter("tavily_api")
+
+        async def probe():
+            await asyncio.sleep(0.2)  # inside the first backoff (>= 0.5s)
+            return limiter.in_flight
+
+        report, in_flight = await asyncio.gather(agent.scout_patents(["flaky"], deadline=0.3), probe())
+
+        assert in_flight == 0
+        assert "### flaky: Search Timed Out" in report
+
+
+class TestCostGuard:
+    @pytest.mark.asyncio
+    async def test_only_parsed_answers_are_recorded(self, monkeypatch):
+        from backend.agents import research_agent as module
+        agent = ResearchAgent()
+        recorded = []
+        answers = iter([None, "LIVE_SEARCH_REQUIRED"])
+
+        async def fake_classify(item, **kwargs):
+            assert kwargs["default"] is None
+            return next(answers)
+
+        monkeypatch.setattr(module.query_classifier, "classify", lambda query: (None, 0.0))
+        monkeypatch.setattr(module.query_classifier, "record", lambda query, decision: recorded.append(decision))
+        monkeypatch.setattr(module.coalescer, "classify", fake_classify)
+
+        assert await agent.analyze_query_needs("Kas Turkey") == "INTERNAL_KNOWLEDGE_SUFFICIENT"
+        assert await agent.analyze_query_needs("Kas Turkey") == "LIVE_SEARCH_REQUIRED"
+        assert recorded == ["LIVE_SEARCH_REQUIRED"]
@@ -0,0 +1,63 @@
+"""
+Unit tests for user preference vector upkeep against a local PostgREST stand-in.
+"""
+import os
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+os.environ.setdefault("VITE_SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("VITE_SUPABASE_ANON_KEY", "test-key")
+os.environ.setdefault("VITE_GEMINI_API_KEY", "test-key")
+
+from backend.agents import graph
+from backend.utils.signal_store import SessionSignals
+
+
+async def _serve(state):
+    async def profiles(request):
+        if state["profiles_down"]:
+            return web.Response(status=503)
+        return web.json_response([{"embedding": "[1.0, 0.0]"}])
+
+    async def posts(request):
+        if state["posts_down"]:
+            return web.Response(status=503)
+        return web.json_response([{"id": "p1", "embedding": "[0.0, 1.0]"}])
+
+    app = web.Application()
+    app.router.add_get("/rest/v1/user_profiles", profiles)
+    app.router.add_get("/rest/v1/posts", posts)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def _engaged(session_id):
+    signals = SessionSignals(session_id)
+    signals.apply([{"id": 1, "signal_type": "click", "target_type": "post", "target_id": "p1",
+                    "created_at": "2026-01-01T10:00:00+00:00"}])
+    return signals
+
+
+class TestUpdateUserVector:
+    @pytest.mark.asyncio
+    async def test_failed_fetches_keep_seed_pending_and_requeue_posts(self, monkeypatch):
+        state = {"profiles_down": True, "posts_down": True}
+        server = await _serve(state)
+        monkeypatch.setattr(graph, "SUPABASE_URL", str(server.make_url("")).rstrip("/"))
+        signals = _engaged("s-vector")
+        try:
+            assert await graph.supabase_update_user_vector("s-vector", "user-vector-1", signals) is None
+            profile = graph.profiler_agent.get_profile("user-vector-1")
+            assert not profile.vector_loaded
+
+            state["profiles_down"] = False
+            state["posts_down"] = False
+            vector = await graph.supabase_update_user_vector("s-vector", "user-vector-1", signals)
+        finally:
+            await server.close()
+
+        assert profile.vector_loaded
+        assert profile.preferences.embedding_count == 2
+        assert vector is not None and signals.drain_engaged_posts() == []
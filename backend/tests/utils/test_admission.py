@@ -0,0 +1,62 @@
+"""
+Unit tests for the pipeline admission controller.
+"""
+import asyncio
+import pytest
+
+from backend.utils.admission import AdmissionController, Overloaded
+
+
+class TestAdmissionController:
+    """Tests for bounded in-flight work, queueing and load shedding"""
+
+    @pytest.mark.asyncio
+    async def test_queued_request_gets_released_slot(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1)
+        first = await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+
+        assert controller.queue_depth == 1
+        first.release()
+        second = await waiting
+
+        assert controller.in_flight == 1
+        second.release()
+        assert controller.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects_fast_with_retry_after(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=0, queue_timeout=1)
+        await controller.acquire()
+
+        with pytest.raises(Overloaded) as excinfo:
+            await controller.acquire()
+
+        assert excinfo.value.reason == "queue_full"
+        assert excinfo.value.retry_after >= 1
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout_rejects_and_leaves_queue(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=0.05)
+        await controller.acquire()
+
+        with pytest.raises(Overloaded) as excinfo:
+            await controller.acquire()
+
+        assert excinfo.value.reason == "queue_timeout"
+        assert controller.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_deep_queue_marks_ticket_degraded(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=1, degrade_depth=1)
+        first = await controller.acquire()
+        queued = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        late = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+
+        first.release()
+        assert not (await queued).degraded
+        (await queued).release()
+        assert (await late).degraded
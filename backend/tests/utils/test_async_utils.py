@@ -0,0 +1,325 @@
+"""
+Unit tests for backend/utils/async_utils.py primitives.
+"""
+import asyncio
+import time
+import pytest
+
+from backend.utils.async_utils import (
+    AdaptiveLimiter, CircuitBreaker, CircuitOpenError, DeadlineExceeded, MicroBatcher, UpstreamHTTPError,
+    WriteBehindBuffer, deadline_scope, remaining_budget, retry_async, run_sync_in_thread, spawn_background,
+    upstream, upstream_reserved
+)
+
+
+class TestMicroBatcher:
+    """Tests for request coalescing via MicroBatcher"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_submits_share_one_batch(self):
+        calls = []
+
+        async def batch_func(items):
+            calls.append(list(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(batch_func, max_wait=0.01, max_batch=10)
+        results = await asyncio.gather(*[batcher.submit(i) for i in range(5)])
+
+        assert results == [0, 2, 4, 6, 8]
+        assert calls == [[0, 1, 2, 3, 4]]
+        assert batcher.stats["batches"] == 1
+
+    @pytest.mark.asyncio
+    async def test_max_batch_splits_batches(self):
+        calls = []
+
+        async def batch_func(items):
+            calls.append(len(items))
+            return items
+
+        batcher = MicroBatcher(batch_func, max_wait=0.01, max_batch=2)
+        results = await asyncio.gather(*[batcher.submit(i) for i in range(5)])
+
+        assert results == [0, 1, 2, 3, 4]
+        assert calls == [2, 2, 1]
+
+    @pytest.mark.asyncio
+    async def test_batch_failure_propagates_to_every_caller(self):
+        async def batch_func(items):
+            raise RuntimeError("upstream down")
+
+        batcher = MicroBatcher(batch_func, max_wait=0.001)
+        results = await asyncio.gather(
+            batcher.submit("a"), batcher.submit("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_batch_runs_without_the_first_callers_deadline(self):
+        budgets = []
+
+        async def batch_func(items):
+            budgets.append(remaining_budget())
+            return items
+
+        batcher = MicroBatcher(batch_func, max_wait=0.01, max_batch=2)
+        with deadline_scope(5.0):
+            results = await asyncio.gather(batcher.submit(1), batcher.submit(2))
+
+        await asyncio.sleep(0)
+        assert results == [1, 2]
+        assert budgets == [None]
+        assert not batcher._inflight
+
+    @pytest.mark.asyncio
+    async def test_caller_gives_up_at_its_own_deadline(self):
+        async def batch_func(items):
+            await asyncio.sleep(0.2)
+            return items
+
+        batcher = MicroBatcher(batch_func, max_wait=0.001, max_batch=2)
+
+        async def hurried():
+            with deadline_scope(0.05):
+                return await batcher.submit("hurried")
+
+        start = time.monotonic()
+        hurried_result, patient_result = await asyncio.gather(
+            hurried(), batcher.submit("patient"), return_exceptions=True
+        )
+
+        assert isinstance(hurried_result, DeadlineExceeded)
+        assert patient_result == "patient"
+        assert batcher.stats["batches"] == 1
+        assert time.monotonic() - start >= 0.2
+
+
+class TestWriteBehindBuffer:
+    """Tests for debounced per-key write-behind"""
+
+    @pytest.mark.asyncio
+    async def test_updates_coalesce_per_key(self):
+        writes = []
+
+        async def flush_func(values):
+            writes.append(list(values))
+
+        buffer = WriteBehindBuffer(flush_func, window=0.01)
+        buffer.put("u1", {"vibe": "Zen"})
+        buffer.put("u2", {"vibe": "Luxury"})
+        buffer.put("u1", {"vibe": "Nightlife"})
+        assert writes == []
+
+        await asyncio.sleep(0.03)
+
+        assert writes == [[{"vibe": "Luxury"}, {"vibe": "Nightlife"}]]
+        assert buffer.stats["coalesced"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_writes_retry_then_drop(self):
+        attempts = []
+
+        async def flush_func(values):
+            attempts.append(len(values))
+            raise RuntimeError("503")
+
+        buffer = WriteBehindBuffer(flush_func, window=60, max_retries=2)
+        buffer.put("u1", {"vibe": "Zen"})
+        await buffer.close()
+
+        assert attempts == [1, 1, 1]
+        assert len(buffer) == 0
+        assert buffer.stats["dropped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_pending_keys_are_bounded(self):
+        async def flush_func(values):
+            pass
+
+        buffer = WriteBehindBuffer(flush_func, window=60, max_batch=100, max_pending=2)
+        for key in ("a", "b", "c"):
+            buffer.put(key, key)
+
+        assert list(buffer._pending) == ["b", "c"]
+        await buffer.close()
+
+
+class TestAdaptiveLimiter:
+    """Tests for AIMD concurrency limiting"""
+
+    @pytest.mark.asyncio
+    async def test_caps_concurrency_at_limit(self):
+        limiter = AdaptiveLimiter("test_cap", max_concurrent=2)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with limiter:
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*[call() for _ in range(6)])
+
+        assert peak == 2
+        assert limiter.snapshot()["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_throttling_cuts_limit_and_honors_retry_after(self):
+        limiter = AdaptiveLimiter("test_429", max_concurrent=8)
+
+        with pytest.raises(UpstreamHTTPError):
+            async with limiter:
+                raise UpstreamHTTPError("Gemini API Error 429", status=429, retry_after=0.05)
+
+        assert limiter.snapshot()["limit"] == 4
+        assert limiter.snapshot()["retry_after_remaining"] > 0
+
+        started = asyncio.get_running_loop().time()
+        async with limiter:
+            pass
+        assert asyncio.get_running_loop().time() - started >= 0.04
+
+    @pytest.mark.asyncio
+    async def test_healthy_saturated_traffic_raises_limit(self):
+        limiter = AdaptiveLimiter("test_grow", max_concurrent=2, max_limit=10)
+
+        async def call():
+            async with limiter:
+                await asyncio.sleep(0.001)
+
+        for _ in range(10):
+            await asyncio.gather(*[call() for _ in range(4)])
+
+        assert limiter.snapshot()["limit"] > 2
+
+    def test_singleton_per_upstream(self):
+        assert AdaptiveLimiter("test_shared", 3) is AdaptiveLimiter("test_shared", 9)
+
+    @pytest.mark.asyncio
+    async def test_upstream_decorator_wraps_async_calls(self):
+        @upstream("test_decorated", 1)
+        async def call():
+            return AdaptiveLimiter("test_decorated").in_flight
+
+        assert await call() == 1
+
+    @pytest.mark.asyncio
+    async def test_reserve_runs_on_loop_outside_limiter_slot(self):
+        seen = []
+
+        async def reserve(value):
+            # Quota waits must not hold a concurrency slot
+            seen.append(("reserve", AdaptiveLimiter("test_reserved", 1).in_flight, upstream_reserved()))
+
+        @upstream("test_reserved", 1, reserve=reserve)
+        def call(value):
+            return value, AdaptiveLimiter("test_reserved").in_flight, upstream_reserved()
+
+        assert await run_sync_in_thread(call, 7) == (7, 1, True)
+        assert seen == [("reserve", 0, False)]
+        # Direct calls (scripts) are not marked as reserved
+        assert call(8)[2] is False
+
+
+def _breaker(name):
+    breaker = CircuitBreaker(name)
+    breaker.min_calls = 4
+    breaker.open_seconds = 0.05
+    return breaker
+
+
+class TestCircuitBreaker:
+    """Tests for closed/open/half-open transitions"""
+
+    @pytest.mark.asyncio
+    async def test_opens_on_error_rate_and_fails_fast(self):
+        breaker = _breaker("test_breaker_open")
+        calls = 0
+
+        @upstream("test_breaker_open")
+        async def flaky():
+            nonlocal calls
+            calls += 1
+            raise UpstreamHTTPError("Gemini API Error 503", status=503)
+
+        for _ in range(4):
+            with pytest.raises(UpstreamHTTPError):
+                await flaky()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            await retry_async(flaky, initial_delay=0.01)
+        assert calls == 4
+
+    @pytest.mark.asyncio
+    async def test_half_open_probe_closes_circuit(self):
+        breaker = _breaker("test_breaker_probe")
+        for _ in range(4):
+            breaker.record(False, 0.01)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        await asyncio.sleep(0.06)
+        async with breaker:
+            assert breaker.state == CircuitBreaker.HALF_OPEN
+            # Only one probe at a time
+            with pytest.raises(CircuitOpenError):
+                breaker.check()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = _breaker("test_breaker_slow")
+        breaker.slow_call = 1.0
+        for _ in range(4):
+            breaker.record(True, 5.0)
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+
+class TestDeadlines:
+    """Tests for request-level deadline propagation"""
+
+    @pytest.mark.asyncio
+    async def test_retries_stop_when_budget_runs_out(self):
+        attempts = 0
+
+        async def failing():
+            nonlocal attempts
+            attempts += 1
+            raise ConnectionError("503 upstream")
+
+        started = time.monotonic()
+        with deadline_scope(0.2):
+            with pytest.raises(ConnectionError):
+                await retry_async(failing, max_retries=5, initial_delay=0.5, use_jitter=False)
+
+        assert attempts == 1
+        assert time.monotonic() - started < 0.2
+
+    @pytest.mark.asyncio
+    async def test_thread_calls_get_remaining_budget(self):
+        with deadline_scope(5.0):
+            seen = await run_sync_in_thread(remaining_budget)
+            assert 0 < seen <= 5.0
+
+            with deadline_scope(0.05):
+                with pytest.raises(DeadlineExceeded):
+                    await run_sync_in_thread(time.sleep, 0.5, timeout=60)
+
+    @pytest.mark.asyncio
+    async def test_nested_scope_never_extends_deadline(self):
+        with deadline_scope(1.0):
+            with deadline_scope(100.0):
+                assert remaining_budget() <= 1.0
+        assert remaining_budget() is None
+
+    @pytest.mark.asyncio
+    async def test_background_tasks_do_not_inherit_deadline(self):
+        async def budget():
+            return remaining_budget()
+
+        with deadline_scope(1.0):
+            assert await spawn_background(budget()) is None
+            assert await asyncio.ensure_future(budget()) is not None
@@ -0,0 +1,100 @@
+"""
+Unit tests for streaming image downloads and decode-time downscaling.
+"""
+import io
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from PIL import Image, features
+
+from backend.utils.clients import close_http_session
+from backend.utils.image_processor import ImageProcessor
+
+
+def _jpeg(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _respond(**kwargs):
+    async def handler(request):
+        return web.Response(**kwargs)
+    return handler
+
+
+async def _serve(handler):
+    app = web.Application()
+    app.router.add_get("/img", handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+class TestDownload:
+    @pytest.mark.asyncio
+    async def test_downloads_within_limit(self):
+        body = b"x" * 200_000
+        server = await _serve(_respond(body=body))
+        try:
+            assert await ImageProcessor.download_image(str(server.make_url("/img")), max_bytes=300_000) == body
+        finally:
+            await server.close()
+            await close_http_session()
+
+    @pytest.mark.asyncio
+    async def test_rejects_oversized_declared_and_streamed_bodies(self):
+        async def chunked(request):
+            response = web.StreamResponse()
+            response.enable_chunked_encoding()
+            await response.prepare(request)
+            for _ in range(10):
+                await response.write(b"x" * 50_000)
+            return response
+
+        declared = await _serve(_respond(body=b"x" * 500_000))
+        streamed = await _serve(chunked)
+        try:
+            assert await ImageProcessor.download_image(str(declared.make_url("/img")), max_bytes=100_000) is None
+            assert await ImageProcessor.download_image(str(streamed.make_url("/img")), max_bytes=100_000) is None
+        finally:
+            await declared.close()
+            await streamed.close()
+            await close_http_session()
+
+    @pytest.mark.asyncio
+    async def test_http_error_returns_none(self):
+        server = await _serve(_respond(status=404))
+        try:
+            assert await ImageProcessor.download_image(str(server.make_url("/img"))) is None
+        finally:
+            await server.close()
+            await close_http_session()
+
+
+class TestOptimize:
+    def test_large_jpeg_downscaled_to_max_width(self):
+        webp, width, height = ImageProcessor.optimize_image(_jpeg(4000, 3000), max_width=800)
+        assert (width, height) == (800, 600)
+        assert Image.open(io.BytesIO(webp)).size == (800, 600)
+
+    def test_small_image_keeps_size(self):
+        buffer = io.BytesIO()
+        Image.new("RGBA", (300, 200)).save(buffer, format="PNG")
+        _, width, height = ImageProcessor.optimize_image(buffer.getvalue(), max_width=800)
+        assert (width, height) == (300, 200)
+
+
+class TestVariants:
+    def test_sizes_capped_at_source_width_largest_first(self):
+        variants = ImageProcessor.generate_variants(_jpeg(1000, 500), widths=[320, 640, 1280, 1920])
+        assert [(v["width"], v["height"]) for v in variants] == [(1000, 500), (640, 320), (320, 160)]
+        assert all(Image.open(io.BytesIO(v["data"])).format == "WEBP" for v in variants)
+
+    @pytest.mark.skipif(not features.check("avif"), reason="Pillow built without AVIF")
+    def test_every_format_per_width(self):
+        variants = ImageProcessor.generate_variants(_jpeg(800, 600), widths=[320, 640], formats=["webp", "avif"])
+        assert [(v["format"], v["width"]) for v in variants] == [("webp", 640), ("avif", 640), ("webp", 320), ("avif", 320)]
+
+    def test_undecodable_input(self):
+        assert ImageProcessor.generate_variants(b"not an image") == []
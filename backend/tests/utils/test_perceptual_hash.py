@@ -0,0 +1,70 @@
+"""
+Unit tests for perceptual hashing and the near-duplicate index.
+"""
+import io
+import random
+from PIL import Image, ImageDraw
+
+from backend.utils.perceptual_hash import BKTree, MediaHashIndex, group_near_duplicates, hamming, image_hashes
+
+
+def _scene(seed, size=(640, 480)):
+    rng = random.Random(seed)
+    img = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse((x, y, x + rng.randrange(40, 200), y + rng.randrange(40, 200)),
+                     fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return img
+
+
+def _encode(img, fmt="JPEG", **kwargs):
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+class TestHashes:
+    def test_reencoded_and_resized_copy_is_close(self):
+        original = _scene(1)
+        a = image_hashes(_encode(original, quality=95))
+        b = image_hashes(_encode(original.resize((320, 240)), fmt="WEBP", quality=60))
+        assert len(a["phash"]) == len(a["dhash"]) == 16
+        assert hamming(a["phash"], b["phash"]) <= 6
+        assert hamming(a["dhash"], b["dhash"]) <= 10
+
+    def test_different_images_are_far(self):
+        a, b = image_hashes(_encode(_scene(1))), image_hashes(_encode(_scene(2)))
+        assert hamming(a["phash"], b["phash"]) > 6
+
+    def test_undecodable_input(self):
+        assert image_hashes(b"not an image") is None
+
+
+class TestIndex:
+    def test_bktree_matches_linear_scan(self):
+        rng = random.Random(3)
+        keys = [f"{rng.getrandbits(64):016x}" for _ in range(300)]
+        tree = BKTree()
+        for i, key in enumerate(keys):
+            tree.add(key, i)
+        probe = keys[17][:-1] + ("0" if keys[17][-1] != "0" else "1")
+        expected = sorted(i for i, key in enumerate(keys) if hamming(probe, key) <= 12)
+        assert sorted(value for _, _, value in tree.search(probe, 12)) == expected
+
+    def test_find_requires_both_hashes_close(self):
+        index = MediaHashIndex(phash_distance=4, dhash_distance=4)
+        index.add({"phash": "00000000000000ff", "dhash": "0000000000000000"}, {"public_url": "a"})
+        assert index.find({"phash": "00000000000000fe", "dhash": "0000000000000001"})["public_url"] == "a"
+        assert index.find({"phash": "00000000000000fe", "dhash": "ffffffff00000000"}) is None
+        assert index.find({"phash": "ffff0000000000ff", "dhash": "0000000000000000"}) is None
+
+    def test_group_near_duplicates(self):
+        rows = [
+            {"id": 1, "phash": "00000000000000ff", "dhash": None},
+            {"id": 2, "phash": "0f0f0f0f0f0f0f0f", "dhash": None},
+            {"id": 3, "phash": "00000000000000fe", "dhash": None},
+            {"id": 4, "phash": None},
+        ]
+        assert [[row["id"] for row in group] for group in group_near_duplicates(rows)] == [[1, 3]]
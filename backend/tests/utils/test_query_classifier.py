@@ -0,0 +1,87 @@
+"""
+Unit tests for the local Cost Guard classifier.
+"""
+import asyncio
+import threading
+import pytest
+
+from backend.utils.query_classifier import (
+    QueryNeedsClassifier,
+    LIVE_SEARCH_REQUIRED,
+    INTERNAL_KNOWLEDGE_SUFFICIENT,
+    MIN_TRAINING_SAMPLES,
+)
+
+
+class TestQueryNeedsClassifier:
+    """Tests for the rule and model stages"""
+
+    def test_rules_answer_common_cases(self, tmp_path):
+        clf = QueryNeedsClassifier(log_path=str(tmp_path / "log.jsonl"))
+
+        assert clf.classify("Louvre ticket prices 2026")[0] == LIVE_SEARCH_REQUIRED
+        assert clf.classify("history of Ephesus")[0] == INTERNAL_KNOWLEDGE_SUFFICIENT
+        assert clf.classify("Antalya beaches")[0] == INTERNAL_KNOWLEDGE_SUFFICIENT
+        assert clf.hit_rate() == 1.0
+
+    def test_ambiguous_query_falls_back(self, tmp_path):
+        clf = QueryNeedsClassifier(log_path=str(tmp_path / "log.jsonl"))
+
+        decision, confidence = clf.classify("Kas Turkey")
+
+        assert decision is None
+        assert confidence == 0.0
+        assert clf.stats["fallbacks"] == 1
+
+    def test_model_learns_from_logged_decisions(self, tmp_path):
+        log_path = str(tmp_path / "log.jsonl")
+        clf = QueryNeedsClassifier(log_path=log_path)
+        for i in range(MIN_TRAINING_SAMPLES):
+            clf.record(f"kas ferry {i}", LIVE_SEARCH_REQUIRED)
+            clf.record(f"kas sunsets {i}", INTERNAL_KNOWLEDGE_SUFFICIENT)
+
+        # A fresh instance retrains from the persisted log
+        reloaded = QueryNeedsClassifier(log_path=log_path)
+
+        assert reloaded.classify("kas ferry")[0] == LIVE_SEARCH_REQUIRED
+        assert reloaded.classify("kas sunsets")[0] == INTERNAL_KNOWLEDGE_SUFFICIENT
+        assert reloaded.stats["model_hits"] == 2
+
+    def test_samples_and_log_are_windowed(self, tmp_path):
+        log_path = tmp_path / "log.jsonl"
+        clf = QueryNeedsClassifier(log_path=str(log_path), max_samples=MIN_TRAINING_SAMPLES)
+        for i in range(5 * MIN_TRAINING_SAMPLES):
+            clf.record(f"query {i}", LIVE_SEARCH_REQUIRED)
+
+        assert len(clf._samples) == MIN_TRAINING_SAMPLES
+        assert len(log_path.read_text().splitlines()) <= 2 * MIN_TRAINING_SAMPLES
+        reloaded = QueryNeedsClassifier(log_path=str(log_path))
+        reloaded._ensure_loaded()
+        assert reloaded._samples[-1][0] == f"query {5 * MIN_TRAINING_SAMPLES - 1}"
+
+    def test_log_is_read_on_first_use(self, tmp_path):
+        log_path = str(tmp_path / "log.jsonl")
+        clf = QueryNeedsClassifier(log_path=log_path)
+        for i in range(MIN_TRAINING_SAMPLES):
+            clf.record(f"kas ferry {i}", LIVE_SEARCH_REQUIRED)
+
+        reloaded = QueryNeedsClassifier(log_path=log_path)
+        assert not reloaded._samples
+
+        reloaded.classify("kas ferry")
+        assert len(reloaded._samples) == MIN_TRAINING_SAMPLES
+
+    @pytest.mark.asyncio
+    async def test_retrains_off_the_event_loop(self, tmp_path, monkeypatch):
+        clf = QueryNeedsClassifier(log_path=str(tmp_path / "log.jsonl"))
+        threads = []
+        train = clf._train
+        monkeypatch.setattr(clf, "_train", lambda samples: (threads.append(threading.get_ident()), train(samples)))
+
+        for i in range(MIN_TRAINING_SAMPLES):
+            clf.record(f"kas ferry {i}", LIVE_SEARCH_REQUIRED)
+        while clf._maintaining:
+            await asyncio.sleep(0.01)
+
+        assert threads and threading.get_ident() not in threads
+        assert len((tmp_path / "log.jsonl").read_text().splitlines()) == MIN_TRAINING_SAMPLES
@@ -0,0 +1,87 @@
+"""
+Unit tests for the RPM/TPM token-bucket quotas.
+"""
+import time
+import sqlite3
+import asyncio
+import pytest
+
+from backend.utils.rate_quota import (
+    MemoryBucketBackend, QuotaWaitExceeded, RateQuota, SQLiteBucketBackend, estimate_tokens
+)
+
+QUOTAS = {"test-model": {"rpm": 60, "tpm": 1000}}
+
+
+class TestRateQuota:
+    """Tests for request and token buckets"""
+
+    def test_request_bucket_refills_at_rpm(self):
+        quota = RateQuota(QUOTAS, backend=MemoryBucketBackend())
+
+        waits = [quota.try_acquire("test-model") for _ in range(61)]
+
+        assert waits[:60] == [0.0] * 60
+        assert waits[60] == pytest.approx(1.0, abs=0.05)
+
+    def test_token_bucket_limits_large_prompts(self):
+        quota = RateQuota(QUOTAS, backend=MemoryBucketBackend())
+
+        assert quota.try_acquire("models/test-model", tokens=900) == 0.0
+        assert quota.try_acquire("test-model", tokens=200) == pytest.approx(6.0, abs=0.1)
+        # A denied take consumes nothing
+        assert quota.try_acquire("test-model", tokens=100) == 0.0
+
+    def test_unknown_model_uses_default(self):
+        quota = RateQuota({"default": {"rpm": 1, "tpm": None}}, backend=MemoryBucketBackend())
+
+        assert quota.try_acquire("other-model", tokens=10**9) == 0.0
+        assert quota.try_acquire("other-model") > 0
+
+    @pytest.mark.asyncio
+    async def test_acquire_gives_up_past_max_wait(self):
+        quota = RateQuota({"test-model": {"rpm": 1}}, backend=MemoryBucketBackend(), max_wait=0.5)
+        await quota.acquire("test-model")
+
+        with pytest.raises(QuotaWaitExceeded):
+            await quota.acquire("test-model")
+        assert quota.stats["rejected"] == 1
+
+    def test_sqlite_backend_is_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / "quota.sqlite")
+        worker = RateQuota({"test-model": {"rpm": 2}}, backend=SQLiteBucketBackend(path))
+        script = RateQuota({"test-model": {"rpm": 2}}, backend=SQLiteBucketBackend(path))
+
+        assert worker.try_acquire("test-model") == 0.0
+        assert script.try_acquire("test-model") == 0.0
+        assert worker.try_acquire("test-model") > 0
+
+    @pytest.mark.asyncio
+    async def test_locked_sqlite_bucket_does_not_block_the_loop(self, tmp_path):
+        path = str(tmp_path / "quota.sqlite")
+        quota = RateQuota({"test-model": {"rpm": 60}}, backend=SQLiteBucketBackend(path, busy_timeout_ms=20))
+        holder = sqlite3.connect(path, isolation_level=None)
+        holder.execute("BEGIN IMMEDIATE")
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.ensure_future(ticker())
+        acquiring = asyncio.ensure_future(quota.acquire("test-model"))
+        await asyncio.sleep(0.3)
+        assert not acquiring.done()
+        holder.execute("ROLLBACK")
+        holder.close()
+        await asyncio.wait_for(acquiring, 2.0)
+        ticking.cancel()
+
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+        assert quota.stats["delayed"] == 1
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens(["abcd", {"text": "abcdabcd"}]) == 3
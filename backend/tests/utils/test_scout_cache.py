@@ -0,0 +1,117 @@
+"""
+Unit tests for the scout report cache.
+"""
+import asyncio
+import time
+import pytest
+
+from backend.utils.async_utils import deadline_scope, remaining_budget
+from backend.utils.scout_cache import DegradedReport, ScoutReportCache, normalize_topic
+
+
+class TestScoutReportCache:
+    """Tests for TTL, stale-while-revalidate, near-duplicates and persistence"""
+
+    def test_normalize_topic_groups_variants(self):
+        assert normalize_topic("Antalya beaches") == normalize_topic("the beach in antalya")
+
+    @pytest.mark.asyncio
+    async def test_repeat_topic_is_served_from_cache(self, tmp_path):
+        builds = []
+
+        async def builder(topic):
+            builds.append(topic)
+            return f"report for {topic}"
+
+        cache = ScoutReportCache(path=str(tmp_path / "cache.json"))
+        first = await cache.get_or_build("Antalya beaches", builder)
+        second = await cache.get_or_build("Antalya beach", builder)
+
+        assert first == second == "report for Antalya beaches"
+        assert builds == ["Antalya beaches"]
+        assert cache.stats["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_served_while_refreshing(self, tmp_path):
+        builds = []
+
+        async def builder(topic):
+            builds.append(topic)
+            return f"report v{len(builds)}"
+
+        cache = ScoutReportCache(path=str(tmp_path / "cache.json"), ttl=10, stale_ttl=100)
+        await cache.get_or_build("Tuscany food tour", builder)
+        key, entry = cache.lookup("Tuscany food tour")
+        entry["created_at"] = time.time() - 50
+
+        stale = await cache.get_or_build("Tuscany food tour", builder)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        assert stale == "report v1"
+        assert cache.lookup("Tuscany food tour")[1]["report"] == "report v2"
+
+    @pytest.mark.asyncio
+    async def test_refresh_runs_without_the_request_deadline(self, tmp_path):
+        budgets = []
+
+        async def builder(topic):
+            budgets.append(remaining_budget())
+            return "report"
+
+        cache = ScoutReportCache(path=str(tmp_path / "cache.json"), ttl=10, stale_ttl=100)
+        with deadline_scope(5.0):
+            await cache.get_or_build("Tuscany food tour", builder)
+            cache.lookup("Tuscany food tour")[1]["created_at"] = time.time() - 50
+            await cache.get_or_build("Tuscany food tour", builder)
+        while cache._inflight:
+            await asyncio.sleep(0.01)
+
+        assert budgets == [None, None]
+
+    @pytest.mark.asyncio
+    async def test_entries_survive_restart(self, tmp_path):
+        path = str(tmp_path / "cache.json")
+
+        async def builder(topic):
+            return "persisted report"
+
+        await ScoutReportCache(path=path).get_or_build("Kyoto temples", builder)
+
+        async def failing_builder(topic):
+            raise AssertionError("should not rebuild")
+
+        restarted = ScoutReportCache(path=path)
+        assert await restarted.get_or_build("Kyoto temples", failing_builder) == "persisted report"
+
+    @pytest.mark.asyncio
+    async def test_degraded_report_is_short_lived(self, tmp_path):
+        builds = []
+
+        async def builder(topic):
+            builds.append(topic)
+            return DegradedReport("internal-only report") if len(builds) == 1 else "live report"
+
+        cache = ScoutReportCache(path=str(tmp_path / "cache.json"), ttl=100, stale_ttl=1000, degraded_ttl=10)
+        assert await cache.get_or_build("Bodrum nightlife", builder) == "internal-only report"
+        assert await cache.get_or_build("Bodrum nightlife", builder) == "internal-only report"
+
+        cache.lookup("Bodrum nightlife")[1]["created_at"] = time.time() - 50
+        assert await cache.get_or_build("Bodrum nightlife", builder) == "live report"
+        assert cache.stats["degraded"] == 1 and len(builds) == 2
+
+    @pytest.mark.asyncio
+    async def test_degraded_refresh_keeps_good_entry(self, tmp_path):
+        async def good(topic):
+            return "live report"
+
+        async def degraded(topic):
+            return DegradedReport("internal-only report")
+
+        cache = ScoutReportCache(path=str(tmp_path / "cache.json"), ttl=10, stale_ttl=100)
+        await cache.get_or_build("Cappadocia balloons", good)
+        cache.lookup("Cappadocia balloons")[1]["created_at"] = time.time() - 50
+
+        assert await cache.get_or_build("Cappadocia balloons", degraded) == "live report"
+        await asyncio.gather(*cache._inflight.values())
+        assert cache.lookup("Cappadocia balloons")[1]["report"] == "live report"
@@ -0,0 +1,50 @@
+"""
+Unit tests for the shared JSON serialization helpers.
+"""
+import json
+import pytest
+from pydantic import BaseModel
+
+from backend.utils.serialization import JSONDecodeError, dumps, dumps_bytes, extract_json_text, loads, parse_llm_json
+
+
+class _Item(BaseModel):
+    name: str
+    score: float
+
+
+class TestDumps:
+    def test_compact_and_stdlib_compatible(self):
+        value = {"query": "İstanbul nightlife", "scores": [0.5, 1], "nested": {"ok": True, "none": None}}
+        encoded = dumps(value)
+        assert " " not in encoded.replace("İstanbul nightlife", "")
+        assert json.loads(encoded) == value
+        assert dumps_bytes(value) == encoded.encode("utf-8")
+
+    def test_unknown_types_and_non_str_keys(self):
+        value = {1: _Item(name="kas", score=0.9), "tags": {"beach"}}
+        assert loads(dumps(value)) == {"1": {"name": "kas", "score": 0.9}, "tags": ["beach"]}
+
+    def test_indent(self):
+        assert "\n" in dumps({"a": [1, 2]}, indent=True)
+
+
+class TestLoads:
+    def test_accepts_str_and_bytes(self):
+        assert loads('{"a": 1}') == loads(b'{"a": 1}') == {"a": 1}
+
+    def test_decode_error_is_stdlib_type(self):
+        with pytest.raises(json.JSONDecodeError):
+            loads("not json")
+
+
+class TestLLMJson:
+    def test_extracts_fenced_blocks(self):
+        assert extract_json_text('Sure!\n```json\n{"a": 1}\n```') == '{"a": 1}'
+        assert extract_json_text('```\n[1, 2]\n```') == "[1, 2]"
+        assert extract_json_text('  {"a": 1} ') == '{"a": 1}'
+
+    def test_parse_llm_json(self):
+        assert parse_llm_json('```json\n{"intent": "relax"}\n```') == {"intent": "relax"}
+        with pytest.raises(JSONDecodeError):
+            parse_llm_json("I could not produce JSON")
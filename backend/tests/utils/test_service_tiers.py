@@ -0,0 +1,83 @@
+"""
+Unit tests for service tier selection and cache-only answers.
+"""
+import sqlite3
+import pytest
+
+from backend.utils import service_tiers
+from backend.utils.service_tiers import resolve_tier, tier_for_load, tier_stages, template_recommendation
+from backend.utils.shared_state import MemoryStateBackend
+
+
+class TestTierSelection:
+    def test_load_caps_requested_tier(self):
+        assert resolve_tier("full", tier_for_load(0, 8)) == "full"
+        assert resolve_tier("full", tier_for_load(8, 8)) == "standard"
+        assert resolve_tier("full", tier_for_load(20, 8)) == "lite"
+        assert resolve_tier("full", tier_for_load(30, 8)) == "cache_only"
+
+    def test_cheaper_request_is_not_upgraded(self):
+        assert resolve_tier("lite", "standard") == "lite"
+        assert resolve_tier(None, "full") == service_tiers.DEFAULT_TIER
+
+    def test_lite_is_persona_retrieval_generation(self):
+        assert tier_stages("lite") == {"persona", "retrieval", "generation"}
+
+
+class TestCacheOnly:
+    @pytest.fixture(autouse=True)
+    def _memory_state(self, monkeypatch):
+        monkeypatch.setattr(service_tiers, "shared_state", MemoryStateBackend())
+
+    @pytest.mark.asyncio
+    async def test_cached_answer_found_for_query_variant(self):
+        await service_tiers.cache_recommendation("Antalya beaches", {"content": "Go to Kaputas", "confidence": 0.9}, "full")
+
+        cached = await service_tiers.get_cached_recommendation("the beach in Antalya")
+
+        assert cached["content"] == "Go to Kaputas"
+        assert cached["source_tier"] == "full"
+
+    @pytest.mark.asyncio
+    async def test_fallback_answers_are_not_cached(self):
+        await service_tiers.cache_recommendation("Antalya", {"content": "x", "confidence": 0.5, "fallback": True}, "lite")
+
+        assert await service_tiers.get_cached_recommendation("Antalya") is None
+
+    @pytest.mark.asyncio
+    async def test_personalized_answers_stay_with_their_user(self):
+        await service_tiers.cache_recommendation("Antalya beaches", {"content": "For you, Alice", "confidence": 0.9}, "full", scope="user:alice")
+
+        assert (await service_tiers.get_cached_recommendation("Antalya beaches", scope="user:alice"))["content"] == "For you, Alice"
+        assert await service_tiers.get_cached_recommendation("Antalya beaches", scope="user:bob") is None
+        assert await service_tiers.get_cached_recommendation("Antalya beaches") is None
+
+    @pytest.mark.asyncio
+    async def test_scoped_lookup_falls_back_to_shared_answer(self):
+        await service_tiers.cache_recommendation("Antalya beaches", {"content": "Go to Kaputas", "confidence": 0.9}, "full")
+
+        assert (await service_tiers.get_cached_recommendation("Antalya beaches", scope=service_tiers.cache_scope("s1")))["content"] == "Go to Kaputas"
+        assert service_tiers.cache_scope("s1", "anonymous") == "session:s1"
+        assert service_tiers.cache_scope("s1", "u1") == "user:u1"
+
+    @pytest.mark.asyncio
+    async def test_store_errors_are_a_miss_and_a_noop(self, monkeypatch):
+        class BusyStore:
+            def get(self, key, default=None):
+                raise sqlite3.OperationalError("database is locked")
+
+            def set(self, key, value, ttl=None):
+                raise sqlite3.OperationalError("database is locked")
+
+        monkeypatch.setattr(service_tiers, "shared_state", BusyStore())
+
+        await service_tiers.cache_recommendation("Antalya", {"content": "x", "confidence": 0.9}, "full")
+        assert await service_tiers.get_cached_recommendation("Antalya", scope="user:alice") is None
+
+    def test_template_lists_retrieved_posts(self):
+        rec = template_recommendation("Tuscany food", [
+            {"title": "Eating Through Florence", "excerpt": "Markets and trattorias", "similarity": 0.8},
+        ])
+
+        assert "Eating Through Florence: Markets and trattorias" in rec["content"]
+        assert rec["confidence"] == 0.6
@@ -0,0 +1,103 @@
+"""
+Unit tests for the shared state backends.
+"""
+import time
+import sqlite3
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from backend.utils.shared_state import (
+    MemoryStateBackend, SQLiteStateBackend, backend_from_uri, claim_cooldown, limiter_storage_uri
+)
+from backend.utils.scout_cache import ScoutReportCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStateBackend()
+    return SQLiteStateBackend(str(tmp_path / "state.sqlite"))
+
+
+class TestStateBackends:
+    """Same contract for every backend"""
+
+    def test_set_get_and_expiry(self, backend):
+        backend.set("a", {"x": 1})
+        backend.set("b", "short", ttl=0.05)
+        time.sleep(0.1)
+
+        assert backend.get("a") == {"x": 1}
+        assert backend.get("b") is None
+        assert backend.items() == {"a": {"x": 1}}
+
+    def test_set_if_absent_wins_once(self, backend):
+        assert backend.set_if_absent("lock", 1, ttl=60)
+        assert not backend.set_if_absent("lock", 2, ttl=60)
+        assert backend.get("lock") == 1
+
+    def test_incr_keeps_first_expiry(self, backend):
+        assert backend.incr("n", ttl=60) == 1
+        assert backend.incr("n", 2, ttl=1) == 3
+        assert backend.ttl("n") > 30
+
+    def test_items_and_clear_by_prefix(self, backend):
+        backend.set("scout:a", 1)
+        backend.set("scout:b", 2)
+        backend.set("other", 3)
+        backend.clear("scout:")
+
+        assert backend.items() == {"other": 3}
+
+
+class TestCrossWorker:
+    def test_cooldown_claimed_by_one_worker(self, tmp_path):
+        path = str(tmp_path / "state.sqlite")
+        worker_a, worker_b = backend_from_uri(f"sqlite:///{path}"), backend_from_uri(f"sqlite:///{path}")
+
+        assert claim_cooldown("heal", 60, backend=worker_a)
+        assert not claim_cooldown("heal", 60, backend=worker_b)
+
+    def test_limits_storage_counts_across_workers(self, tmp_path):
+        uri = limiter_storage_uri(SQLiteStateBackend(str(tmp_path / "state.sqlite")))
+        item = parse("2/minute")
+        worker_a = FixedWindowRateLimiter(storage_from_string(uri))
+        worker_b = FixedWindowRateLimiter(storage_from_string(uri))
+
+        assert worker_a.hit(item, "client")
+        assert worker_b.hit(item, "client")
+        assert not worker_a.hit(item, "client")
+
+    @pytest.mark.asyncio
+    async def test_scout_report_shared_between_workers(self, tmp_path):
+        store_path = str(tmp_path / "state.sqlite")
+        builds = []
+
+        async def builder(topic):
+            builds.append(topic)
+            return f"report for {topic}"
+
+        worker_a = ScoutReportCache(path=str(tmp_path / "a.json"), store=SQLiteStateBackend(store_path))
+        worker_b = ScoutReportCache(path=str(tmp_path / "b.json"), store=SQLiteStateBackend(store_path))
+        await worker_a.get_or_build("Kyoto temples", builder)
+        report = await worker_b.get_or_build("Kyoto temple", builder)
+
+        assert report == "report for Kyoto temples"
+        assert builds == ["Kyoto temples"]
+
+    def test_locked_sqlite_fails_fast(self, tmp_path):
+        path = str(tmp_path / "state.sqlite")
+        holder = sqlite3.connect(path, isolation_level=None)
+        backend = SQLiteStateBackend(path, busy_timeout_ms=20)
+        holder.execute("BEGIN IMMEDIATE")
+        try:
+            started = time.monotonic()
+            with pytest.raises(sqlite3.OperationalError):
+                backend.incr("limits:client", ttl=60)
+            assert time.monotonic() - started < 1.0
+            assert not claim_cooldown("heal", 60, backend=backend)
+        finally:
+            holder.execute("ROLLBACK")
+            holder.close()
@@ -0,0 +1,70 @@
+"""
+Unit tests for the per-session signal store.
+"""
+from backend.utils.signal_store import SignalStore, SessionSignals, SIGNAL_WINDOW
+
+
+def _row(i, ts, vibe="Zen", signal_type="view", target_type="post"):
+    return {
+        "id": f"sig-{i}",
+        "signal_type": signal_type,
+        "target_type": target_type,
+        "metadata": {"vibe": vibe},
+        "created_at": ts,
+    }
+
+
+class TestSessionSignals:
+    """Tests for incremental aggregation"""
+
+    def test_incremental_apply_only_counts_new_rows(self):
+        entry = SessionSignals("s1")
+        entry.apply([_row(2, "2026-01-01T10:05:00+00:00"), _row(1, "2026-01-01T10:00:00+00:00")])
+        # Boundary re-fetch (gte cursor) returns row 2 again plus a new row
+        added = entry.apply([_row(2, "2026-01-01T10:05:00+00:00"), _row(3, "2026-01-01T11:00:00+00:00", vibe="Luxury")])
+
+        assert added == 1
+        assert entry.total == 3
+        assert entry.last_created_at == "2026-01-01T11:00:00+00:00"
+        assert [r["id"] for r in entry.signals] == ["sig-3", "sig-2", "sig-1"]
+        assert entry.features()["vibes"] == {"Zen": 2, "Luxury": 1}
+
+    def test_recency_weighting_decays_older_signals(self):
+        entry = SessionSignals("s1")
+        entry.apply([_row(1, "2026-01-01T00:00:00+00:00", vibe="Zen")])
+        entry.apply([_row(2, "2026-01-03T00:00:00+00:00", vibe="Luxury")])
+
+        scores = entry.features()["recency_weighted"]["vibes"]
+        assert scores["Luxury"] == 1.0
+        assert scores["Zen"] < 0.5
+
+    def test_window_is_bounded(self):
+        entry = SessionSignals("s1")
+        entry.apply([_row(i, f"2026-01-01T10:{i:02d}:00+00:00") for i in range(SIGNAL_WINDOW + 5)])
+
+        assert len(entry.signals) == SIGNAL_WINDOW
+        assert entry.total == SIGNAL_WINDOW + 5
+
+    def test_engaged_posts_drained_once(self):
+        entry = SessionSignals("s1")
+        rows = [
+            {**_row(1, "2026-01-01T10:00:00+00:00"), "target_id": "post-a"},
+            {**_row(2, "2026-01-01T10:01:00+00:00", signal_type="scroll"), "target_id": "post-b"},
+            {**_row(3, "2026-01-01T10:02:00+00:00", signal_type="like"), "target_id": "post-c"},
+        ]
+        entry.apply(rows)
+
+        assert entry.drain_engaged_posts() == ["post-a", "post-c"]
+        assert entry.drain_engaged_posts() == []
+
+
+class TestSignalStore:
+    def test_lru_eviction(self):
+        store = SignalStore(max_sessions=2)
+        first = store.get("a")
+        store.get("b")
+        store.get("a")
+        store.get("c")
+
+        assert store.get("a") is first
+        assert "b" not in store._sessions
@@ -0,0 +1,74 @@
+"""
+Unit tests for stream encodings, deltas and token coalescing.
+"""
+import asyncio
+import json
+import pytest
+
+from backend.utils.stream_encoding import DeltaTracker, coalesce_tokens, encode_stream, negotiate
+
+
+async def _events(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def _collect(agen):
+    return [item async for item in agen]
+
+
+class TestNegotiation:
+    def test_query_param_wins_over_accept(self):
+        assert negotiate("text/event-stream", "ndjson") == "ndjson"
+
+    def test_accept_header_and_default(self):
+        assert negotiate("text/event-stream, */*") == "sse"
+        assert negotiate("*/*") == "ndjson"
+
+
+class TestCoalescing:
+    @pytest.mark.asyncio
+    async def test_tokens_within_window_are_merged(self):
+        events = [{"type": "token", "data": t} for t in ("Hel", "lo ", "there")] + [{"type": "done", "data": "complete"}]
+
+        out = await _collect(coalesce_tokens(_events(events), window=0.5))
+
+        assert out == [{"type": "token", "data": "Hello there"}, {"type": "done", "data": "complete"}]
+
+    @pytest.mark.asyncio
+    async def test_window_expiry_flushes_slow_tokens(self):
+        events = [{"type": "token", "data": "a"}, {"type": "token", "data": "b"}]
+
+        out = await _collect(coalesce_tokens(_events(events, delay=0.05), window=0.01))
+
+        assert [e["data"] for e in out] == ["a", "b"]
+
+
+class TestDeltas:
+    def test_repeated_snapshot_sends_changed_keys_only(self):
+        tracker = DeltaTracker()
+        tracker.reduce("analysis", {"vibe": "Zen", "pace": "Slow"})
+
+        assert tracker.reduce("analysis", {"vibe": "Zen", "pace": "Fast"}) == {"pace": "Fast"}
+        assert tracker.reduce("status", "Searching") == "Searching"
+
+    @pytest.mark.asyncio
+    async def test_sse_frames_carry_event_names(self):
+        events = [
+            {"type": "agent_start", "agent": "scout", "data": "Researching"},
+            {"type": "token", "data": "Hi"},
+        ]
+
+        out = b"".join(await _collect(encode_stream(_events(events), "sse")))
+
+        frames = out.decode().strip().split("\n\n")
+        assert frames[0] == 'event: agent_start\ndata: {"agent":"scout","data":"Researching"}'
+        assert frames[1] == 'event: token\ndata: "Hi"'
+
+    @pytest.mark.asyncio
+    async def test_ndjson_keeps_original_event_shape(self):
+        out = await _collect(encode_stream(_events([{"type": "status", "data": "Reading Signals..."}])))
+
+        assert json.loads(out[0]) == {"type": "status", "data": "Reading Signals..."}
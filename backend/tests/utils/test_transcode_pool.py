@@ -0,0 +1,87 @@
+"""
+Unit tests for the process-pool transcoding stage.
+"""
+import io
+import os
+import asyncio
+import pytest
+from PIL import Image
+
+from backend.utils import transcode_pool
+from backend.utils.transcode_pool import TranscodePool
+
+
+def _png(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (10, 90, 160)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pool():
+    pool = TranscodePool(workers=2, max_pending=2, shm_threshold=4096)
+    assert pool.start() == 2
+    yield pool
+    pool.shutdown()
+
+
+class TestTranscodePool:
+    @pytest.mark.asyncio
+    async def test_small_and_shared_memory_inputs(self, pool):
+        small = _png(64, 32)
+        large = _png(1200, 800)
+        assert len(small) < pool.shm_threshold <= len(large)
+
+        (webp_small, w1, h1), (webp_large, w2, h2) = await asyncio.gather(
+            pool.transcode(small, max_width=800), pool.transcode(large, max_width=800)
+        )
+        assert (w1, h1) == (64, 32) and (w2, h2) == (800, 533)
+        assert Image.open(io.BytesIO(webp_large)).format == "WEBP"
+        assert pool.stats["process"] == 2 and pool.stats["shared_memory"] == 1
+
+    @pytest.mark.asyncio
+    async def test_pending_work_is_bounded(self, pool):
+        results = await asyncio.gather(*[pool.transcode(_png(300, 200)) for _ in range(6)])
+        assert all(r[1:] == (300, 200) for r in results)
+        assert pool._get_slots()._value == pool.max_pending
+
+    @pytest.mark.asyncio
+    async def test_variants_from_one_submission(self, pool):
+        variants = await pool.variants(_png(1200, 800), widths=[320, 640, 1920])
+        assert [(v["width"], v["height"]) for v in variants] == [(1200, 800), (640, 427), (320, 213)]
+        assert pool.stats["shared_memory"] == 1
+
+    @pytest.mark.asyncio
+    async def test_hashes_in_worker(self, pool):
+        hashes = await pool.hashes(_png(400, 300))
+        assert set(hashes) == {"phash", "dhash"}
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_keeps_shared_memory_until_worker_finishes(self, pool, monkeypatch):
+        blocks = []
+        create = transcode_pool.shared_memory.SharedMemory
+
+        def tracking(*args, **kwargs):
+            blocks.append(create(*args, **kwargs))
+            return blocks[-1]
+
+        monkeypatch.setattr(transcode_pool.shared_memory, "SharedMemory", tracking)
+        task = asyncio.ensure_future(pool.transcode(_png(2400, 1600)))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert os.path.exists(f"/dev/shm/{blocks[0].name}")
+        for _ in range(200):
+            if not os.path.exists(f"/dev/shm/{blocks[0].name}"):
+                break
+            await asyncio.sleep(0.05)
+        assert not os.path.exists(f"/dev/shm/{blocks[0].name}")
+
+    @pytest.mark.asyncio
+    async def test_thread_fallback_when_disabled(self):
+        pool = TranscodePool(workers=0)
+        webp, width, height = await pool.transcode(_png(50, 40))
+        assert webp and (width, height) == (50, 40)
+        assert pool.stats["thread"] == 1
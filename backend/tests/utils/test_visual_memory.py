@@ -0,0 +1,113 @@
+"""
+Unit tests for near-duplicate handling in VisualMemory.ingest_image (no network access).
+"""
+import asyncio
+import pytest
+
+from backend.utils import visual_memory as module
+from backend.utils.visual_memory import VisualMemory
+
+HASHES = {"phash": "00000000000000ff", "dhash": "0000000000000000"}
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    memory = VisualMemory("https://test.supabase.co", "test-key")
+    memory.hash_index.loaded = True
+    stored = []
+
+    async def download(url):
+        return b"image bytes"
+
+    async def hashes(data):
+        return dict(HASHES)
+
+    async def store(url, image_data, post_title, tags, hashes):
+        stored.append(url)
+        await asyncio.sleep(0.02)
+        if memory.fail_next:
+            memory.fail_next = False
+            return None
+        public_url = f"https://test.supabase.co/storage/{len(stored)}.webp"
+        memory.hash_index.add(hashes, {"public_url": public_url})
+        return public_url
+
+    monkeypatch.setattr(memory.processor, "download_image", download)
+    monkeypatch.setattr(module.transcode_pool, "hashes", hashes)
+    monkeypatch.setattr(memory, "_store_image", store)
+    memory.stored = stored
+    memory.fail_next = False
+    return memory
+
+
+class TestConcurrentDedup:
+    @pytest.mark.asyncio
+    async def test_concurrent_copies_share_the_first_ingest(self, memory):
+        urls = await asyncio.gather(*[
+            memory.ingest_image(f"https://images.example.com/photo?w={w}", "Kas") for w in (800, 1200, 1600)
+        ])
+
+        assert len(memory.stored) == 1
+        assert urls == ["https://test.supabase.co/storage/1.webp"] * 3
+        assert memory._inflight_hashes == []
+
+    @pytest.mark.asyncio
+    async def test_waiter_takes_over_when_first_ingest_fails(self, memory):
+        memory.fail_next = True
+
+        first, second = await asyncio.gather(
+            memory.ingest_image("https://images.example.com/a", "Kas"),
+            memory.ingest_image("https://images.example.com/b", "Kas"),
+        )
+
+        assert first == "https://images.example.com/a"
+        assert second == "https://test.supabase.co/storage/2.webp"
+        assert memory.stored == ["https://images.example.com/a", "https://images.example.com/b"]
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+    async def text(self):
+        return "column media_library.variants does not exist"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.posts = []
+
+    def post(self, url, **kwargs):
+        self.posts.append(url)
+        return FakeResponse(self.statuses.pop(0))
+
+
+class TestIndexing:
+    @pytest.mark.asyncio
+    async def test_rejected_insert_reports_failure(self, monkeypatch):
+        session = FakeSession([400])
+        monkeypatch.setattr(module, "get_http_session", lambda: session)
+        memory = VisualMemory("https://test.supabase.co", "test-key")
+
+        indexed = await memory._index_in_db("https://x/a.webp", "a.webp", "Kas", [], 10, 10, 100, "https://unsplash.com/a")
+
+        assert indexed is False
+        assert len(session.posts) == 1  # no dual write for a row that was not stored
+
+    @pytest.mark.asyncio
+    async def test_insert_and_dual_write_share_the_pool(self, monkeypatch):
+        session = FakeSession([201, 201])
+        monkeypatch.setattr(module, "get_http_session", lambda: session)
+        memory = VisualMemory("https://test.supabase.co", "test-key")
+
+        indexed = await memory._index_in_db("https://x/a.webp", "a.webp", "Kas", [], 10, 10, 100, "https://unsplash.com/a")
+
+        assert indexed is True
+        assert [url.rsplit("/", 1)[-1] for url in session.posts] == ["media_library", "media"]
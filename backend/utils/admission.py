@@ -0,0 +1,165 @@
+"""
+Admission Control for the Recommendation Pipeline
+
+slowapi limits each client IP, but nothing bounded the number of pipelines
+running at once: a burst from many IPs fanned out into hundreds of concurrent
+Gemini calls and exhausted the thread pool. The controller admits at most
+ADMISSION_MAX_IN_FLIGHT pipelines per worker; further requests wait in a
+bounded FIFO queue for up to ADMISSION_QUEUE_TIMEOUT seconds.
+
+- Queue full or wait timed out -> `Overloaded`, served as a fast 503 with a
+  Retry-After estimated from the recent pipeline duration and the backlog.
+- Queue at least ADMISSION_DEGRADE_DEPTH deep on arrival -> the ticket is
+  marked degraded and the pipeline drops to a cheaper service tier
+  (service_tiers.tier_for_load) so the backlog drains faster.
+"""
+
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from typing import Any, Dict, Optional
+
+from backend.utils.async_utils import budget_timeout
+
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+ADMISSION_DEGRADE_DEPTH = int(os.getenv("ADMISSION_DEGRADE_DEPTH", "8"))
+DEFAULT_PIPELINE_SECONDS = 10.0
+MAX_RETRY_AFTER = 60
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint."""
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({reason}); retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One admitted pipeline; release() is idempotent."""
+    def __init__(self, controller: "AdmissionController", degraded: bool, waited: float, queue_depth: int = 0):
+        self.controller = controller
+        self.degraded = degraded
+        self.queue_depth = queue_depth
+        self.waited = waited
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(time.monotonic() - self.started)
+
+
+class AdmissionController:
+    """Bounded in-flight pipelines with a bounded, time-limited wait queue."""
+    def __init__(
+        self,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        degrade_depth: int = ADMISSION_DEGRADE_DEPTH
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.degrade_depth = degrade_depth
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._avg_seconds: Optional[float] = None
+        self.stats = {"admitted": 0, "queued": 0, "degraded": 0, "rejected_full": 0, "rejected_timeout": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for w in self._waiters if not w.done())
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: avg pipeline time x backlog per slot."""
+        avg = self._avg_seconds or DEFAULT_PIPELINE_SECONDS
+        backlog = (self.queue_depth + 1) / self.max_in_flight
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(avg * backlog)))
+
+    def _reject(self, reason: str):
+        self.stats["rejected_full" if reason == "queue_full" else "rejected_timeout"] += 1
+        raise Overloaded(reason, self.retry_after())
+
+    async def acquire(self) -> Ticket:
+        depth = self.queue_depth
+        degraded = self.degrade_depth > 0 and depth >= self.degrade_depth
+        started = time.monotonic()
+
+        if self.in_flight < self.max_in_flight and not self.queue_depth:
+            self.in_flight += 1
+        else:
+            if self.queue_depth >= self.max_queue:
+                self._reject("queue_full")
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self.stats["queued"] += 1
+            try:
+                # The slot is handed over by _release, so in_flight is already counted
+                await asyncio.wait_for(waiter, budget_timeout(self.queue_timeout))
+            except asyncio.TimeoutError:
+                self._discard(waiter)
+                self._reject("queue_timeout")
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release(None)
+                self._discard(waiter)
+                raise
+
+        self.stats["admitted"] += 1
+        if degraded:
+            self.stats["degraded"] += 1
+        return Ticket(self, degraded, time.monotonic() - started, depth)
+
+    def _discard(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release(self, duration: Optional[float]):
+        if duration is not None:
+            self._avg_seconds = duration if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * duration
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight = max(0, self.in_flight - 1)
+
+    def admit(self) -> "_Admission":
+        """`async with admission.admit() as ticket:` for request-scoped pipelines."""
+        return _Admission(self)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "avg_pipeline_seconds": round(self._avg_seconds, 2) if self._avg_seconds else None,
+            **self.stats
+        }
+
+
+class _Admission:
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+        self.ticket: Optional[Ticket] = None
+
+    async def __aenter__(self) -> Ticket:
+        self.ticket = await self.controller.acquire()
+        return self.ticket
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.ticket.release()
+        return False
+
+# Singleton instance
+admission = AdmissionController()
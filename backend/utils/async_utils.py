@@ -1,10 +1,15 @@
+import os
 import asyncio
+import contextvars
 import random
 import time
 import uuid
 import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
 from functools import wraps
-from typing import TypeVar, Callable, Any, List, Optional
+from typing import TypeVar, Callable, Any, Dict, List, Optional
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -18,26 +23,440 @@ DEFAULT_INITIAL_DELAY = 1.0
 DEFAULT_BACKOFF_MULTIPLIER = 2.0
 DEFAULT_TIMEOUT = 60.0
 
-class GlobalRateLimiter:
+# --- Request Deadlines ---
+# One deadline per request, carried in a context variable so every nested call
+# (retries, thread hops, Gemini timeouts, limiter queues) only gets the
+# remaining budget instead of its own independent timeout.
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "90"))
+_deadline: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request-level deadline ran out. A TimeoutError, but never retried."""
+
+@contextmanager
+def deadline_scope(seconds: float = REQUEST_DEADLINE_SECONDS):
+    """Sets a deadline `seconds` from now (never extending an enclosing one)."""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        try:
+            _deadline.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. an abandoned streaming generator)
+            _deadline.set(current)
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left before the current deadline, or None when no deadline is set."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def budget_timeout(timeout: float) -> float:
+    """`timeout` capped to the remaining budget; raises DeadlineExceeded if none is left."""
+    remaining = remaining_budget()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(timeout, remaining)
+
+# The loop only keeps weak references to tasks; fire-and-forget tasks are held here until done
+_background_tasks: set = set()
+
+def spawn_background(coro) -> asyncio.Task:
+    """Starts a fire-and-forget task that does not inherit the request deadline."""
+    ctx = contextvars.copy_context()
+    ctx.run(_deadline.set, None)
+    task = ctx.run(asyncio.ensure_future, coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def wait_within_budget(fut: asyncio.Future) -> Any:
+    """
+    Waits on a shared future/task for at most the remaining budget. Giving up
+    raises DeadlineExceeded but leaves `fut` running for the other waiters.
+    """
+    remaining = remaining_budget()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    try:
+        return await asyncio.wait_for(asyncio.shield(fut), remaining)
+    except asyncio.TimeoutError:
+        if fut.done():
+            raise  # the shared work itself timed out
+        raise DeadlineExceeded("Request deadline exceeded") from None
+
+# --- Adaptive Concurrency (AIMD) ---
+LIMITER_MAX_CONCURRENT = int(os.getenv("LIMITER_MAX_CONCURRENT", "32"))
+LIMITER_LATENCY_TOLERANCE = float(os.getenv("LIMITER_LATENCY_TOLERANCE", "2.0"))
+LIMITER_BACKOFF = 0.5           # multiplicative cut on 429/5xx/timeouts
+LIMITER_LATENCY_BACKOFF = 0.9   # gentler cut when latency degrades
+LIMITER_DECREASE_COOLDOWN = 1.0 # one cut per burst of failures
+
+class UpstreamHTTPError(Exception):
+    """HTTP error from an upstream API, carrying the status and Retry-After (seconds)."""
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP-date)."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _overload_info(error: BaseException):
+    """Returns (is_overload, retry_after) for an upstream failure."""
+    if isinstance(error, DeadlineExceeded):
+        return False, None  # our own budget, not upstream health
+    response = getattr(error, "response", None)
+    status = getattr(error, "status", None) or getattr(response, "status_code", None)
+    headers = getattr(error, "headers", None) or getattr(response, "headers", None)
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None and headers:
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+
+    if isinstance(error, asyncio.TimeoutError):
+        return True, retry_after
+    if isinstance(status, int):
+        return status == 429 or status >= 500, retry_after
+    err_str = str(error).lower()
+    overloaded = any(x in err_str for x in ["429", "500", "502", "503", "504", "timeout", "quota", "resource_exhausted"])
+    return overloaded, retry_after
+
+class AdaptiveLimiter:
+    """
+    Per-upstream concurrency limiter with AIMD tuning.
+
+    The limit grows by ~1 per round-trip while the limiter is saturated and
+    latency stays within LIMITER_LATENCY_TOLERANCE x the observed baseline, and
+    is cut multiplicatively on 429/5xx/timeouts. A Retry-After from the upstream
+    pauses new acquisitions until it expires.
+
+    Instances are singletons per name; `max_concurrent` only seeds the initial
+    limit of a new upstream, later callers share the adapted value.
+    """
+    _instances: Dict[str, "AdaptiveLimiter"] = {}
+
+    def __new__(cls, name: str, max_concurrent: int = 5, min_limit: int = 1, max_limit: Optional[int] = None):
+        instance = cls._instances.get(name)
+        if instance is None:
+            instance = super(AdaptiveLimiter, cls).__new__(cls)
+            instance._setup(name, max_concurrent, min_limit, max_limit or max(LIMITER_MAX_CONCURRENT, max_concurrent))
+            cls._instances[name] = instance
+        return instance
+
+    def _setup(self, name: str, initial: int, min_limit: int, max_limit: int):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._queued = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._baseline: Optional[float] = None
+        self._starts: Dict[int, List[float]] = {}
+        self.stats = {"acquired": 0, "succeeded": 0, "failed": 0, "decreases": 0,
+                      "avg_wait_ms": 0.0, "max_wait_ms": 0.0}
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        self._queued += 1
+        try:
+            while True:
+                pause = self._blocked_until - time.monotonic()
+                if pause > 0:
+                    if pause > budget_timeout(pause):
+                        raise DeadlineExceeded(f"{self.name}: Retry-After outlasts the request deadline")
+                    await asyncio.sleep(pause)
+                    continue
+                if self.in_flight < int(self.limit):
+                    break
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+                try:
+                    remaining = remaining_budget()
+                    if remaining is None:
+                        await waiter
+                    else:
+                        try:
+                            await asyncio.wait_for(waiter, max(0.0, remaining))
+                        except asyncio.TimeoutError:
+                            raise DeadlineExceeded(f"{self.name}: request deadline hit while queued")
+                finally:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+        finally:
+            self._queued -= 1
+
+        self.in_flight += 1
+        wait_ms = (time.monotonic() - started) * 1000
+        self.stats["acquired"] += 1
+        self.stats["avg_wait_ms"] += (wait_ms - self.stats["avg_wait_ms"]) * 0.1
+        self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], wait_ms)
+
+    def release(self, latency: Optional[float] = None, error: Optional[BaseException] = None):
+        self.in_flight = max(0, self.in_flight - 1)
+        if error is not None:
+            self.stats["failed"] += 1
+            overloaded, retry_after = _overload_info(error)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            if overloaded:
+                self._decrease(LIMITER_BACKOFF)
+        elif latency is not None:
+            self.stats["succeeded"] += 1
+            self._on_success(latency)
+        self._wake()
+
+    def _on_success(self, latency: float):
+        if self._baseline is None or latency < self._baseline:
+            self._baseline = latency
+        else:
+            # Let the baseline drift up slowly so it tracks a changing upstream
+            self._baseline += (latency - self._baseline) * 0.02
+
+        if latency > self._baseline * LIMITER_LATENCY_TOLERANCE:
+            self._decrease(LIMITER_LATENCY_BACKOFF)
+        elif self.in_flight + 1 >= int(self.limit):
+            # Additive increase: ~+1 per `limit` successful completions
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        if now - self._last_decrease < LIMITER_DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        new_limit = max(self.min_limit, self.limit * factor)
+        if new_limit < self.limit:
+            self.stats["decreases"] += 1
+            logger.warning(f"[{self.name}] Concurrency limit {self.limit:.1f} -> {new_limit:.1f}")
+        self.limit = new_limit
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        for waiter in list(self._waiters)[:max(0, free)]:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    @property
+    def waiting(self) -> int:
+        """Callers queued for a slot (or paused by Retry-After)."""
+        return self._queued
+
+    async def __aenter__(self):
+        await self.acquire()
+        self._starts.setdefault(id(asyncio.current_task()), []).append(time.monotonic())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        key = id(asyncio.current_task())
+        stack = self._starts.get(key) or [time.monotonic()]
+        started = stack.pop()
+        if not stack:
+            self._starts.pop(key, None)
+        if exc_val is not None and not isinstance(exc_val, asyncio.CancelledError):
+            self.release(error=exc_val)
+        elif exc_val is None:
+            self.release(latency=time.monotonic() - started)
+        else:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queue_depth": self._queued,
+            "retry_after_remaining": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+            "baseline_latency_ms": round((self._baseline or 0.0) * 1000, 1),
+            **{k: round(v, 1) if isinstance(v, float) else v for k, v in self.stats.items()}
+        }
+
+    @classmethod
+    def snapshot_all(cls) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.snapshot() for name, limiter in cls._instances.items()}
+
+# Backwards-compatible name: every GlobalRateLimiter is now adaptive.
+GlobalRateLimiter = AdaptiveLimiter
+
+# --- Circuit Breaker ---
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW_SECONDS", "30"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "20"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+BREAKER_HALF_OPEN_PROBES = 1
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open. Never retried."""
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit open for {name} (retry in {retry_in:.1f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+class CircuitBreaker:
     """
-    Semaphore-based rate limiter to prevent overwhelming external APIs or DB.
+    Per-upstream circuit breaker (closed -> open -> half-open -> closed).
+
+    Over a sliding window of BREAKER_WINDOW seconds, the circuit opens once at
+    least BREAKER_MIN_CALLS calls were seen and the share of failed or slow
+    (> BREAKER_SLOW_CALL s) calls reaches BREAKER_FAILURE_RATE. While open,
+    calls raise CircuitOpenError immediately so callers drop to their fallbacks.
+    After BREAKER_OPEN_SECONDS a single probe is let through (half-open); its
+    outcome closes or re-opens the circuit. Client errors (4xx) do not count.
     """
-    _instances = {}
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    _instances: Dict[str, "CircuitBreaker"] = {}
 
-    def __new__(cls, name: str, max_concurrent: int = 5):
-        if name not in cls._instances:
-            instance = super(GlobalRateLimiter, cls).__new__(cls)
-            instance.semaphore = asyncio.Semaphore(max_concurrent)
-            instance.name = name
+    def __new__(cls, name: str):
+        instance = cls._instances.get(name)
+        if instance is None:
+            instance = super(CircuitBreaker, cls).__new__(cls)
+            instance._setup(name)
             cls._instances[name] = instance
-        return cls._instances[name]
+        return instance
+
+    def _setup(self, name: str):
+        self.name = name
+        self.state = self.CLOSED
+        self.window = BREAKER_WINDOW
+        self.min_calls = BREAKER_MIN_CALLS
+        self.failure_rate = BREAKER_FAILURE_RATE
+        self.slow_call = BREAKER_SLOW_CALL
+        self.open_seconds = BREAKER_OPEN_SECONDS
+        self._calls: deque = deque()
+        self._opened_at = 0.0
+        self._probes = 0
+        self._starts: Dict[int, List[float]] = {}
+        self.stats = {"rejected": 0, "opened": 0}
+
+    def check(self):
+        """Raises CircuitOpenError if a call should not be attempted right now."""
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = self.HALF_OPEN
+            self._probes = 0
+            logger.info(f"[{self.name}] Circuit half-open: probing upstream")
+        if self.state == self.HALF_OPEN and self._probes >= BREAKER_HALF_OPEN_PROBES:
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(self.name, 0.0)
+
+    def record(self, ok: bool, latency: float):
+        now = time.monotonic()
+        bad = (not ok) or latency > self.slow_call
+
+        if self.state == self.HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            if bad:
+                self._open(now)
+            else:
+                self.state = self.CLOSED
+                self._calls.clear()
+                logger.info(f"[{self.name}] Circuit closed: upstream recovered")
+            return
+
+        self._calls.append((now, bad))
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+        if self.state == self.CLOSED and len(self._calls) >= self.min_calls:
+            failures = sum(1 for _, was_bad in self._calls if was_bad)
+            if failures / len(self._calls) >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self.stats["opened"] += 1
+        logger.error(f"[{self.name}] Circuit OPEN for {self.open_seconds}s: failing fast")
 
     async def __aenter__(self):
-        await self.semaphore.acquire()
+        self.check()
+        if self.state == self.HALF_OPEN:
+            self._probes += 1
+        self._starts.setdefault(id(asyncio.current_task()), []).append(time.monotonic())
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        self.semaphore.release()
+        key = id(asyncio.current_task())
+        stack = self._starts.get(key) or [time.monotonic()]
+        started = stack.pop()
+        if not stack:
+            self._starts.pop(key, None)
+        if isinstance(exc_val, asyncio.CancelledError):
+            if self.state == self.HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+            return
+        # Client errors say nothing about upstream health
+        ok = exc_val is None or not is_retriable(exc_val)
+        self.record(ok, time.monotonic() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "window_calls": len(self._calls), **self.stats}
+
+    @classmethod
+    def snapshot_all(cls) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in cls._instances.items()}
+
+# Set while a call runs whose `reserve` hook already ran (e.g. quota was taken
+# on the event loop), so the sync function does not block its thread for it again
+_reserved: contextvars.ContextVar = contextvars.ContextVar("upstream_reserved", default=False)
+
+def upstream_reserved() -> bool:
+    return _reserved.get()
+
+def upstream(name: str, max_concurrent: int = 5, reserve: Optional[Callable[..., Any]] = None):
+    """
+    Marks a function as a call to upstream `name`.
+    Async functions are wrapped in the upstream's CircuitBreaker and AdaptiveLimiter.
+    Sync functions are only tagged; run_sync_in_thread applies both around the thread hop.
+
+    `reserve(*args, **kwargs)` is awaited first, outside the limiter and breaker,
+    for waits that are not upstream latency (local rate quotas). The call then
+    runs with upstream_reserved() set.
+    """
+    def decorator(func):
+        func.__upstream__ = (name, max_concurrent)
+        func.__reserve__ = reserve
+        if not asyncio.iscoroutinefunction(func):
+            return func
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            breaker = CircuitBreaker(name)
+            # Fail fast before waiting for quota or queueing for a concurrency slot
+            breaker.check()
+            if reserve is not None:
+                await reserve(*args, **kwargs)
+            token = _reserved.set(reserve is not None)
+            try:
+                async with AdaptiveLimiter(name, max_concurrent), breaker:
+                    return await func(*args, **kwargs)
+            finally:
+                _reserved.reset(token)
+        wrapper.__upstream__ = (name, max_concurrent)
+        wrapper.__reserve__ = reserve
+        return wrapper
+    return decorator
 
 async def wait_with_timeout(coro, timeout: float = DEFAULT_TIMEOUT, label: str = "Operation"):
     """
@@ -54,6 +473,8 @@ def is_retriable(error: Exception) -> bool:
     Determines if an error is worth retrying (5xx, Network, Rate Limit) 
     vs Fail Fast (4xx, Auth, Syntax).
     """
+    if isinstance(error, (CircuitOpenError, DeadlineExceeded)):
+        return False
     err_str = str(error).lower()
     # Non-retriable indicators
     if any(x in err_str for x in ["401", "403", "400", "invalid_request", "syntax", "permission"]):
@@ -82,6 +503,9 @@ async def retry_async(
     last_error = None
     
     for attempt in range(max_retries):
+        remaining = remaining_budget()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"[{correlation_id}] Request deadline exceeded before attempt {attempt + 1}")
         try:
             return await func(*args, **kwargs)
         except Exception as e:
@@ -93,6 +517,10 @@ async def retry_async(
             if attempt < max_retries - 1:
                 # Apply jitter: delay * (0.5 to 1.5)
                 actual_delay = delay * (random.uniform(0.5, 1.5) if use_jitter else 1.0)
+                remaining = remaining_budget()
+                if remaining is not None and actual_delay >= remaining:
+                    logger.error(f"[{correlation_id}] [ERROR] Attempt {attempt + 1}/{max_retries} failed: {e}. No request budget left to retry.")
+                    raise last_error
                 logger.warning(f"[{correlation_id}] [WARNING] Attempt {attempt + 1}/{max_retries} failed: {e}. Retrying in {actual_delay:.2f}s...")
                 await asyncio.sleep(actual_delay)
                 delay *= backoff_multiplier
@@ -132,14 +560,36 @@ async def run_sync_in_thread(
         requests.post(url, timeout=(10, 60))
     """
     loop = asyncio.get_running_loop()
-    try:
-        return await asyncio.wait_for(
-            loop.run_in_executor(_executor, lambda: func(*args, **kwargs)),
-            timeout=timeout
-        )
-    except asyncio.TimeoutError:
-        logger.error(f"⏱️ Thread operation timed out after {timeout}s. The underlying sync function may still be blocked.")
-        raise
+
+    async def _run(reserved: bool = False):
+        # Only the remaining request budget; the copied context lets the sync
+        # function see the same deadline (e.g. genai_client read timeouts).
+        effective = budget_timeout(timeout)
+        ctx = contextvars.copy_context()
+        ctx.run(_reserved.set, reserved)
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(_executor, lambda: ctx.run(func, *args, **kwargs)),
+                timeout=effective
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"⏱️ Thread operation timed out after {effective:.1f}s. The underlying sync function may still be blocked.")
+            if effective < timeout:
+                raise DeadlineExceeded(f"Request deadline exceeded after {effective:.1f}s in {getattr(func, '__name__', 'thread call')}")
+            raise
+
+    # Functions tagged with @upstream(...) share that upstream's breaker and adaptive limit
+    tag = getattr(func, "__upstream__", None)
+    if tag is None:
+        return await _run()
+    breaker = CircuitBreaker(tag[0])
+    breaker.check()
+    # Quota waits happen here on the loop, not in a pool thread holding a limiter slot
+    reserve = getattr(func, "__reserve__", None)
+    if reserve is not None:
+        await reserve(*args, **kwargs)
+    async with AdaptiveLimiter(*tag), breaker:
+        return await _run(reserved=reserve is not None)
 
 async def retry_sync_in_thread(
     func: Callable[..., T],
@@ -166,6 +616,180 @@ async def retry_sync_in_thread(
         correlation_id=correlation_id
     )
 
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into one batched call.
+
+    Items submitted within `max_wait` seconds of each other (or until `max_batch`
+    items are queued) are handed to `batch_func` as one list. `batch_func` must
+    return a list of results in the same order; each caller gets its own result.
+    A batch serves several requests, so it runs as a background task without
+    any one caller's deadline; each caller still stops waiting at its own.
+    """
+    def __init__(
+        self,
+        batch_func: Callable[[list], Any],
+        max_wait: float = 0.005,
+        max_batch: int = 16,
+        name: str = "micro_batcher"
+    ):
+        self.batch_func = batch_func
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.name = name
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: set = set()
+        self.stats = {"batches": 0, "items": 0, "max_batch_seen": 0}
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await wait_within_budget(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = spawn_background(self._run_batch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run_batch(self, batch: List[tuple]):
+        items = [item for item, _ in batch]
+        self.stats["batches"] += 1
+        self.stats["items"] += len(items)
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(items))
+        try:
+            results = await self.batch_func(items)
+            if len(results) != len(items):
+                raise ValueError(f"{self.name}: batch returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            logger.error(f"[{self.name}] Batch of {len(items)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+class WriteBehindBuffer:
+    """
+    Debounced write-behind buffer.
+
+    `put(key, value)` returns immediately; the latest value per key is held for
+    `window` seconds and then written off the caller's path by `flush_func(values)`
+    in chunks of up to `max_batch`. Failed chunks are re-queued (unless a newer
+    value for the key arrived meanwhile) up to `max_retries` times. At most
+    `max_pending` keys are held; the oldest are dropped first.
+    """
+    def __init__(
+        self,
+        flush_func: Callable[[list], Any],
+        window: float = 2.0,
+        max_batch: int = 100,
+        max_pending: int = 1000,
+        max_retries: int = 3,
+        name: str = "write_behind"
+    ):
+        self.flush_func = flush_func
+        self.window = window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.name = name
+        self._pending: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: set = set()
+        self.stats = {"queued": 0, "coalesced": 0, "flushed": 0, "failed": 0, "dropped": 0}
+
+    def put(self, key: Any, value: Any):
+        if key in self._pending:
+            self.stats["coalesced"] += 1
+            del self._pending[key]
+        self._pending[key] = (value, 0)
+        self.stats["queued"] += 1
+        self._trim()
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        else:
+            self._schedule()
+
+    def _schedule(self):
+        if self._timer is None and self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    def _trim(self):
+        while len(self._pending) > self.max_pending:
+            key, _ = self._pending.popitem(last=False)
+            self.stats["dropped"] += 1
+            logger.warning(f"[{self.name}] Buffer full, dropped pending write for {key}")
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, OrderedDict()
+        task = spawn_background(self._write(list(batch.items())))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _write(self, items: List[tuple]):
+        for i in range(0, len(items), self.max_batch):
+            chunk = items[i:i + self.max_batch]
+            try:
+                await self.flush_func([value for _, (value, _) in chunk])
+                self.stats["flushed"] += len(chunk)
+            except Exception as e:
+                self.stats["failed"] += len(chunk)
+                logger.error(f"[{self.name}] Flush of {len(chunk)} writes failed: {e}")
+                for key, (value, attempts) in reversed(chunk):
+                    if key in self._pending:
+                        continue  # superseded by a newer value
+                    if attempts + 1 > self.max_retries:
+                        self.stats["dropped"] += 1
+                        continue
+                    self._pending[key] = (value, attempts + 1)
+                    self._pending.move_to_end(key, last=False)
+                self._trim()
+                self._schedule()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def flush(self):
+        """Writes everything pending now and waits for in-flight writes."""
+        self._flush()
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight), return_exceptions=True)
+
+    async def close(self):
+        """Drains the buffer on shutdown, giving failed writes their remaining retries."""
+        for _ in range(self.max_retries + 1):
+            await self.flush()
+            if not self._pending:
+                break
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            logger.error(f"[{self.name}] Shutdown with {len(self._pending)} unwritten entries")
+
 class BatchProcessor:
     """
     Utility for processing items in batches with rate limiting and heartbeats.
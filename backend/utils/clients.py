@@ -0,0 +1,49 @@
+"""
+Lazily constructed third-party clients.
+
+Importing supabase/tavily and building their clients is a large share of API
+startup and test collection time. Agents fetch them here on first use instead
+of in `__init__`; each distinct configuration is built once per process.
+
+`get_http_session()` is the shared aiohttp session for outbound downloads.
+aiohttp sessions are bound to an event loop, so there is one per loop
+(scripts that call asyncio.run() repeatedly get a fresh one each time).
+"""
+
+import asyncio
+import weakref
+from functools import lru_cache
+
+HTTP_POOL_LIMIT = 32
+
+_http_sessions: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+@lru_cache(maxsize=None)
+def get_supabase_client(url: str, key: str):
+    from supabase import create_client
+    return create_client(url, key)
+
+
+@lru_cache(maxsize=None)
+def get_tavily_client(api_key: str):
+    from tavily import AsyncTavilyClient
+    return AsyncTavilyClient(api_key=api_key)
+
+
+def get_http_session():
+    """Shared aiohttp.ClientSession for the running loop (created on first use)."""
+    import aiohttp
+    loop = asyncio.get_running_loop()
+    session = _http_sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=HTTP_POOL_LIMIT))
+        _http_sessions[loop] = session
+    return session
+
+
+async def close_http_session():
+    """Closes the running loop's shared session (app shutdown / end of a script)."""
+    session = _http_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
@@ -0,0 +1,28 @@
+"""
+One-time .env loading.
+
+`find_dotenv()` walks up the filesystem on every call; with every agent and
+utility loading the environment at import, that cost was paid a dozen times per
+process. Modules call `load_env()` instead, which only does the work once.
+
+CACHE_DIR is the process-local cache directory (SQLite stores, scout reports,
+classifier log) shared by the utility modules.
+"""
+
+import os
+
+from dotenv import load_dotenv, find_dotenv
+
+CACHE_DIR = os.getenv(
+    "TRIPZY_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+)
+
+_loaded = False
+
+
+def load_env():
+    global _loaded
+    if not _loaded:
+        load_dotenv(find_dotenv())
+        _loaded = True
@@ -1,17 +1,55 @@
-import aiohttp
+import os
 import io
-from PIL import Image
+import asyncio
+from typing import Dict, List, Optional, Sequence
+
+import aiohttp
+
+from backend.utils.clients import get_http_session
+
+# Unsplash/Pexels originals are usually 2-15 MB; anything far beyond that is not a photo we want
+IMAGE_MAX_DOWNLOAD_BYTES = int(os.getenv("IMAGE_MAX_DOWNLOAD_BYTES", str(25 * 1024 * 1024)))
+IMAGE_DOWNLOAD_TIMEOUT = float(os.getenv("IMAGE_DOWNLOAD_TIMEOUT", "30"))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Responsive variants emitted at ingest (srcset widths); AVIF only if Pillow was built with libavif
+IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,1280,1920").split(",") if w.strip()]
+IMAGE_VARIANT_AVIF = os.getenv("IMAGE_VARIANT_AVIF", "false").lower() in ("1", "true", "yes")
+AVIF_QUALITY = int(os.getenv("IMAGE_AVIF_QUALITY", "55"))
+
 
 class ImageProcessor:
     @staticmethod
-    async def download_image(url: str) -> bytes:
-        """Downloads an image from a URL."""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    return await resp.read()
-                else:
+    async def download_image(
+        url: str,
+        max_bytes: int = IMAGE_MAX_DOWNLOAD_BYTES,
+        timeout: float = IMAGE_DOWNLOAD_TIMEOUT,
+        session: Optional[aiohttp.ClientSession] = None
+    ) -> Optional[bytes]:
+        """
+        Downloads an image over the shared session, streaming it in chunks.
+        Returns None on HTTP errors, timeouts, or when the body exceeds max_bytes.
+        """
+        session = session or get_http_session()
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                if resp.status != 200:
                     return None
+                # Reject early when the server announces an oversized body
+                if resp.content_length is not None and resp.content_length > max_bytes:
+                    print(f"[WARNING] Image too large ({resp.content_length} bytes > {max_bytes}): {url[:60]}")
+                    return None
+
+                buffer = bytearray()
+                async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    buffer.extend(chunk)
+                    if len(buffer) > max_bytes:
+                        print(f"[WARNING] Image exceeded {max_bytes} bytes while downloading: {url[:60]}")
+                        return None
+                return bytes(buffer)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[WARNING] Image download failed: {e}")
+            return None
 
     @staticmethod
     def optimize_image(image_data: bytes, max_width: int = 1920, quality: int = 80) -> tuple[bytes, int, int]:
@@ -19,9 +57,18 @@ class ImageProcessor:
         Resizes and converts image to WebP.
         Returns: (webp_bytes, width, height)
         """
+        # PIL is imported on first use to keep API startup light
+        from PIL import Image
+
         try:
             img = Image.open(io.BytesIO(image_data))
-            
+
+            # JPEG: let the decoder downscale by 1/2, 1/4 or 1/8 (DCT scaling) so a
+            # 6000px original is never fully decoded; the exact resize happens below
+            width, height = img.size
+            if img.format == "JPEG" and width > max_width:
+                img.draft("RGB" if img.mode == "RGB" else None, (max_width, max(1, height * max_width // width)))
+
             # Convert to RGB if necessary (e.g. RGBA/P images)
             if img.mode in ('RGBA', 'P'):
                 img = img.convert('RGB')
@@ -31,7 +78,8 @@ class ImageProcessor:
             if width > max_width:
                 ratio = max_width / width
                 new_height = int(height * ratio)
-                img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+                # reducing_gap: integer box-reduce first, LANCZOS only for the last step
+                img = img.resize((max_width, new_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
                 width, height = max_width, new_height
 
             # Save as WebP
@@ -42,3 +90,52 @@ class ImageProcessor:
         except Exception as e:
             print(f"[ERROR] Image optimization failed: {e}")
             return None, 0, 0
+
+    @staticmethod
+    def variant_formats(avif: bool = IMAGE_VARIANT_AVIF) -> List[str]:
+        from PIL import features
+        return ["webp", "avif"] if avif and features.check("avif") else ["webp"]
+
+    @staticmethod
+    def generate_variants(
+        image_data: bytes,
+        widths: Sequence[int] = IMAGE_VARIANT_WIDTHS,
+        formats: Sequence[str] = ("webp",),
+        quality: int = 80
+    ) -> List[Dict]:
+        """
+        Decodes once and encodes every (format, width) variant, largest first.
+        Widths above the source width collapse into one source-width variant.
+        Returns [{"format", "width", "height", "data"}], or [] if decoding fails.
+        """
+        from PIL import Image
+
+        try:
+            img = Image.open(io.BytesIO(image_data))
+            width, height = img.size
+            # Decode-time downscale to the largest variant we need (see optimize_image)
+            target = min(max(widths), width)
+            if img.format == "JPEG" and width > target:
+                img.draft("RGB" if img.mode == "RGB" else None, (target, max(1, height * target // width)))
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+
+            variants = []
+            current = img
+            for size in sorted({min(w, width) for w in widths}, reverse=True):
+                new_height = max(1, round(height * size / width))
+                # Each step resizes the previous (larger) variant, not the original
+                if current.size != (size, new_height):
+                    current = current.resize((size, new_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                for fmt in formats:
+                    output_buffer = io.BytesIO()
+                    if fmt == "avif":
+                        current.save(output_buffer, format='AVIF', quality=AVIF_QUALITY)
+                    else:
+                        current.save(output_buffer, format='WEBP', quality=quality)
+                    variants.append({"format": fmt, "width": size, "height": new_height, "data": output_buffer.getvalue()})
+            return variants
+
+        except Exception as e:
+            print(f"[ERROR] Variant generation failed: {e}")
+            return []
@@ -0,0 +1,177 @@
+"""
+Perceptual Hashing & Near-Duplicate Index for Media Ingestion
+
+The same Unsplash photo reached VisualMemory.ingest_image again and again
+(different query, different size parameters in the URL) and was re-uploaded,
+re-described by Gemini and re-indexed every time. At ingest we now hash the
+image itself:
+
+- dhash: 64-bit difference hash (9x8 grayscale, left/right gradient)
+- phash: 64-bit DCT hash (32x32 grayscale, low 8x8 frequencies vs median)
+
+Both survive re-encoding and resizing. Hashes are stored as 16-char hex on
+media_library / blog.media (migration 019). MediaHashIndex keeps them in a
+BK-tree (metric tree over Hamming distance) so a lookup inspects a small
+part of the library rather than every row. A candidate is a duplicate when
+its phash is within PHASH_MAX_DISTANCE and its dhash within
+DHASH_MAX_DISTANCE bits.
+
+No numpy: the DCT only needs the 8x8 low-frequency block, a few thousand
+multiplications in pure Python.
+"""
+
+import io
+import os
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+DHASH_MAX_DISTANCE = int(os.getenv("DHASH_MAX_DISTANCE", "10"))
+
+_DCT_SIZE = 32
+_HASH_SIZE = 8
+# cos((2x + 1) * u * pi / 2N) for the 8 low frequencies u over 32 samples x
+_DCT_COS = [[math.cos((2 * x + 1) * u * math.pi / (2 * _DCT_SIZE)) for x in range(_DCT_SIZE)] for u in range(_HASH_SIZE)]
+
+
+def _to_hex(bits: List[bool]) -> str:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return f"{value:016x}"
+
+
+def dhash(img) -> str:
+    from PIL import Image
+    pixels = list(img.convert("L").resize((_HASH_SIZE + 1, _HASH_SIZE), Image.Resampling.LANCZOS).tobytes())
+    row = _HASH_SIZE + 1
+    return _to_hex([
+        pixels[y * row + x] > pixels[y * row + x + 1]
+        for y in range(_HASH_SIZE) for x in range(_HASH_SIZE)
+    ])
+
+
+def phash(img) -> str:
+    from PIL import Image
+    pixels = list(img.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.Resampling.LANCZOS).tobytes())
+    rows = [pixels[y * _DCT_SIZE:(y + 1) * _DCT_SIZE] for y in range(_DCT_SIZE)]
+    # Separable 2D DCT-II restricted to the 8x8 low-frequency block
+    row_dct = [[sum(c * p for c, p in zip(_DCT_COS[u], r)) for u in range(_HASH_SIZE)] for r in rows]
+    coeffs = [
+        sum(_DCT_COS[v][y] * row_dct[y][u] for y in range(_DCT_SIZE))
+        for v in range(_HASH_SIZE) for u in range(_HASH_SIZE)
+    ]
+    # The DC term only encodes overall brightness; leave it out of the median
+    median = sorted(coeffs[1:])[len(coeffs[1:]) // 2]
+    return _to_hex([c > median for c in coeffs])
+
+
+def image_hashes(image_data: bytes) -> Optional[Dict[str, str]]:
+    """{"phash", "dhash"} for encoded image bytes, or None if it cannot be decoded."""
+    from PIL import Image
+    try:
+        img = Image.open(io.BytesIO(image_data))
+        # Hashes need 32px; let the JPEG decoder do most of the downscaling
+        if img.format == "JPEG":
+            img.draft("L", (_DCT_SIZE * 2, _DCT_SIZE * 2))
+        return {"phash": phash(img), "dhash": dhash(img)}
+    except Exception as e:
+        print(f"[WARNING] Perceptual hash failed: {e}")
+        return None
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over hex hashes with Hamming distance."""
+    def __init__(self):
+        self._root: Optional[list] = None  # [hash, values, {distance: child}]
+        self.size = 0
+
+    def add(self, key: str, value: Any):
+        self.size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key: str, max_distance: int) -> List[Tuple[int, str, Any]]:
+        """All (distance, hash, value) within max_distance, closest first."""
+        results = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= max_distance:
+                results.extend((distance, node[0], value) for value in node[1])
+            # Triangle inequality: only children at distance d +- max_distance can match
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return sorted(results, key=lambda r: r[0])
+
+
+class MediaHashIndex:
+    """phash BK-tree of ingested media, confirmed with dhash; values are media rows."""
+    def __init__(self, phash_distance: int = PHASH_MAX_DISTANCE, dhash_distance: int = DHASH_MAX_DISTANCE):
+        self.phash_distance = phash_distance
+        self.dhash_distance = dhash_distance
+        self.tree = BKTree()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return self.tree.size
+
+    def add(self, hashes: Dict[str, str], row: Dict[str, Any]):
+        self.tree.add(hashes["phash"], {**row, "dhash": hashes.get("dhash")})
+
+    def load(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            if row.get("phash"):
+                self.add({"phash": row["phash"], "dhash": row.get("dhash")}, row)
+        self.loaded = True
+
+    def find(self, hashes: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Closest stored row that is a near-duplicate of `hashes`, if any."""
+        for _, _, row in self.tree.search(hashes["phash"], self.phash_distance):
+            if self._dhash_close(row.get("dhash"), hashes.get("dhash")):
+                return row
+        return None
+
+    def matches(self, a: Dict[str, str], b: Dict[str, str]) -> bool:
+        """Whether two hash pairs are near-duplicates under this index's thresholds."""
+        return hamming(a["phash"], b["phash"]) <= self.phash_distance and self._dhash_close(a.get("dhash"), b.get("dhash"))
+
+    def _dhash_close(self, a: Optional[str], b: Optional[str]) -> bool:
+        return not a or not b or hamming(a, b) <= self.dhash_distance
+
+
+def group_near_duplicates(rows: List[Dict[str, Any]], key: Callable[[Dict], Optional[Dict[str, str]]] = None) -> List[List[Dict]]:
+    """Clusters rows whose hashes match (single pass; the first row seen anchors a group)."""
+    key = key or (lambda row: {"phash": row["phash"], "dhash": row.get("dhash")} if row.get("phash") else None)
+    index = MediaHashIndex()
+    groups: Dict[int, List[Dict]] = {}
+    for row in rows:
+        hashes = key(row)
+        if not hashes:
+            continue
+        match = index.find(hashes)
+        if match is None:
+            group_id = len(groups)
+            groups[group_id] = [row]
+            index.add(hashes, {"group": group_id})
+        else:
+            groups[match["group"]].append(row)
+    return [group for group in groups.values() if len(group) > 1]
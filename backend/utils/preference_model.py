@@ -0,0 +1,124 @@
+"""
+Incremental User Preference Model
+
+A decayed, O(1)-per-signal summary of what a user engages with:
+- categorical weights over signal vibes, target categories and signal types
+  (exponential decay per new signal, applied lazily via a growing weight)
+- an embedding centroid (exponentially decayed mean of engaged-content vectors)
+
+ProfilerAgent compares the current state against a snapshot taken at the last
+LLM archetype synthesis and only re-synthesizes when the drift is large.
+"""
+
+import os
+import math
+from typing import Any, Dict, List, Optional, Union
+
+PROFILE_DECAY = float(os.getenv("PROFILE_SIGNAL_DECAY", "0.9"))
+CENTROID_RATE = float(os.getenv("PROFILE_CENTROID_RATE", "0.2"))
+_RENORMALIZE_AT = 1e12
+
+
+def cosine_similarity(a: Union[Dict[Any, float], List[float]], b: Union[Dict[Any, float], List[float]]) -> float:
+    """Cosine similarity for dense lists or sparse dicts."""
+    if isinstance(a, dict):
+        keys = set(a) | set(b)
+        dot = sum(a.get(k, 0.0) * b.get(k, 0.0) for k in keys)
+        norm_a = math.sqrt(sum(v * v for v in a.values()))
+        norm_b = math.sqrt(sum(v * v for v in b.values()))
+    else:
+        dot = sum(x * y for x, y in zip(a, b))
+        norm_a = math.sqrt(sum(x * x for x in a))
+        norm_b = math.sqrt(sum(y * y for y in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+def blend_vectors(query: List[float], user: Optional[List[float]], user_weight: float) -> List[float]:
+    """
+    Unit-normalized blend (1 - w) * q + w * u. Cosine similarity against the
+    blend is a weighted mix of query relevance and user affinity.
+    """
+    if not user or user_weight <= 0 or len(user) != len(query):
+        return query
+
+    def _unit(v):
+        norm = math.sqrt(sum(x * x for x in v)) or 1.0
+        return [x / norm for x in v]
+
+    q, u = _unit(query), _unit(user)
+    return _unit([(1.0 - user_weight) * a + user_weight * b for a, b in zip(q, u)])
+
+
+class PreferenceState:
+    """Decayed categorical weights + embedding centroid for one user."""
+    def __init__(self, decay: float = PROFILE_DECAY, centroid_rate: float = CENTROID_RATE):
+        self.decay = decay
+        self.centroid_rate = centroid_rate
+        self.weights: Dict[str, float] = {}
+        self.centroid: Optional[List[float]] = None
+        self.signal_count = 0
+        self.embedding_count = 0
+        self.cursor: Optional[str] = None
+        # Each new signal is worth 1/decay times the previous one, which is the
+        # same as decaying every existing weight but costs O(1) per signal.
+        self._unit = 1.0
+
+    def observe_signal(self, row: Dict[str, Any]):
+        metadata = row.get("metadata") or {}
+        if not isinstance(metadata, dict):
+            metadata = {}
+        keys = [
+            f"type:{row.get('signal_type') or row.get('type') or 'unknown'}",
+            f"vibe:{metadata.get('vibe') or 'unknown'}",
+            f"category:{row.get('target_type') or row.get('target') or metadata.get('category') or 'unknown'}",
+        ]
+        self._unit /= self.decay
+        for key in keys:
+            self.weights[key] = self.weights.get(key, 0.0) + self._unit
+        self.signal_count += 1
+        if row.get("created_at") and (self.cursor is None or row["created_at"] > self.cursor):
+            self.cursor = row["created_at"]
+        if self._unit > _RENORMALIZE_AT:
+            self.weights = {k: v / self._unit for k, v in self.weights.items()}
+            self._unit = 1.0
+
+    def observe_embedding(self, vector: List[float], rate: Optional[float] = None):
+        """Exponentially decayed mean: c <- (1 - rate) * c + rate * v."""
+        if not vector:
+            return
+        rate = self.centroid_rate if rate is None else rate
+        if self.centroid is None or len(self.centroid) != len(vector):
+            self.centroid = list(vector)
+        else:
+            self.centroid = [(1.0 - rate) * c + rate * v for c, v in zip(self.centroid, vector)]
+        self.embedding_count += 1
+
+    def distribution(self) -> Dict[str, float]:
+        total = sum(self.weights.values())
+        if not total:
+            return {}
+        return {k: v / total for k, v in self.weights.items()}
+
+    def top(self, prefix: str, n: int = 3) -> List[str]:
+        items = [(k[len(prefix) + 1:], v) for k, v in self.weights.items() if k.startswith(prefix + ":")]
+        return [k for k, _ in sorted(items, key=lambda kv: -kv[1])[:n]]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "distribution": self.distribution(),
+            "centroid": list(self.centroid) if self.centroid else None,
+        }
+
+    def drift_from(self, snapshot: Optional[Dict[str, Any]]) -> float:
+        """0.0 (unchanged) .. 1.0 (unrelated) relative to a previous snapshot."""
+        if not snapshot:
+            return 1.0
+        drift = 0.0
+        current = self.distribution()
+        if current or snapshot.get("distribution"):
+            drift = 1.0 - cosine_similarity(current, snapshot.get("distribution") or {})
+        if self.centroid and snapshot.get("centroid"):
+            drift = max(drift, 1.0 - cosine_similarity(self.centroid, snapshot["centroid"]))
+        return max(0.0, min(1.0, drift))
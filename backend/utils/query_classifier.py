@@ -0,0 +1,271 @@
+"""
+Local Cost Guard Classifier
+
+Answers the ResearchAgent "does this query need live web data?" decision
+locally for the common cases, so the Gemini round trip is only spent on
+ambiguous queries.
+
+Two stages:
+1. Keyword/regex rules for unambiguous phrasing (prices, opening hours,
+   library choices vs. history, culture, vibes).
+2. A tiny logistic model over hashed query tokens, trained from the
+   decisions the LLM made on earlier fallbacks (logged to disk).
+
+Only the latest COST_GUARD_MAX_SAMPLES decisions are kept (the log is
+compacted once it holds twice that). The log is read on first use rather
+than at import; log writes and retraining run in a worker thread, never on
+the event loop.
+
+Usage:
+    from backend.utils.query_classifier import query_classifier
+    decision, confidence = query_classifier.classify("Antalya beaches")
+"""
+
+import os
+import re
+import json
+import math
+import zlib
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from backend.utils.async_utils import spawn_background
+from backend.utils.env import CACHE_DIR
+
+LIVE_SEARCH_REQUIRED = "LIVE_SEARCH_REQUIRED"
+INTERNAL_KNOWLEDGE_SUFFICIENT = "INTERNAL_KNOWLEDGE_SUFFICIENT"
+
+DECISION_LOG_PATH = os.getenv("COST_GUARD_LOG_PATH", os.path.join(CACHE_DIR, "cost_guard_decisions.jsonl"))
+
+CONFIDENCE_THRESHOLD = float(os.getenv("COST_GUARD_CONFIDENCE", "0.85"))
+MIN_TRAINING_SAMPLES = 50
+MAX_TRAINING_SAMPLES = int(os.getenv("COST_GUARD_MAX_SAMPLES", "2000"))
+RETRAIN_EVERY = 25
+HASH_DIMENSIONS = 2 ** 12
+
+# Patterns that mean the answer can go stale: prices, schedules, tech choices.
+LIVE_PATTERNS = [
+    r"\b(price|prices|cost|costs|fee|fees|ticket|tickets|booking|deal|deals)\b",
+    r"\b(open|opens|opening|closed|closing|hours|schedule|timetable)\b",
+    r"\b(today|tonight|tomorrow|this (week|weekend|month)|right now|currently|latest|news|update)\b",
+    r"\b(202[5-9])\b",
+    r"\b(event|events|festival|concert|exhibition)s?\b.*\b(202[5-9]|upcoming|next)\b",
+    r"\b(library|framework|sdk|api|python|javascript|typescript|react|fastapi|database|architecture|implementation|pattern|best practices?)\b",
+    r"\b(patent|patents)\b",
+]
+
+# Patterns that are evergreen: history, culture, vibes, generic destinations.
+INTERNAL_PATTERNS = [
+    r"\b(history|historic|historical|ancient|culture|cultural|tradition|traditional|heritage|legend|myth)\b",
+    r"\b(vibe|vibes|quiet|peaceful|relax|relaxing|romantic|luxury|adventure|hidden gems?|escape|retreat|slow travel)\b",
+    r"\b(beach|beaches|mountain|mountains|lake|coast|island|islands|village|countryside|old town)\b",
+    r"\b(food|cuisine|dish|dishes|wine|coffee|tea)\b",
+    r"\b(what is|why is|tell me about|describe|inspire|inspiration|ideas)\b",
+]
+
+_LIVE_RE = [re.compile(p, re.IGNORECASE) for p in LIVE_PATTERNS]
+_INTERNAL_RE = [re.compile(p, re.IGNORECASE) for p in INTERNAL_PATTERNS]
+_TOKEN_RE = re.compile(r"[a-z0-9çğıöşü]+")
+
+
+def _features(query: str) -> Dict[int, float]:
+    """Hashed unigram + bigram bag of words."""
+    tokens = _TOKEN_RE.findall(query.lower())
+    grams = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+    features: Dict[int, float] = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % HASH_DIMENSIONS
+        features[index] = features.get(index, 0.0) + 1.0
+    return features
+
+
+class QueryNeedsClassifier:
+    """
+    Rule + logistic-regression fast path for the Cost Guard decision.
+    """
+    def __init__(
+        self,
+        log_path: str = DECISION_LOG_PATH,
+        confidence_threshold: float = CONFIDENCE_THRESHOLD,
+        max_samples: int = MAX_TRAINING_SAMPLES
+    ):
+        self.log_path = log_path
+        self.confidence_threshold = confidence_threshold
+        self.max_samples = max(MIN_TRAINING_SAMPLES, max_samples)
+        self._weights: Dict[int, float] = {}
+        self._bias = 0.0
+        self._samples: Deque[Tuple[str, int]] = deque(maxlen=self.max_samples)
+        self._since_training = 0
+        self._unwritten: List[str] = []
+        self._log_lines = 0
+        self._maintaining = False
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self.stats = {"rule_hits": 0, "model_hits": 0, "fallbacks": 0}
+        # The decision log is read on first use, not at import
+        self._loaded = False
+
+    # --- Public API ---
+
+    def classify(self, query: str) -> Tuple[Optional[str], float]:
+        """
+        Returns (decision, confidence). decision is None when neither stage is
+        confident and the caller should fall back to the LLM.
+        """
+        query = query or ""
+
+        live_hits = sum(1 for r in _LIVE_RE if r.search(query))
+        internal_hits = sum(1 for r in _INTERNAL_RE if r.search(query))
+        if live_hits and not internal_hits:
+            self.stats["rule_hits"] += 1
+            return LIVE_SEARCH_REQUIRED, min(0.99, 0.85 + 0.05 * live_hits)
+        if internal_hits and not live_hits:
+            self.stats["rule_hits"] += 1
+            return INTERNAL_KNOWLEDGE_SUFFICIENT, min(0.99, 0.85 + 0.05 * internal_hits)
+
+        self._ensure_loaded()
+        if len(self._samples) >= MIN_TRAINING_SAMPLES:
+            p_live = self._predict(_features(query))
+            if p_live >= self.confidence_threshold:
+                self.stats["model_hits"] += 1
+                return LIVE_SEARCH_REQUIRED, p_live
+            if p_live <= 1.0 - self.confidence_threshold:
+                self.stats["model_hits"] += 1
+                return INTERNAL_KNOWLEDGE_SUFFICIENT, 1.0 - p_live
+
+        self.stats["fallbacks"] += 1
+        return None, 0.0
+
+    def record(self, query: str, decision: str):
+        """
+        Logs an LLM decision as a training sample. Persisting and periodic
+        retraining run in a worker thread when called from the event loop.
+        """
+        self._ensure_loaded()
+        label = 1 if decision == LIVE_SEARCH_REQUIRED else 0
+        with self._lock:
+            self._samples.append((query, label))
+            self._since_training += 1
+            self._unwritten.append(json.dumps({"query": query, "decision": decision}))
+        self._schedule_maintenance()
+
+    def _schedule_maintenance(self):
+        with self._lock:
+            if self._maintaining:
+                return  # the running pass picks new work up
+            self._maintaining = True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._maintain()
+            return
+        self._task = spawn_background(asyncio.to_thread(self._maintain))
+
+    def hit_rate(self) -> float:
+        local = self.stats["rule_hits"] + self.stats["model_hits"]
+        total = local + self.stats["fallbacks"]
+        return local / total if total else 0.0
+
+    # --- Model ---
+
+    def _predict(self, features: Dict[int, float]) -> float:
+        z = self._bias + sum(self._weights.get(i, 0.0) * v for i, v in features.items())
+        z = max(-30.0, min(30.0, z))
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def _maintain(self):
+        """Writes pending log lines, compacts the log and retrains until nothing is due."""
+        while True:
+            with self._lock:
+                lines, self._unwritten = self._unwritten, []
+                compact = self._log_lines + len(lines) > 2 * self.max_samples
+                retrain = self._since_training >= RETRAIN_EVERY and len(self._samples) >= MIN_TRAINING_SAMPLES
+                samples = list(self._samples) if (compact or retrain) else None
+                if retrain:
+                    self._since_training = 0
+                if not lines and not retrain:
+                    self._maintaining = False
+                    return
+            if compact:
+                self._rewrite_log(samples)
+            elif lines:
+                self._append_log(lines)
+            if retrain:
+                self._train(samples)
+
+    def _append_log(self, lines: List[str]):
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write("".join(line + "\n" for line in lines))
+            self._log_lines += len(lines)
+        except OSError as e:
+            print(f"[WARNING] [CostGuard] Could not persist decision: {e}")
+
+    def _rewrite_log(self, samples: List[Tuple[str, int]]):
+        """Replaces the log with the retained window (atomic rename)."""
+        tmp_path = f"{self.log_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for query, label in samples:
+                    decision = LIVE_SEARCH_REQUIRED if label else INTERNAL_KNOWLEDGE_SUFFICIENT
+                    f.write(json.dumps({"query": query, "decision": decision}) + "\n")
+            os.replace(tmp_path, self.log_path)
+            self._log_lines = len(samples)
+        except OSError as e:
+            print(f"[WARNING] [CostGuard] Could not compact decision log: {e}")
+
+    def _train(self, samples: List[Tuple[str, int]], epochs: int = 10, learning_rate: float = 0.1, l2: float = 1e-4):
+        """Plain SGD logistic regression; a few thousand samples train in well under a second."""
+        weights: Dict[int, float] = {}
+        bias = 0.0
+        encoded = [(_features(q), y) for q, y in samples]
+        for _ in range(epochs):
+            for features, y in encoded:
+                z = bias + sum(weights.get(i, 0.0) * v for i, v in features.items())
+                z = max(-30.0, min(30.0, z))
+                error = (1.0 / (1.0 + math.exp(-z))) - y
+                bias -= learning_rate * error
+                for i, v in features.items():
+                    w = weights.get(i, 0.0)
+                    weights[i] = w - learning_rate * (error * v + l2 * w)
+        self._weights, self._bias = weights, bias
+
+    def _ensure_loaded(self):
+        """
+        Reads the (compacted, so bounded) decision log on first use. Training
+        on it is left to the maintenance pass, in a thread when a loop runs.
+        """
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._load_log()
+            self._loaded = True
+            if len(self._samples) >= MIN_TRAINING_SAMPLES:
+                self._since_training = RETRAIN_EVERY
+        if self._since_training >= RETRAIN_EVERY:
+            self._schedule_maintenance()
+
+    def _load_log(self):
+        if not os.path.exists(self.log_path):
+            return
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    label = 1 if entry.get("decision") == LIVE_SEARCH_REQUIRED else 0
+                    self._samples.append((entry.get("query", ""), label))
+                    self._log_lines += 1
+        except OSError as e:
+            print(f"[WARNING] [CostGuard] Could not read decision log: {e}")
+
+# Singleton instance
+query_classifier = QueryNeedsClassifier()
@@ -0,0 +1,244 @@
+"""
+Token-Bucket Quotas for Gemini (RPM / TPM per model)
+
+AdaptiveLimiter bounds how many calls are in flight; these buckets bound how
+many requests and tokens are spent per minute, so bulk scripts and the API
+server stay under the project's per-model quotas instead of discovering them
+through 429s and retries.
+
+Each model has a request bucket and a token bucket that refill continuously
+at rpm/60 and tpm/60 per second. Token cost is estimated from prompt length.
+
+Backends (RATE_LIMIT_BACKEND):
+- "memory" (default): shared by every coroutine and thread in the process
+- "sqlite" or "sqlite:/path/to/file": shared by every process on the host
+  (API workers and admin scripts) through one SQLite file
+Defaults to SHARED_STATE_URI when that is a SQLite file, so one setting moves
+all cross-worker state. The async path takes SQLite buckets in a worker
+thread, and a locked file (SHARED_STATE_SQLITE_BUSY_MS) is retried after a
+short sleep rather than waited on.
+"""
+
+import os
+import json
+import math
+import time
+import random
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.utils.env import CACHE_DIR
+from backend.utils.async_utils import remaining_budget, upstream_reserved
+from backend.utils.shared_state import SHARED_STATE_URI, SQLITE_BUSY_TIMEOUT_MS, sqlite_path
+
+CHARS_PER_TOKEN = 4
+OUTPUT_TOKEN_ESTIMATE = int(os.getenv("QUOTA_OUTPUT_TOKEN_ESTIMATE", "512"))
+QUOTA_MAX_WAIT = float(os.getenv("QUOTA_MAX_WAIT_SECONDS", "60"))
+QUOTA_LOCKED_RETRY = 0.05  # seconds before retrying a bucket another process holds
+RATE_LIMIT_BACKEND = os.getenv(
+    "RATE_LIMIT_BACKEND", "sqlite" if SHARED_STATE_URI.startswith("sqlite") else "memory"
+)
+DEFAULT_SQLITE_PATH = os.path.join(CACHE_DIR, "rate_quota.sqlite")
+
+# Per-model quotas; `None` disables that bucket. Override or extend with
+# GEMINI_QUOTAS='{"gemini-2.0-flash": {"rpm": 15, "tpm": 1000000}}'.
+DEFAULT_QUOTAS: Dict[str, Dict[str, Optional[int]]] = {
+    "gemini-2.0-flash": {"rpm": 2000, "tpm": 4000000},
+    "gemini-2.0-flash-exp": {"rpm": 10, "tpm": 4000000},
+    "text-embedding-004": {"rpm": 1500, "tpm": None},
+    "default": {"rpm": 1000, "tpm": 1000000},
+}
+
+# A bucket spec is (key, amount, capacity, refill_per_second)
+BucketSpec = Tuple[str, float, float, float]
+
+
+def estimate_tokens(content: Any) -> int:
+    """Rough token count (~4 characters per token) for a prompt or list of parts."""
+    if content is None:
+        return 0
+    if isinstance(content, (list, tuple)):
+        return sum(estimate_tokens(part) for part in content)
+    if isinstance(content, dict):
+        return estimate_tokens(content.get("text"))
+    return math.ceil(len(str(content)) / CHARS_PER_TOKEN)
+
+
+def _load_quotas() -> Dict[str, Dict[str, Optional[int]]]:
+    quotas = {k: dict(v) for k, v in DEFAULT_QUOTAS.items()}
+    raw = os.getenv("GEMINI_QUOTAS")
+    if raw:
+        try:
+            for model, limits in json.loads(raw).items():
+                quotas.setdefault(model, {}).update(limits)
+        except (ValueError, AttributeError) as e:
+            print(f"[WARNING] Ignoring invalid GEMINI_QUOTAS: {e}")
+    return quotas
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def _take(state: Dict[str, Tuple[float, float]], specs: List[BucketSpec], now: float) -> Tuple[float, Dict[str, Tuple[float, float]]]:
+    """
+    All-or-nothing take across buckets. Returns (wait_seconds, new_state);
+    wait is 0.0 when the amounts were deducted.
+    """
+    levels = {}
+    wait = 0.0
+    for key, amount, capacity, rate in specs:
+        tokens, updated = state.get(key, (capacity, now))
+        level = _refill(tokens, updated, now, capacity, rate)
+        levels[key] = level
+        if level < amount:
+            wait = max(wait, (amount - level) / rate)
+    if wait > 0:
+        return wait, {key: (level, now) for key, level in levels.items()}
+    return 0.0, {key: (levels[key] - amount, now) for key, amount, _, _ in specs}
+
+
+class MemoryBucketBackend:
+    """Buckets shared by all coroutines and threads of this process."""
+    blocking = False
+
+    def __init__(self):
+        self._state: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, specs: List[BucketSpec]) -> float:
+        with self._lock:
+            wait, updates = _take(self._state, specs, time.time())
+            self._state.update(updates)
+            return wait
+
+
+class SQLiteBucketBackend:
+    """Buckets shared across processes through one SQLite file (BEGIN IMMEDIATE)."""
+    blocking = True
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS):
+        self.path = path
+        self.busy_timeout = max(1, busy_timeout_ms) / 1000.0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, specs: List[BucketSpec]) -> float:
+        conn = self._conn()
+        keys = [spec[0] for spec in specs]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT key, tokens, updated FROM buckets WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()
+            wait, updates = _take({key: (tokens, updated) for key, tokens, updated in rows}, specs, time.time())
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                [(key, tokens, updated) for key, (tokens, updated) in updates.items()]
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _backend_from_uri(uri: str):
+    if uri.startswith("sqlite"):
+        _, _, path = uri.partition(":")
+        return SQLiteBucketBackend(sqlite_path(uri) if path else DEFAULT_SQLITE_PATH)
+    return MemoryBucketBackend()
+
+
+class QuotaWaitExceeded(Exception):
+    """Raised when a call would have to wait longer than max_wait for quota."""
+
+
+class RateQuota:
+    """RPM/TPM token buckets per model over a pluggable backend."""
+    def __init__(self, quotas: Optional[Dict[str, Dict[str, Optional[int]]]] = None, backend=None, max_wait: float = QUOTA_MAX_WAIT):
+        self.quotas = quotas if quotas is not None else _load_quotas()
+        self.backend = backend or _backend_from_uri(RATE_LIMIT_BACKEND)
+        self.max_wait = max_wait
+        self.stats = {"granted": 0, "delayed": 0, "wait_seconds": 0.0, "rejected": 0}
+
+    def _specs(self, model: str, tokens: int, requests: int) -> List[BucketSpec]:
+        model = model.replace("models/", "")
+        limits = self.quotas.get(model) or self.quotas.get("default") or {}
+        specs = []
+        for kind, amount in (("rpm", requests), ("tpm", tokens)):
+            per_minute = limits.get(kind)
+            if per_minute and amount > 0:
+                # A single call larger than a minute's quota can still run once the bucket is full
+                specs.append((f"{model}:{kind}", min(float(amount), per_minute), float(per_minute), per_minute / 60.0))
+        return specs
+
+    def try_acquire(self, model: str, tokens: int = 0, requests: int = 1) -> float:
+        """Takes quota if available now; otherwise returns the seconds to wait."""
+        specs = self._specs(model, tokens, requests)
+        return self.backend.take(specs) if specs else 0.0
+
+    def _next_wait(self, model: str, tokens: int, requests: int, waited: float) -> float:
+        try:
+            wait = self.try_acquire(model, tokens, requests)
+        except sqlite3.OperationalError:
+            # Another process holds the bucket file: back off instead of blocking on its lock
+            wait = QUOTA_LOCKED_RETRY
+        if wait <= 0:
+            self.stats["granted"] += 1
+            if waited:
+                self.stats["delayed"] += 1
+                self.stats["wait_seconds"] += waited
+            return 0.0
+        remaining = remaining_budget()
+        max_wait = self.max_wait if remaining is None else min(self.max_wait, waited + remaining)
+        if waited + wait > max_wait:
+            self.stats["rejected"] += 1
+            raise QuotaWaitExceeded(f"Local rate quota for {model}: would wait {waited + wait:.1f}s (max {max_wait:.1f}s)")
+        # Small jitter so waiters sharing a bucket do not retry in lockstep
+        return wait + random.uniform(0, 0.05)
+
+    async def acquire(self, model: str, tokens: int = 0, requests: int = 1):
+        waited = 0.0
+        while True:
+            if getattr(self.backend, "blocking", False):
+                # File locks and I/O stay off the event loop
+                wait = await asyncio.to_thread(self._next_wait, model, tokens, requests, waited)
+            else:
+                wait = self._next_wait(model, tokens, requests, waited)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def acquire_sync(self, model: str, tokens: int = 0, requests: int = 1):
+        """
+        Blocking variant for sync REST calls made directly (scripts). A no-op when
+        the call's @upstream reserve hook already awaited acquire() on the loop.
+        """
+        if upstream_reserved():
+            return
+        waited = 0.0
+        while True:
+            wait = self._next_wait(model, tokens, requests, waited)
+            if not wait:
+                return
+            time.sleep(wait)
+            waited += wait
+
+# Singleton instance
+rate_quota = RateQuota()
@@ -0,0 +1,234 @@
+"""
+Scout Report Cache
+
+Topic-normalized cache for ResearchAgent.scout_best_practices reports.
+Popular topics ("Antalya beaches", "Tuscany food tour") otherwise re-run an
+advanced Tavily search plus a Gemini synthesis on every request.
+
+- Fresh entries (younger than SCOUT_CACHE_TTL_HOURS) are served directly.
+- Stale entries (up to SCOUT_CACHE_STALE_HOURS) are served immediately while a
+  background task rebuilds them (stale-while-revalidate).
+- Near-duplicate topics ("beaches in Antalya" vs "Antalya beach") share an
+  entry via token-set similarity on the normalized topic.
+- Degraded reports (builder returned a DegradedReport, e.g. live search
+  failed) are kept for SCOUT_CACHE_DEGRADED_TTL_MINUTES only, are not served
+  stale, and never replace a good entry.
+- Entries are persisted to disk so restarts start warm. With a shared state
+  backend (SHARED_STATE_URI) they live there instead, so every API worker
+  reads and refreshes the same reports. Writes (file or shared store) run
+  in a worker thread, off the event loop.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import functools
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from backend.utils.async_utils import spawn_background, wait_within_budget
+from backend.utils.env import CACHE_DIR
+from backend.utils.shared_state import shared_state, is_shared
+
+SCOUT_CACHE_PATH = os.getenv("SCOUT_CACHE_PATH", os.path.join(CACHE_DIR, "scout_reports.json"))
+SCOUT_CACHE_TTL = float(os.getenv("SCOUT_CACHE_TTL_HOURS", "12")) * 3600
+SCOUT_CACHE_STALE = float(os.getenv("SCOUT_CACHE_STALE_HOURS", "72")) * 3600
+SCOUT_CACHE_DEGRADED_TTL = float(os.getenv("SCOUT_CACHE_DEGRADED_TTL_MINUTES", "10")) * 60
+SCOUT_CACHE_SIMILARITY = float(os.getenv("SCOUT_CACHE_SIMILARITY", "0.8"))
+SCOUT_CACHE_MAX_ENTRIES = 500
+STORE_PREFIX = "scout:"
+
+_STOPWORDS = {
+    "a", "an", "the", "in", "on", "at", "of", "for", "to", "and", "or", "with",
+    "best", "i", "want", "looking", "some", "me", "my", "trip", "travel", "guide",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9çğıöşü]+")
+
+
+class DegradedReport(str):
+    """A report built without its live sources; cached only briefly."""
+
+
+def normalize_topic(topic: str) -> str:
+    """Lowercase, drop stopwords, crude singularization, sorted unique tokens."""
+    tokens = set()
+    for token in _TOKEN_RE.findall((topic or "").lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("es") and token[:-2].endswith(("ch", "sh", "x", "s")):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.add(token)
+    return " ".join(sorted(tokens))
+
+
+def _similarity(a: str, b: str) -> float:
+    set_a, set_b = set(a.split()), set(b.split())
+    if not set_a or not set_b:
+        return 0.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+
+class ScoutReportCache:
+    """
+    TTL + stale-while-revalidate cache with disk persistence.
+    """
+    def __init__(
+        self,
+        path: str = SCOUT_CACHE_PATH,
+        ttl: float = SCOUT_CACHE_TTL,
+        stale_ttl: float = SCOUT_CACHE_STALE,
+        degraded_ttl: float = SCOUT_CACHE_DEGRADED_TTL,
+        similarity: float = SCOUT_CACHE_SIMILARITY,
+        max_entries: int = SCOUT_CACHE_MAX_ENTRIES,
+        store=None
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.degraded_ttl = min(degraded_ttl, ttl)
+        self.similarity = similarity
+        self.max_entries = max_entries
+        self.store = store
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._version = 0
+        self._saved_version = 0
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "degraded": 0}
+        self._load()
+
+    def lookup(self, topic: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Returns (key, entry) for the exact or nearest near-duplicate topic."""
+        key = normalize_topic(topic)
+        if key in self._entries:
+            return key, self._entries[key]
+        if self.store is not None:
+            # Another worker may have built it since we loaded (a busy store is a miss)
+            try:
+                entry = self.store.get(STORE_PREFIX + key)
+            except Exception as e:
+                print(f"[WARNING] [ScoutCache] Shared store lookup failed: {e}")
+                entry = None
+            if entry is not None:
+                self._entries[key] = entry
+                return key, entry
+
+        best_key, best_score = None, 0.0
+        for candidate in self._entries:
+            score = _similarity(key, candidate)
+            if score > best_score:
+                best_key, best_score = candidate, score
+        if best_key is not None and best_score >= self.similarity:
+            return best_key, self._entries[best_key]
+        return key, None
+
+    async def get_or_build(self, topic: str, builder: Callable[[str], Awaitable[str]]) -> str:
+        key, entry = self.lookup(topic)
+        now = time.time()
+
+        if entry is not None:
+            age = now - entry["created_at"]
+            degraded = entry.get("degraded", False)
+            if age < (self.degraded_ttl if degraded else self.ttl):
+                self.stats["hits"] += 1
+                return entry["report"]
+            if not degraded and age < self.stale_ttl:
+                self.stats["stale_hits"] += 1
+                if key not in self._inflight:
+                    self.stats["refreshes"] += 1
+                    self._start_build(key, topic, builder)
+                return entry["report"]
+
+        self.stats["misses"] += 1
+        task = self._inflight.get(key) or self._start_build(key, topic, builder)
+        return await wait_within_budget(task)
+
+    def _start_build(self, key: str, topic: str, builder: Callable[[str], Awaitable[str]]) -> asyncio.Future:
+        async def _build():
+            report = await builder(topic)
+            persist = self._store(key, topic, report)
+            if persist is not None:
+                await asyncio.to_thread(persist)
+            return report
+
+        # Shared by every request for the topic (or detached, on refresh), so it runs without the caller's deadline
+        task = spawn_background(_build())
+        self._inflight[key] = task
+
+        def _done(t, k=key):
+            self._inflight.pop(k, None)
+            if not t.cancelled() and t.exception() is not None:
+                print(f"[WARNING] [ScoutCache] Rebuild failed for '{topic}': {t.exception()}")
+
+        task.add_done_callback(_done)
+        return task
+
+    # --- Persistence ---
+
+    def _store(self, key: str, topic: str, report: str) -> Optional[Callable[[], None]]:
+        """Updates the in-memory entry; returns the write (shared store or file) to run in a thread."""
+        degraded = isinstance(report, DegradedReport)
+        with self._lock:
+            current = self._entries.get(key)
+            if degraded:
+                self.stats["degraded"] += 1
+                if current is not None and not current.get("degraded") and time.time() - current["created_at"] < self.stale_ttl:
+                    return None  # keep serving the last good report
+            entry = {"topic": topic, "report": str(report), "created_at": time.time()}
+            if degraded:
+                entry["degraded"] = True
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                oldest = sorted(self._entries, key=lambda k: self._entries[k]["created_at"])
+                for k in oldest[:len(self._entries) - self.max_entries]:
+                    del self._entries[k]
+            if self.store is not None:
+                return functools.partial(self._store_set, key, entry, self.degraded_ttl if degraded else self.stale_ttl)
+            self._version += 1
+            return functools.partial(self._save, self._version, dict(self._entries))
+
+    def _store_set(self, key: str, entry: Dict[str, Any], ttl: float):
+        try:
+            self.store.set(STORE_PREFIX + key, entry, ttl=ttl)
+        except Exception as e:
+            print(f"[WARNING] [ScoutCache] Could not write shared store: {e}")
+
+    def _save(self, version: int, entries: Dict[str, Dict[str, Any]]):
+        # Runs in a worker thread; concurrent saves are serialized and an older
+        # snapshot never overwrites a newer one
+        with self._save_lock:
+            if version <= self._saved_version:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._saved_version = version
+            except OSError as e:
+                print(f"[WARNING] [ScoutCache] Could not persist cache: {e}")
+
+    def _load(self):
+        if self.store is not None:
+            entries = self.store.items(STORE_PREFIX)
+            self._entries = {k[len(STORE_PREFIX):]: v for k, v in entries.items()}
+            return
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[WARNING] [ScoutCache] Could not load cache: {e}")
+            return
+        cutoff = time.time() - self.stale_ttl
+        self._entries = {k: v for k, v in entries.items() if v.get("created_at", 0) > cutoff}
+
+# Singleton instance
+scout_cache = ScoutReportCache(store=shared_state if is_shared(shared_state) else None)
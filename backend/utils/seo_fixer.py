@@ -2,12 +2,12 @@
 import asyncio
 import os
 import aiohttp
-import json
 # SDK Migration: Using centralized genai_client
 from backend.utils.genai_client import generate_content_sync
-from dotenv import load_dotenv, find_dotenv
+from backend.utils.env import load_env
+from backend.utils.serialization import parse_llm_json
 
-load_dotenv(find_dotenv())
+load_env()
 
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("VITE_SUPABASE_ANON_KEY")
@@ -51,11 +51,7 @@ async def generate_seo_metadata(title, content):
         import asyncio
         response = await asyncio.to_thread(generate_content_sync, prompt)
         text = response.text
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
-        return json.loads(text)
+        return parse_llm_json(text)
     except Exception as e:
         print(f"   Warning: Gemini SEO Gen Failed: {e}")
         return None
@@ -0,0 +1,73 @@
+"""
+Fast JSON Serialization
+
+One place for JSON encoding/decoding on the request path: orjson when it is
+installed (several times faster than the stdlib and returns compact bytes),
+with a stdlib fallback that produces equivalent output.
+
+- dumps / dumps_bytes: compact JSON (no spaces), UTF-8, non-str dict keys
+  and unknown types (pydantic models, sets, datetimes) handled
+- loads: accepts str or bytes
+- parse_llm_json: strips ```json fences from model output and parses it; the
+  pattern every agent used to repeat inline
+- JSONDecodeError: catches decode errors from either backend
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one name covers both
+JSONDecodeError = json.JSONDecodeError
+
+
+def _default(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+if HAS_ORJSON:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(value: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(value, default=_default, option=_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return orjson.loads(data)
+else:
+    def dumps_bytes(value: Any, indent: bool = False) -> bytes:
+        return json.dumps(
+            value, default=_default, ensure_ascii=False,
+            indent=2 if indent else None, separators=None if indent else (",", ":")
+        ).encode("utf-8")
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+
+def dumps(value: Any, indent: bool = False) -> str:
+    return dumps_bytes(value, indent).decode("utf-8")
+
+
+def extract_json_text(text: str) -> str:
+    """Body of the first ```json (or ```) fence, else the stripped text."""
+    text = text or ""
+    if "```json" in text:
+        return text.split("```json")[1].split("```")[0].strip()
+    if "```" in text:
+        return text.split("```")[1].split("```")[0].strip()
+    return text.strip()
+
+
+def parse_llm_json(text: str) -> Any:
+    """Parses JSON from an LLM response; raises JSONDecodeError if it is not JSON."""
+    return loads(extract_json_text(text))
@@ -0,0 +1,137 @@
+"""
+Service Tiers for the Recommendation Pipeline
+
+Named tiers trade answer depth for latency and cost:
+
+- full:       scout, memory, persona, ux, profiler, retrieval, visual, consensus,
+              generation, plus the background R&D hooks (scribe, scientist, SEO, heal)
+- standard:   persona, ux, profiler, retrieval, visual, consensus, generation
+- lite:       persona, retrieval, generation
+- cache_only: no LLM calls; a cached recommendation for the same (normalized)
+              query (the caller's own, or one that was not personalized),
+              otherwise a templated answer built from retrieved posts
+
+A request may ask for a tier (RecommendationRequest.tier); under load the
+admission queue depth caps it further, so a client asking for `full` during
+a spike is served `standard` or `lite` instead of waiting or failing.
+Per-tier latency SLOs are checked by backend/scripts/bench_tier_slo.py.
+"""
+
+import os
+import time
+import asyncio
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from backend.utils.scout_cache import normalize_topic
+from backend.utils.shared_state import shared_state
+
+TIERS = ("full", "standard", "lite", "cache_only")
+
+TIER_STAGES: Dict[str, FrozenSet[str]] = {
+    "full": frozenset({"scout", "memory", "persona", "ux", "profiler", "retrieval", "visual", "consensus", "generation", "background"}),
+    "standard": frozenset({"persona", "ux", "profiler", "retrieval", "visual", "consensus", "generation"}),
+    "lite": frozenset({"persona", "retrieval", "generation"}),
+    "cache_only": frozenset({"cache"}),
+}
+
+# p95 latency targets per tier (ms); TIER_SLO_<TIER>_MS overrides
+TIER_SLO_MS: Dict[str, float] = {
+    tier: float(os.getenv(f"TIER_SLO_{tier.upper()}_MS", default))
+    for tier, default in (("full", "25000"), ("standard", "12000"), ("lite", "6000"), ("cache_only", "1500"))
+}
+
+DEFAULT_TIER = os.getenv("DEFAULT_SERVICE_TIER", "full")
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL_HOURS", "6")) * 3600
+CACHE_PREFIX = "rec:"
+
+
+def tier_for_load(queue_depth: int, degrade_depth: int) -> str:
+    """Cheapest tier the current admission backlog allows (1x, 2x, 3x degrade depth)."""
+    if degrade_depth <= 0 or queue_depth < degrade_depth:
+        return "full"
+    if queue_depth < 2 * degrade_depth:
+        return "standard"
+    if queue_depth < 3 * degrade_depth:
+        return "lite"
+    return "cache_only"
+
+
+def resolve_tier(requested: Optional[str], load_tier: str = "full") -> str:
+    """The cheaper of the requested tier and the tier the load allows."""
+    requested = requested if requested in TIERS else DEFAULT_TIER
+    return TIERS[max(TIERS.index(requested), TIERS.index(load_tier))]
+
+
+def tier_stages(tier: Optional[str]) -> FrozenSet[str]:
+    return TIER_STAGES.get(tier or DEFAULT_TIER, TIER_STAGES["full"])
+
+
+# --- Cache-only answers ---
+
+def _cache_key(query: str, scope: Optional[str]) -> str:
+    topic = normalize_topic(query)
+    return f"{CACHE_PREFIX}{scope}:{topic}" if scope else CACHE_PREFIX + topic
+
+
+async def get_cached_recommendation(query: str, scope: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """The caller's own cached answer (if scoped), else the shared non-personalized one."""
+    keys = ([_cache_key(query, scope)] if scope else []) + [_cache_key(query, None)]
+    for key in keys:
+        try:
+            cached = await asyncio.to_thread(shared_state.get, key)
+        except Exception as e:
+            # A busy or unreachable store is a miss, never a failed request
+            print(f"[WARNING] Recommendation cache lookup failed: {e}")
+            return None
+        if cached:
+            return cached
+    return None
+
+
+async def cache_recommendation(query: str, recommendation: Dict[str, Any], tier: str, scope: Optional[str] = None):
+    """
+    Keeps successful LLM answers so cache_only requests can reuse them.
+    Answers shaped by a user's signals or profile must pass that user's
+    `scope`; only unscoped (non-personalized) answers are shared across users.
+    Store errors are logged and ignored: the answer was already computed.
+    """
+    if not normalize_topic(query) or recommendation.get("fallback") or not recommendation.get("content") or not recommendation.get("confidence"):
+        return
+    entry = {
+        "content": recommendation["content"],
+        "reasoning": recommendation.get("reasoning", ""),
+        "confidence": recommendation["confidence"],
+        "source_tier": tier,
+        "cached_at": time.time(),
+    }
+    try:
+        await asyncio.to_thread(shared_state.set, _cache_key(query, scope), entry, ttl=RECOMMENDATION_CACHE_TTL)
+    except Exception as e:
+        print(f"[WARNING] Could not cache recommendation: {e}")
+
+
+def cache_scope(session_id: Optional[str], user_id: Optional[str] = None) -> Optional[str]:
+    """Cache scope for a caller: the user when signed in, else the session."""
+    if user_id and user_id != "anonymous":
+        return f"user:{user_id}"
+    return f"session:{session_id}" if session_id else None
+
+
+def template_recommendation(query: str, posts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """LLM-free answer listing the best matching posts."""
+    if not posts:
+        return {
+            "content": f"We're busy right now and couldn't find a saved answer for '{query}'. Please try again in a moment.",
+            "reasoning": "Served in cache-only mode; no matching posts were retrieved.",
+            "confidence": 0.0,
+        }
+    lines = [f"Here are some of our guides that match '{query}':"]
+    for post in posts:
+        excerpt = (post.get("excerpt") or "").strip()
+        lines.append(f"- {post.get('title', 'Untitled')}" + (f": {excerpt}" if excerpt else ""))
+    best = max(post.get("similarity", 0.0) for post in posts)
+    return {
+        "content": "\n".join(lines),
+        "reasoning": "Served in cache-only mode from the closest matching posts (no personalization).",
+        "confidence": round(min(0.6, best), 2),
+    }
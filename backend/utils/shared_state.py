@@ -0,0 +1,369 @@
+"""
+Shared State Backends
+
+Small key/value store with TTLs for state that must agree across API workers:
+background-job cooldowns, cached reports and HTTP rate-limit counters. With a
+single process the default in-memory backend behaves exactly like the old
+module globals; scaling out to several workers only needs SHARED_STATE_URI.
+
+SHARED_STATE_URI:
+- "memory://" (default): per process
+- "sqlite:///path/to/file.sqlite" (or just "sqlite"): shared by every worker
+  on the host through one SQLite file
+- "redis://host:6379/0": shared across hosts (needs the `redis` package;
+  any Redis-compatible server works)
+
+Values are JSON-serializable. Every backend offers the same atomic primitives:
+get/set/delete, set_if_absent (cooldowns and locks), incr (counters) and
+items(prefix) for warm-loading a namespace.
+
+The backends are synchronous and some callers (the slowapi counters, cache
+lookups) run on the event loop. Each call is one indexed statement, so the
+only way it can stall the loop is by waiting on another worker's write lock:
+SQLite waits at most SHARED_STATE_SQLITE_BUSY_MS (default 50ms) and then
+raises sqlite3.OperationalError, which callers treat as a cache miss or let
+the request through. Writes that are not on the request path belong in a
+worker thread.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from backend.utils.env import CACHE_DIR
+
+SHARED_STATE_URI = os.getenv("SHARED_STATE_URI", "memory://")
+DEFAULT_SQLITE_PATH = os.path.join(CACHE_DIR, "shared_state.sqlite")
+KEY_NAMESPACE = os.getenv("SHARED_STATE_NAMESPACE", "tripzy")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SHARED_STATE_SQLITE_BUSY_MS", "50"))
+
+
+def sqlite_path(uri: str) -> str:
+    """Path for "sqlite", "sqlite:" or "sqlite:///abs/path" URIs."""
+    _, _, rest = uri.partition(":")
+    path = rest[2:] if rest.startswith("//") else rest
+    return path or DEFAULT_SQLITE_PATH
+
+
+class MemoryStateBackend:
+    """Per-process store; the default for single-worker and development runs."""
+    scheme = "memory"
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[Tuple[Any, Optional[float]]]:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._live(key, time.time())
+            return default if entry is None else entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            now = time.time()
+            if self._live(key, now) is not None:
+                return False
+            self._data[key] = (value, now + ttl if ttl else None)
+            return True
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Adds to a counter; `ttl` is applied when the counter is created."""
+        with self._lock:
+            now = time.time()
+            entry = self._live(key, now)
+            if entry is None:
+                entry = (0, now + ttl if ttl else None)
+            value = int(entry[0]) + amount
+            self._data[key] = (value, entry[1])
+            return value
+
+    def ttl(self, key: str) -> Optional[float]:
+        """Seconds until `key` expires; None if missing or without expiry."""
+        with self._lock:
+            now = time.time()
+            entry = self._live(key, now)
+            if entry is None or entry[1] is None:
+                return None
+            return entry[1] - now
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def items(self, prefix: str = "") -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            result = {}
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                entry = self._live(key, now)
+                if entry is not None:
+                    result[key] = entry[0]
+            return result
+
+    def clear(self, prefix: str = ""):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+
+class SQLiteStateBackend:
+    """Store shared by all processes on the host through one SQLite file (WAL)."""
+    scheme = "sqlite"
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS):
+        self.path = path
+        self.busy_timeout = max(1, busy_timeout_ms) / 1000.0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Bounded lock wait: callers on the event loop must not block for seconds
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, func):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(conn, time.time())
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _row(conn: sqlite3.Connection, key: str, now: float) -> Optional[Tuple[str, Optional[float]]]:
+        return conn.execute(
+            "SELECT value, expires FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, now)
+        ).fetchone()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._row(self._conn(), key, time.time())
+        return default if row is None else json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl if ttl else None)
+        )
+
+    def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        def _op(conn, now):
+            if self._row(conn, key, now) is not None:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl if ttl else None)
+            )
+            return True
+        return self._transaction(_op)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        def _op(conn, now):
+            row = self._row(conn, key, now)
+            value, expires = (int(json.loads(row[0])), row[1]) if row else (0, now + ttl if ttl else None)
+            value += amount
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires)
+            )
+            return value
+        return self._transaction(_op)
+
+    def ttl(self, key: str) -> Optional[float]:
+        now = time.time()
+        row = self._row(self._conn(), key, now)
+        if row is None or row[1] is None:
+            return None
+        return row[1] - now
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def items(self, prefix: str = "") -> Dict[str, Any]:
+        rows = self._conn().execute(
+            "SELECT key, value FROM kv WHERE key >= ? AND key < ? AND (expires IS NULL OR expires > ?)",
+            (prefix, prefix + "\uffff", time.time())
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def clear(self, prefix: str = ""):
+        conn = self._conn()
+        conn.execute("DELETE FROM kv WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff"))
+        conn.execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+
+
+class RedisStateBackend:
+    """Store on a Redis-compatible server; keys are namespaced with KEY_NAMESPACE."""
+    scheme = "redis"
+
+    def __init__(self, uri: str, namespace: str = KEY_NAMESPACE):
+        import redis  # Optional dependency, only needed for this backend
+        self.uri = uri
+        self.client = redis.Redis.from_url(uri)
+        self.prefix = f"{namespace}:"
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raw = self.client.get(self._key(key))
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.client.set(self._key(key), json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(self._key(key), json.dumps(value), nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        pipe = self.client.pipeline()
+        pipe.incrby(self._key(key), amount)
+        if ttl:
+            pipe.pexpire(self._key(key), int(ttl * 1000), nx=True)
+        return int(pipe.execute()[0])
+
+    def ttl(self, key: str) -> Optional[float]:
+        remaining = self.client.pttl(self._key(key))
+        return remaining / 1000 if remaining and remaining > 0 else None
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+    def items(self, prefix: str = "") -> Dict[str, Any]:
+        keys = list(self.client.scan_iter(match=self._key(prefix) + "*"))
+        if not keys:
+            return {}
+        result = {}
+        for raw_key, raw in zip(keys, self.client.mget(keys)):
+            if raw is not None:
+                name = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+                result[name[len(self.prefix):]] = json.loads(raw)
+        return result
+
+    def clear(self, prefix: str = ""):
+        keys = list(self.client.scan_iter(match=self._key(prefix) + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def backend_from_uri(uri: str):
+    scheme = urlparse(uri).scheme or uri.partition(":")[0]
+    if scheme == "sqlite":
+        return SQLiteStateBackend(sqlite_path(uri))
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisStateBackend(uri)
+    if scheme not in ("", "memory"):
+        print(f"[WARNING] Unknown SHARED_STATE_URI scheme '{scheme}', using per-process memory")
+    return MemoryStateBackend()
+
+
+def is_shared(backend=None) -> bool:
+    """True when the backend is visible to other worker processes."""
+    return (backend or shared_state).scheme != "memory"
+
+
+def limiter_storage_uri(backend=None) -> str:
+    """slowapi/limits storage URI matching the shared state backend."""
+    override = os.getenv("RATE_LIMIT_STORAGE_URI")
+    if override:
+        return override
+    backend = backend or shared_state
+    if backend.scheme == "sqlite":
+        return f"sqlite:///{os.path.abspath(backend.path).lstrip('/')}"
+    if backend.scheme == "redis":
+        return backend.uri
+    return "memory://"
+
+
+def claim_cooldown(name: str, cooldown: float, backend=None) -> bool:
+    """
+    True for exactly one caller (across all workers sharing the backend) per
+    `cooldown` seconds; used to throttle background maintenance jobs.
+    """
+    try:
+        return (backend or shared_state).set_if_absent(f"cooldown:{name}", time.time(), ttl=cooldown)
+    except sqlite3.OperationalError as e:
+        # Store busy: skip this round, another worker is likely running the job
+        print(f"[WARNING] Cooldown '{name}' not claimed: {e}")
+        return False
+
+
+def cooldown_remaining(name: str, backend=None) -> float:
+    """Seconds until `name` can be claimed again (0 if unknown)."""
+    try:
+        return (backend or shared_state).ttl(f"cooldown:{name}") or 0.0
+    except sqlite3.OperationalError:
+        return 0.0
+
+
+try:
+    from limits.storage import Storage as _LimitsStorage
+except ImportError:  # slowapi (and limits) are only installed for the API
+    _LimitsStorage = None
+
+if _LimitsStorage is not None:
+    class SQLiteLimitsStorage(_LimitsStorage):
+        """
+        `limits` storage over SQLiteStateBackend, so slowapi's fixed-window
+        counters are shared by every worker (storage_uri="sqlite:///path").
+        """
+        STORAGE_SCHEME = ["sqlite"]
+
+        def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options):
+            super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+            self.state = SQLiteStateBackend(sqlite_path(uri or "sqlite"))
+
+        @property
+        def base_exceptions(self):
+            return sqlite3.Error
+
+        def incr(self, key: str, expiry: int, amount: int = 1, **kwargs) -> int:
+            return self.state.incr(f"limits:{key}", amount, ttl=expiry)
+
+        def get(self, key: str) -> int:
+            return int(self.state.get(f"limits:{key}", 0))
+
+        def get_expiry(self, key: str) -> float:
+            return time.time() + (self.state.ttl(f"limits:{key}") or 0.0)
+
+        def check(self) -> bool:
+            try:
+                self.state._conn().execute("SELECT 1")
+                return True
+            except sqlite3.Error:
+                return False
+
+        def reset(self) -> Optional[int]:
+            count = len(self.state.items("limits:"))
+            self.state.clear("limits:")
+            return count
+
+        def clear(self, key: str):
+            self.state.delete(f"limits:{key}")
+
+# Singleton instance
+shared_state = backend_from_uri(SHARED_STATE_URI)
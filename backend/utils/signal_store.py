@@ -0,0 +1,157 @@
+"""
+Per-Session Signal Store
+
+Keeps a pre-aggregated view of each session's blog.user_signals rows so a
+request only processes the rows that arrived since the last one, instead of
+re-fetching and re-processing the whole window.
+
+Each session holds:
+- the most recent SIGNAL_WINDOW raw rows (for hybrid alpha and prompts)
+- running counts of signal types, vibes and target categories
+- recency-weighted (exponentially decayed) vibe and category scores
+- the last `created_at` seen, used as the incremental fetch cursor
+
+CrossDomainTransferAgent, UXArchitect and ProfilerAgent all read the same
+compact `features()` dict. Engaged post IDs are queued so the user preference
+vector can be updated from just the new engagements.
+"""
+
+import os
+import math
+import asyncio
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+SIGNAL_WINDOW = 20
+SIGNAL_HALF_LIFE = float(os.getenv("SIGNAL_HALF_LIFE_HOURS", "24")) * 3600
+MAX_SESSIONS = int(os.getenv("SIGNAL_STORE_MAX_SESSIONS", "10000"))
+ENGAGEMENT_SIGNALS = {"view", "click", "like", "save", "bookmark", "share", "read", "dwell"}
+
+
+def _parse_ts(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _signal_fields(row: Dict[str, Any]):
+    metadata = row.get("metadata") or {}
+    signal_type = row.get("signal_type") or row.get("type") or "unknown"
+    vibe = metadata.get("vibe") if isinstance(metadata, dict) else None
+    category = row.get("target_type") or row.get("target") or (metadata.get("category") if isinstance(metadata, dict) else None)
+    return signal_type, vibe or "unknown", category or "unknown"
+
+
+class SessionSignals:
+    """Incrementally maintained aggregate for one session."""
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.recent: deque = deque(maxlen=SIGNAL_WINDOW)
+        self.total = 0
+        self.types: Counter = Counter()
+        self.vibes: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.vibe_scores: Dict[str, float] = {}
+        self.category_scores: Dict[str, float] = {}
+        self.last_created_at: Optional[str] = None
+        self._score_ts: Optional[float] = None
+        self._boundary_ids: set = set()
+        self._engaged_posts: deque = deque(maxlen=SIGNAL_WINDOW)
+        self.lock = asyncio.Lock()
+
+    def apply(self, rows: List[Dict[str, Any]]) -> int:
+        """Folds new rows (any order) into the aggregate. O(len(rows))."""
+        fresh = [r for r in rows if r.get("id") is None or r.get("id") not in self._boundary_ids]
+        fresh.sort(key=lambda r: r.get("created_at") or "")
+
+        for row in fresh:
+            signal_type, vibe, category = _signal_fields(row)
+            self.total += 1
+            self.types[signal_type] += 1
+            self.vibes[vibe] += 1
+            self.categories[category] += 1
+            self._decay_to(_parse_ts(row.get("created_at")))
+            self.vibe_scores[vibe] = self.vibe_scores.get(vibe, 0.0) + 1.0
+            self.category_scores[category] = self.category_scores.get(category, 0.0) + 1.0
+            self.recent.appendleft(row)
+            if signal_type in ENGAGEMENT_SIGNALS and row.get("target_id") and category in ("post", "unknown"):
+                self._engaged_posts.append(row["target_id"])
+
+            created_at = row.get("created_at")
+            if created_at:
+                if created_at != self.last_created_at:
+                    self._boundary_ids = set()
+                self.last_created_at = created_at
+                if row.get("id") is not None:
+                    self._boundary_ids.add(row["id"])
+        return len(fresh)
+
+    def _decay_to(self, ts: Optional[float]):
+        if ts is None:
+            return
+        if self._score_ts is not None and ts > self._score_ts:
+            factor = math.pow(0.5, (ts - self._score_ts) / SIGNAL_HALF_LIFE)
+            self.vibe_scores = {k: v * factor for k, v in self.vibe_scores.items()}
+            self.category_scores = {k: v * factor for k, v in self.category_scores.items()}
+        if self._score_ts is None or ts > self._score_ts:
+            self._score_ts = ts
+
+    def drain_engaged_posts(self) -> List[str]:
+        """Post IDs engaged with since the last drain, oldest first."""
+        posts = list(self._engaged_posts)
+        self._engaged_posts.clear()
+        return posts
+
+    def requeue_engaged_posts(self, post_ids: List[str]):
+        """Puts drained post IDs back (ahead of newer ones) after a failed fold."""
+        newer = list(self._engaged_posts)
+        self._engaged_posts.clear()
+        self._engaged_posts.extend(list(post_ids) + newer)
+
+    @property
+    def signals(self) -> List[Dict[str, Any]]:
+        """Most recent raw rows, newest first (same shape as the old fetch)."""
+        return list(self.recent)
+
+    def features(self) -> Dict[str, Any]:
+        """Compact, prompt-ready aggregate shared by all agents."""
+        def _top(scores: Dict[str, float], n: int = 5):
+            return {k: round(v, 2) for k, v in sorted(scores.items(), key=lambda kv: -kv[1])[:n]}
+
+        return {
+            "total_signals": self.total,
+            "window_signals": len(self.recent),
+            "types": dict(self.types.most_common(8)),
+            "vibes": dict(self.vibes.most_common(5)),
+            "categories": dict(self.categories.most_common(5)),
+            "recency_weighted": {
+                "vibes": _top(self.vibe_scores),
+                "categories": _top(self.category_scores)
+            },
+            "last_signal_at": self.last_created_at
+        }
+
+
+class SignalStore:
+    """LRU-bounded map of session_id -> SessionSignals."""
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, SessionSignals]" = OrderedDict()
+
+    def get(self, session_id: str) -> SessionSignals:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = SessionSignals(session_id)
+            self._sessions[session_id] = entry
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return entry
+
+# Singleton instance
+signal_store = SignalStore()
@@ -0,0 +1,186 @@
+"""
+Stream Encodings for /recommend/stream
+
+The pipeline (Agent.astream_events) yields plain event dicts; this module
+turns them into bytes in the format the client negotiated:
+
+- ndjson (default, application/x-ndjson): one `{"type", "data"}` object per
+  line, the original wire format
+- sse (text/event-stream): `event: <type>` + `data: <json payload>` frames
+- msgpack (application/x-msgpack): a sequence of `[type, data]` arrays; needs
+  the `msgpack` package and falls back to ndjson without it
+
+The compact formats (sse, msgpack) send deltas for state snapshots: an
+analysis or consensus event sent a second time only carries the keys that
+changed (and is dropped if nothing did). Clients merge those payloads per
+event type. Events with fields besides type/data (agent_start etc.) carry
+those fields in a dict payload.
+
+In every format, token events are coalesced over a short window
+(STREAM_TOKEN_COALESCE_MS) so a fast model stream becomes a few frames per
+window instead of one frame per 50-character chunk.
+"""
+
+import os
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional
+
+from backend.utils.serialization import dumps_bytes
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+STREAM_TOKEN_COALESCE_MS = float(os.getenv("STREAM_TOKEN_COALESCE_MS", "30"))
+STREAM_TOKEN_MAX_CHARS = int(os.getenv("STREAM_TOKEN_MAX_CHARS", "512"))
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+    "msgpack": "application/x-msgpack",
+}
+_ACCEPT_ALIASES = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/event-stream": "sse",
+    "application/x-msgpack": "msgpack",
+    "application/msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+}
+DELTA_TYPES = {"analysis", "consensus"}
+_END = object()
+
+
+def available_formats():
+    return [fmt for fmt in MEDIA_TYPES if fmt != "msgpack" or msgpack is not None]
+
+
+def negotiate(accept: Optional[str] = None, requested: Optional[str] = None) -> str:
+    """Explicit `?format=` wins, then the first supported Accept media type, else ndjson."""
+    supported = available_formats()
+    if requested:
+        requested = requested.lower()
+        return requested if requested in supported else "ndjson"
+    for part in (accept or "").split(","):
+        fmt = _ACCEPT_ALIASES.get(part.split(";")[0].strip().lower())
+        if fmt in supported:
+            return fmt
+    return "ndjson"
+
+
+class DeltaTracker:
+    """Remembers the last payload per event type and reduces new ones to changes."""
+    def __init__(self):
+        self._last: Dict[str, Any] = {}
+
+    def reduce(self, event_type: str, data: Any):
+        """Returns the payload to send, or _END if nothing changed."""
+        if event_type not in DELTA_TYPES:
+            return data
+        previous = self._last.get(event_type, _END)
+        self._last[event_type] = data
+        if previous is _END:
+            return data
+        if isinstance(data, dict) and isinstance(previous, dict):
+            changed = {k: v for k, v in data.items() if previous.get(k, _END) != v}
+            return changed if changed else _END
+        return _END if data == previous else data
+
+
+def encode_ndjson(event: Dict[str, Any]) -> bytes:
+    return dumps_bytes(event) + b"\n"
+
+
+def encode_sse(event_type: str, data: Any) -> bytes:
+    return b"event: " + event_type.encode("utf-8") + b"\ndata: " + dumps_bytes(data) + b"\n\n"
+
+
+def encode_msgpack(event_type: str, data: Any) -> bytes:
+    return msgpack.packb([event_type, data], default=str, use_bin_type=True)
+
+
+async def coalesce_tokens(
+    events: AsyncIterator[Dict[str, Any]],
+    window: float = STREAM_TOKEN_COALESCE_MS / 1000.0,
+    max_chars: int = STREAM_TOKEN_MAX_CHARS
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Merges consecutive token events that arrive within `window` seconds of the
+    first buffered one (or until `max_chars`). Any other event flushes first.
+    """
+    if window <= 0:
+        async for event in events:
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+
+    async def _pump():
+        # Reads the source in its own task so waiting for the window never
+        # cancels the source generator mid-step
+        try:
+            async for event in events:
+                await queue.put((event, None))
+            await queue.put((_END, None))
+        except Exception as e:
+            await queue.put((_END, e))
+
+    pump = asyncio.ensure_future(_pump())
+    buffer = []
+    buffered = 0
+    flush_at = 0.0
+
+    def _flush():
+        nonlocal buffer, buffered
+        event = {"type": "token", "data": "".join(buffer)}
+        buffer, buffered = [], 0
+        return event
+
+    try:
+        while True:
+            try:
+                timeout = max(0.0, flush_at - loop.time()) if buffer else None
+                item, error = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield _flush()
+                continue
+
+            if item is _END:
+                if buffer:
+                    yield _flush()
+                if error is not None:
+                    raise error
+                return
+
+            if item.get("type") == "token" and isinstance(item.get("data"), str):
+                if not buffer:
+                    flush_at = loop.time() + window
+                buffer.append(item["data"])
+                buffered += len(item["data"])
+                if buffered >= max_chars:
+                    yield _flush()
+                continue
+
+            if buffer:
+                yield _flush()
+            yield item
+    finally:
+        pump.cancel()
+
+
+async def encode_stream(events: AsyncIterator[Dict[str, Any]], fmt: str = "ndjson") -> AsyncIterator[bytes]:
+    """Coalesces tokens and encodes each event in the negotiated format."""
+    tracker = DeltaTracker() if fmt in ("sse", "msgpack") else None
+    async for event in coalesce_tokens(events):
+        if tracker is None:
+            yield encode_ndjson(event)
+            continue
+        event_type = event.get("type", "message")
+        extra = {k: v for k, v in event.items() if k != "type"}
+        data = event.get("data") if set(extra) <= {"data"} else extra
+        data = tracker.reduce(event_type, data)
+        if data is _END:
+            continue
+        yield encode_sse(event_type, data) if fmt == "sse" else encode_msgpack(event_type, data)
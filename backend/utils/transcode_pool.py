@@ -0,0 +1,185 @@
+"""
+Process-Pool Image Transcoding
+
+ImageProcessor.optimize_image / generate_variants (decode, LANCZOS resize,
+WebP/AVIF encode) and perceptual hashing are pure CPU work holding the GIL
+for hundreds of milliseconds per image. Run inside VisualMemory.ingest_image
+they stalled the event loop and capped batch ingestion at one core. This
+stage runs them in a ProcessPoolExecutor:
+
+- bounded: at most TRANSCODE_MAX_PENDING images are submitted at once per
+  event loop; further callers wait, so a big batch cannot queue hundreds of
+  multi-MB originals in memory
+- warm: start() launches every worker and imports Pillow in each, so the
+  first images do not pay process start-up (call it before spawning other
+  threads; on Linux workers are forked)
+- shared memory: inputs of TRANSCODE_SHM_THRESHOLD bytes or more are placed
+  in a SharedMemory block and only its name crosses the process boundary,
+  instead of pickling the whole original through the executor pipe
+
+TRANSCODE_WORKERS=0 (or a broken pool) falls back to a worker thread, which
+still keeps the event loop responsive.
+"""
+
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backend.utils.image_processor import ImageProcessor, IMAGE_VARIANT_WIDTHS
+from backend.utils.perceptual_hash import image_hashes
+
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", str(os.cpu_count() or 2)))
+TRANSCODE_MAX_PENDING = int(os.getenv("TRANSCODE_MAX_PENDING", str(max(2, TRANSCODE_WORKERS * 2))))
+TRANSCODE_SHM_THRESHOLD = int(os.getenv("TRANSCODE_SHM_THRESHOLD", str(512 * 1024)))
+
+
+def _warm() -> int:
+    from PIL import Image, WebPImagePlugin  # noqa: F401
+    return os.getpid()
+
+
+# Operations the workers run (only the name crosses the process boundary)
+_OPERATIONS = {
+    "optimize": ImageProcessor.optimize_image,
+    "variants": ImageProcessor.generate_variants,
+    "hash": image_hashes,
+}
+
+
+def _run(op: str, data: bytes, kwargs: Dict[str, Any]):
+    return _OPERATIONS[op](data, **kwargs)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # The parent owns (and unlinks) the block; before 3.13 attaching also
+    # registers it with the resource tracker, which would warn about a leak
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _run_shm(op: str, name: str, size: int, kwargs: Dict[str, Any]):
+    shm = _attach(name)
+    try:
+        view = shm.buf[:size]
+        try:
+            data = bytes(view)
+        finally:
+            view.release()
+    finally:
+        shm.close()
+    return _run(op, data, kwargs)
+
+
+def _release(shm: shared_memory.SharedMemory, future: Optional[asyncio.Future] = None):
+    if future is not None and not future.cancelled():
+        future.exception()  # retrieved even when the caller was cancelled
+    shm.close()
+    shm.unlink()
+
+
+class TranscodePool:
+    """Bytes in, (webp_bytes, width, height) out, on a pool of worker processes."""
+    def __init__(
+        self,
+        workers: int = TRANSCODE_WORKERS,
+        max_pending: int = TRANSCODE_MAX_PENDING,
+        shm_threshold: int = TRANSCODE_SHM_THRESHOLD
+    ):
+        self.workers = max(0, workers)
+        self.max_pending = max(1, max_pending)
+        self.shm_threshold = shm_threshold
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop = None
+        self.stats = {"process": 0, "thread": 0, "shared_memory": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def start(self) -> int:
+        """Launches and warms all workers; returns how many are running."""
+        if not self.enabled:
+            return 0
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        # The first submit launches the whole pool; one warm-up task per worker
+        # imports Pillow in (almost always) every process
+        for future in [self._executor.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+        running = len(self._executor._processes or {})
+        print(f"[TRANSCODE] {running} worker processes ready")
+        return running
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        return self._slots
+
+    async def transcode(self, data: bytes, max_width: int = 1920, quality: int = 80) -> Tuple[Optional[bytes], int, int]:
+        """(webp_bytes, width, height) via ImageProcessor.optimize_image."""
+        return await self._submit("optimize", data, {"max_width": max_width, "quality": quality})
+
+    async def variants(
+        self,
+        data: bytes,
+        widths: Sequence[int] = IMAGE_VARIANT_WIDTHS,
+        formats: Sequence[str] = ("webp",),
+        quality: int = 80
+    ) -> List[Dict[str, Any]]:
+        """All size/format variants from one decode, via ImageProcessor.generate_variants."""
+        return await self._submit("variants", data, {"widths": list(widths), "formats": list(formats), "quality": quality})
+
+    async def hashes(self, data: bytes) -> Optional[Dict[str, str]]:
+        """{"phash", "dhash"} via perceptual_hash.image_hashes."""
+        return await self._submit("hash", data, {})
+
+    async def _submit(self, op: str, data: bytes, kwargs: Dict[str, Any]):
+        async with self._get_slots():
+            if self.enabled:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                try:
+                    result = await self._run_in_process(op, data, kwargs)
+                    self.stats["process"] += 1
+                    return result
+                except BrokenProcessPool as e:
+                    print(f"[WARNING] Transcode pool broken ({e}); restarting it and using a thread for this image")
+                    self._executor = None
+            self.stats["thread"] += 1
+            return await asyncio.to_thread(_run, op, data, kwargs)
+
+    async def _run_in_process(self, op: str, data: bytes, kwargs: Dict[str, Any]):
+        loop = asyncio.get_running_loop()
+        if len(data) < self.shm_threshold:
+            return await loop.run_in_executor(self._executor, _run, op, data, kwargs)
+
+        shm = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            shm.buf[:len(data)] = data
+            future = loop.run_in_executor(self._executor, _run_shm, op, shm.name, len(data), kwargs)
+        except BaseException:
+            _release(shm)
+            raise
+        self.stats["shared_memory"] += 1
+        # The block must outlive the worker's attach even if this caller is
+        # cancelled: release it when the executor future completes, not before
+        future.add_done_callback(lambda f: _release(shm, f))
+        return await asyncio.shield(future)
+
+# Singleton instance
+transcode_pool = TranscodePool()
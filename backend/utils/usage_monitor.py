@@ -3,9 +3,9 @@ import os
 import aiohttp
 import json
 from datetime import datetime
-from dotenv import load_dotenv
+from backend.utils.env import load_env
 
-load_dotenv()
+load_env()
 
 class UsageMonitor:
     def __init__(self):
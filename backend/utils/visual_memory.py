@@ -1,20 +1,32 @@
 
 import os
 import uuid
-import aiohttp
+import asyncio
+import hashlib
 import unicodedata
 from datetime import datetime
 import re
+from typing import Dict, List, Optional
 # SDK Migration: Using centralized genai_client
 from backend.utils.genai_client import generate_content_sync, embed_content_sync
 from .image_processor import ImageProcessor
+from backend.utils.transcode_pool import transcode_pool
 from backend.utils.async_utils import retry_async, retry_sync_in_thread
+from backend.utils.clients import get_http_session
+from backend.utils.perceptual_hash import MediaHashIndex
+
+MIME_TYPES = {"webp": "image/webp", "avif": "image/avif"}
 
 class VisualMemory:
     def __init__(self, supabase_url: str, supabase_key: str, gemini_key: str = None):
         self.supabase_url = supabase_url
         self.supabase_key = supabase_key
         self.processor = ImageProcessor()
+        # Perceptual hashes of everything already in media_library (loaded on first ingest)
+        self.hash_index = MediaHashIndex()
+        self._hash_index_lock = None
+        # (hashes, Future[public_url]) of ingests in progress, so concurrent copies wait for the first
+        self._inflight_hashes: List[tuple] = []
         self.headers = {
             "apikey": self.supabase_key,
             "Authorization": f"Bearer {self.supabase_key}",
@@ -29,8 +41,8 @@ class VisualMemory:
 
     async def ingest_image(self, url: str, post_title: str, tags: list = []) -> str:
         """
-        Downloads URL, optimizes, generates AI description & embedding, 
-        uploads to Storage, indexes in DB, and returns new Public URL.
+        Downloads URL, builds responsive variants, generates AI description & embedding,
+        uploads to Storage, indexes in DB, and returns new Public URL (largest WebP).
         """
         if "supabase.co" in url:
             return url
@@ -43,13 +55,57 @@ class VisualMemory:
             print("         [ERROR] Download failed.")
             return url
 
-        # 2. Optimize
-        webp_data, width, height = self.processor.optimize_image(image_data)
-        if not webp_data:
+        # 2. Near-duplicate check: reuse the stored copy before any transcode, upload or AI call
+        hashes = await transcode_pool.hashes(image_data)
+        reservation = None
+        if hashes:
+            await self._ensure_hash_index()
+            while True:
+                existing = self.hash_index.find(hashes)
+                if existing:
+                    print(f"         [DEDUP] Near-duplicate of {existing['public_url']}; reusing it.")
+                    return existing["public_url"]
+                pending = self._find_inflight(hashes)
+                if pending is None:
+                    break
+                # The same image is being ingested concurrently: wait for its URL
+                print("         [DEDUP] Near-duplicate is being ingested; waiting for it.")
+                public_url = await asyncio.shield(pending)
+                if public_url:
+                    return public_url
+                # That ingest failed; look again (another waiter may have taken over)
+            # Reserve the hashes before the next await so concurrent copies wait on this ingest
+            reservation = asyncio.get_running_loop().create_future()
+            self._inflight_hashes.append((hashes, reservation))
+
+        public_url = None
+        try:
+            public_url = await self._store_image(url, image_data, post_title, tags, hashes)
+        finally:
+            if reservation is not None:
+                self._inflight_hashes.remove((hashes, reservation))
+                reservation.set_result(public_url)
+        return public_url or url
+
+    def _find_inflight(self, hashes: Dict[str, str]):
+        """Future of an in-progress ingest of a near-duplicate image, if any."""
+        for other, future in self._inflight_hashes:
+            if self.hash_index.matches(hashes, other):
+                return future
+        return None
+
+    async def _store_image(self, url: str, image_data: bytes, post_title: str, tags: list, hashes) -> Optional[str]:
+        """Steps 3-7 of ingest_image; returns the public URL, or None on failure."""
+        # 3. Optimize: every size/format variant from one decode (in the transcode worker processes)
+        variants = await transcode_pool.variants(image_data, formats=self.processor.variant_formats())
+        if not variants:
             print("         [ERROR] Optimization failed.")
-            return url
+            return None
+        # Largest WebP is the canonical image (public_url, dimensions, AI input)
+        main = next(v for v in variants if v["format"] == "webp")
+        webp_data, width, height = main["data"], main["width"], main["height"]
 
-        # 3. AI Analysis (Vision + Embedding)
+        # 4. AI Analysis (Vision + Embedding)
         ai_description = None
         embedding = None
         
@@ -76,42 +132,104 @@ class VisualMemory:
             except Exception as e:
                 print(f"         [WARNING] AI Analysis Failed: {e}")
 
-        # 4. Generate Path
-        file_path = self._generate_path(post_title)
+        # 5. Generate Paths (content-addressed, so re-ingesting an image overwrites its variants)
+        file_path = self._generate_path(post_title, image_data)
+        paths = [file_path if v is main else self._variant_path(file_path, v["format"], v["width"]) for v in variants]
 
-        # 5. Upload
-        if not await self._upload_to_storage(file_path, webp_data):
-            return url
+        # 6. Upload all variants concurrently
+        uploaded = await asyncio.gather(
+            *[self._upload_to_storage(path, v["data"], MIME_TYPES[v["format"]]) for path, v in zip(paths, variants)]
+        )
+        if not uploaded[variants.index(main)]:
+            return None
         
-        public_url = f"{self.supabase_url}/storage/v1/object/public/images/{file_path}"
+        public_url = self._public_url(file_path)
+        variant_map = self._variant_map(variants, paths, uploaded)
+        print(f"         [OK] Uploaded {sum(uploaded)}/{len(variants)} variants")
 
-        # 6. Index in DB
-        await self._index_in_db(public_url, file_path, post_title, tags, width, height, len(webp_data), url, ai_description, embedding)
+        # 7. Index in DB
+        if not await self._index_in_db(public_url, file_path, post_title, tags, width, height, len(webp_data), url, ai_description, embedding, variant_map, hashes):
+            return None
+        if hashes:
+            self.hash_index.add(hashes, {"public_url": public_url})
         
         return public_url
 
-    def _generate_path(self, title: str) -> str:
+    async def _ensure_hash_index(self):
+        """Loads phash/dhash of existing media once; ingestion continues without dedup on failure."""
+        if self.hash_index.loaded:
+            return
+        if self._hash_index_lock is None:
+            self._hash_index_lock = asyncio.Lock()
+        async with self._hash_index_lock:
+            if self.hash_index.loaded:
+                return
+            rows, page = [], 1000
+            session = get_http_session()
+            try:
+                while True:
+                    url = (f"{self.supabase_url}/rest/v1/media_library?select=public_url,phash,dhash"
+                           f"&phash=not.is.null&order=created_at.asc&limit={page}&offset={len(rows)}")
+                    async with session.get(url, headers=self.headers) as resp:
+                        if resp.status != 200:
+                            print(f"         [WARNING] Could not load media hashes: {resp.status}")
+                            break
+                        batch = await resp.json()
+                    rows.extend(batch)
+                    if len(batch) < page:
+                        break
+            except Exception as e:
+                print(f"         [WARNING] Could not load media hashes: {e}")
+            self.hash_index.load(rows)
+            print(f"      [DEDUP] Hash index ready ({len(self.hash_index)} images)")
+
+    def _generate_path(self, title: str, content: bytes = None) -> str:
         timestamp = datetime.now()
-        unique_id = str(uuid.uuid4())[:8]
+        unique_id = hashlib.sha256(content).hexdigest()[:8] if content else str(uuid.uuid4())[:8]
         normalized = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('ascii')
         slug_title = re.sub(r'[^a-z0-9]+', '-', normalized.lower()).strip('-')[:30]
         return f"generated/images/{timestamp.year}/{timestamp.month:02d}/{slug_title}-{unique_id}.webp"
 
-    async def _upload_to_storage(self, path: str, data: bytes) -> bool:
+    @staticmethod
+    def _variant_path(path: str, fmt: str, width: int) -> str:
+        """generated/images/2026/01/kyoto-ab12cd34.webp -> ...kyoto-ab12cd34-640w.avif"""
+        return f"{path.rsplit('.', 1)[0]}-{width}w.{fmt}"
+
+    def _public_url(self, path: str) -> str:
+        return f"{self.supabase_url}/storage/v1/object/public/images/{path}"
+
+    def _variant_map(self, variants: List[dict], paths: List[str], uploaded: List[bool]) -> Dict[str, Dict[str, dict]]:
+        """{"webp": {"640": {"url", "path", "height", "size_bytes"}}} for the uploaded variants."""
+        variant_map: Dict[str, Dict[str, dict]] = {}
+        for variant, path, ok in zip(variants, paths, uploaded):
+            if ok:
+                variant_map.setdefault(variant["format"], {})[str(variant["width"])] = {
+                    "url": self._public_url(path),
+                    "path": path,
+                    "height": variant["height"],
+                    "size_bytes": len(variant["data"]),
+                }
+        return variant_map
+
+    async def _upload_to_storage(self, path: str, data: bytes, content_type: str = "image/webp") -> bool:
         url = f"{self.supabase_url}/storage/v1/object/images/{path}"
         headers = self.headers.copy()
-        headers["Content-Type"] = "image/webp"
+        headers["Content-Type"] = content_type
+        # Paths are deterministic; overwrite instead of failing on a re-ingest
+        headers["x-upsert"] = "true"
         
-        async with aiohttp.ClientSession() as session:
-            async def _upload():
-                async with session.post(url, headers=headers, data=data) as resp:
-                    if resp.status not in [200, 201]:
-                        print(f"         [ERROR] Upload failed: {resp.status}")
-                        return False
-                    return True
-            return await retry_async(_upload)
+        session = get_http_session()
+
+        async def _upload():
+            async with session.post(url, headers=headers, data=data) as resp:
+                if resp.status not in [200, 201]:
+                    print(f"         [ERROR] Upload failed ({path.rsplit('/', 1)[-1]}): {resp.status}")
+                    return False
+                return True
+        return await retry_async(_upload)
 
-    async def _index_in_db(self, public_url, path, title, tags, width, height, size, original_source, ai_desc=None, embedding=None):
+    async def _index_in_db(self, public_url, path, title, tags, width, height, size, original_source, ai_desc=None, embedding=None, variants=None, hashes=None) -> bool:
+        """Inserts the media_library row (and mirrors it to blog.media); False if the row was not stored."""
         db_url = f"{self.supabase_url}/rest/v1/media_library"
         payload = {
             "storage_path": path,
@@ -126,44 +244,63 @@ class VisualMemory:
             "source": "unsplash" if "unsplash" in original_source else "unknown",
             "source_id": original_source,
             "ai_description": ai_desc,
-            "embedding": embedding
+            "embedding": embedding,
+            "variants": variants or {},
+            "phash": (hashes or {}).get("phash"),
+            "dhash": (hashes or {}).get("dhash")
         }
-        async with aiohttp.ClientSession() as session:
+        session = get_http_session()
+
+        async def _insert():
             async with session.post(db_url, headers=self.headers, json=payload) as resp:
+                if resp.status == 429 or resp.status >= 500:
+                    resp.raise_for_status()
                 if resp.status >= 300:
-                    print(f"         [WARNING] Indexing warning (media_library): {resp.status} - {await resp.text()}")
-
-                # 7. DUAL WRITE INSIDE SESSION
-                # Sync to 'blog.media'
-                try:
-                    blog_headers = self.headers.copy()
-                    blog_headers["Content-Profile"] = "blog" # Target 'blog' schema
-                    blog_headers["Prefer"] = "return=minimal"
-                    
-                    blog_url = f"{self.supabase_url}/rest/v1/media"
-                    
-                    blog_payload = {
-                        "url": public_url,
-                        "filename": f"{title}.webp", 
-                        "mime_type": "image/webp",
-                        "alt_text": ai_desc or title,
-                        "caption": title,
-                        "tags": tags or []
-                    }
-                    
-                    async def _dual_write():
-                        async with session.post(blog_url, headers=blog_headers, json=blog_payload) as blog_resp:
-                            if blog_resp.status >= 300:
-                                 print(f"         [WARNING] Dual-write warning (blog.media): {blog_resp.status}")
-                                 return False
-                            else:
-                                 print(f"         [OK] Dual-write success: Synced to blog.media")
-                                 return True
-                    
-                    await retry_async(_dual_write)
-                except Exception as e:
-                    print(f"         [WARNING] Dual-write failed: {e}")
+                    # e.g. a media_library column from 018/019 is missing: the image is not indexed
+                    print(f"         [ERROR] Indexing failed (media_library): {resp.status} - {await resp.text()}")
+                    return False
+                return True
 
+        try:
+            if not await retry_async(_insert):
+                return False
+        except Exception as e:
+            print(f"         [ERROR] Indexing failed (media_library): {e}")
+            return False
+
+        # Dual write: sync to 'blog.media' (best effort; media_library is the index)
+        try:
+            blog_headers = self.headers.copy()
+            blog_headers["Content-Profile"] = "blog" # Target 'blog' schema
+            blog_headers["Prefer"] = "return=minimal"
+
+            blog_url = f"{self.supabase_url}/rest/v1/media"
+
+            blog_payload = {
+                "url": public_url,
+                "filename": f"{title}.webp",
+                "mime_type": "image/webp",
+                "alt_text": ai_desc or title,
+                "caption": title,
+                "tags": tags or [],
+                "phash": (hashes or {}).get("phash"),
+                "dhash": (hashes or {}).get("dhash")
+            }
+
+            async def _dual_write():
+                async with session.post(blog_url, headers=blog_headers, json=blog_payload) as blog_resp:
+                    if blog_resp.status == 429 or blog_resp.status >= 500:
+                        blog_resp.raise_for_status()
+                    if blog_resp.status >= 300:
+                        print(f"         [WARNING] Dual-write failed (blog.media): {blog_resp.status} - {await blog_resp.text()}")
+                        return False
+                    print(f"         [OK] Dual-write success: Synced to blog.media")
+                    return True
+
+            await retry_async(_dual_write)
+        except Exception as e:
+            print(f"         [WARNING] Dual-write failed: {e}")
+        return True
 
     async def semantic_search(self, query: str, limit: int = 5) -> List[dict]:
         """
@@ -192,16 +329,17 @@ class VisualMemory:
             "match_count": limit
         }
         
-        async with aiohttp.ClientSession() as session:
-            async def _search():
-                async with session.post(db_url, headers=self.headers, json=payload) as resp:
-                    if resp.status == 200:
-                        return await resp.json()
-                    else:
-                        print(f"[ERROR] match_media RPC failed: {resp.status} - {await resp.text()}")
-                        return []
-            try:
-                return await retry_async(_search)
-            except Exception as e:
-                print(f"[ERROR] Request failed: {e}")
-                return []
+        session = get_http_session()
+
+        async def _search():
+            async with session.post(db_url, headers=self.headers, json=payload) as resp:
+                if resp.status == 200:
+                    return await resp.json()
+                else:
+                    print(f"[ERROR] match_media RPC failed: {resp.status} - {await resp.text()}")
+                    return []
+        try:
+            return await retry_async(_search)
+        except Exception as e:
+            print(f"[ERROR] Request failed: {e}")
+            return []
@@ -0,0 +1,86 @@
+-- ============================================
+-- BATCHED SEMANTIC SEARCH (Layer 3)
+-- One RPC round trip for many query vectors.
+-- Used by the retrieval micro-batcher in backend/agents/graph.py
+-- ============================================
+
+-- Query vectors are passed as a JSON array of arrays so PostgREST does not
+-- need to coerce a vector[] literal. Each row carries the index of the query
+-- it matched so the caller can split the result set back per request.
+DROP FUNCTION IF EXISTS public.match_posts_batch(jsonb, float, int);
+CREATE OR REPLACE FUNCTION public.match_posts_batch (
+  query_embeddings jsonb,
+  match_threshold float DEFAULT 0.5,
+  match_count int DEFAULT 5
+)
+RETURNS TABLE (
+  query_index int,
+  id uuid,
+  similarity float
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+-- Pin name resolution so callers cannot shadow blog.posts or the vector
+-- operators with objects in a schema earlier on their search_path
+SET search_path = public, blog, extensions
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    (q.ordinality - 1)::int AS query_index,
+    m.id,
+    m.similarity
+  FROM jsonb_array_elements(query_embeddings) WITH ORDINALITY AS q(embedding, ordinality)
+  CROSS JOIN LATERAL (
+    SELECT
+      p.id,
+      1 - (p.embedding <=> (q.embedding::text)::vector(768)) AS similarity
+    FROM blog.posts p
+    WHERE p.status = 'published'
+      AND 1 - (p.embedding <=> (q.embedding::text)::vector(768)) > match_threshold
+    ORDER BY p.embedding <=> (q.embedding::text)::vector(768)
+    LIMIT match_count
+  ) m
+  ORDER BY query_index, m.similarity DESC;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.match_posts_batch(jsonb, float, int) TO anon;
+GRANT EXECUTE ON FUNCTION public.match_posts_batch(jsonb, float, int) TO authenticated;
+
+COMMENT ON FUNCTION public.match_posts_batch IS 'Batched semantic search for blog posts. Returns (query_index, id, similarity) rows for every query embedding in the input array.';
+
+-- The per-query fallback (migration 010) must return the same rows as the
+-- batch: redefine it with the same filter and the same pinned search_path.
+CREATE OR REPLACE FUNCTION public.match_posts (
+  query_embedding vector(768),
+  match_threshold float DEFAULT 0.5,
+  match_count int DEFAULT 5
+)
+RETURNS TABLE (
+  id uuid,
+  similarity float
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, blog, extensions
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    p.id,
+    1 - (p.embedding <=> query_embedding) AS similarity
+  FROM blog.posts p
+  WHERE p.status = 'published'
+    AND 1 - (p.embedding <=> query_embedding) > match_threshold
+  ORDER BY p.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.match_posts(vector, float, int) TO anon;
+GRANT EXECUTE ON FUNCTION public.match_posts(vector, float, int) TO authenticated;
+
+-- ============================================
+-- DONE! Call it at: POST /rest/v1/rpc/match_posts_batch
+-- ============================================
@@ -0,0 +1,16 @@
+-- ============================================
+-- RESPONSIVE IMAGE VARIANTS
+-- Size/format variants generated at ingest (backend/utils/visual_memory.py)
+-- ============================================
+
+-- Map of format -> width -> variant, e.g.
+-- {
+--   "webp": {"320": {"url": "...-320w.webp", "path": "...", "height": 213, "size_bytes": 9120}, ...},
+--   "avif": {"320": {...}, ...}
+-- }
+-- public_url / storage_path keep pointing at the largest WebP for existing readers.
+ALTER TABLE public.media_library
+  ADD COLUMN IF NOT EXISTS variants jsonb DEFAULT '{}'::jsonb;
+
+COMMENT ON COLUMN public.media_library.variants IS
+  'Responsive variants by format and width: {"webp": {"640": {"url", "path", "height", "size_bytes"}}}';
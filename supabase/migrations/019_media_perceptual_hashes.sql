@@ -0,0 +1,23 @@
+-- ============================================
+-- PERCEPTUAL HASHES FOR MEDIA DEDUP
+-- 64-bit pHash / dHash as 16-char hex, computed at ingest
+-- (backend/utils/perceptual_hash.py). Near-duplicate matching (Hamming
+-- distance) happens in the backend's BK-tree; the btree index serves exact
+-- lookups and the "phash IS NOT NULL" scan that loads it.
+-- ============================================
+
+ALTER TABLE public.media_library
+  ADD COLUMN IF NOT EXISTS phash text,
+  ADD COLUMN IF NOT EXISTS dhash text;
+
+CREATE INDEX IF NOT EXISTS idx_media_library_phash
+  ON public.media_library (phash)
+  WHERE phash IS NOT NULL;
+
+ALTER TABLE blog.media
+  ADD COLUMN IF NOT EXISTS phash text,
+  ADD COLUMN IF NOT EXISTS dhash text;
+
+CREATE INDEX IF NOT EXISTS idx_media_phash
+  ON blog.media (phash)
+  WHERE phash IS NOT NULL;